@@ -0,0 +1,108 @@
+"""
+Success rate of simulated users of different ability with uniform operands
+versus exercises generated at the skill level of lambdas/skill.py, and the
+DynamoDB calls the generators make for it.
+
+A user answers an exercise correctly with the Elo probability of their true
+rating against the rating of the exercise's level, which is the level's
+rating minus what makes a user of that level succeed with skill.TARGET.
+Every round generates one addition exercise per user in one SQS batch and
+grades the answers in one evaluator batch. Abilities beyond MIN_LEVEL and
+MAX_LEVEL show that the rating stays near the cap instead of growing past it.
+
+    python benchmarks/bench_adaptive.py --rounds 100 --users 4
+"""
+import argparse
+import math
+import os
+import random
+import uuid
+from collections import defaultdict
+
+import boto3
+from moto import mock_aws
+
+from local_aws import CallCounter, create_exercise_table, create_user_count_table, load_lambda, sqs_event
+
+EXERCISE_TYPE = "addition"
+ABILITIES = [-6, -3, -1, 0, 2, 4, 6]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rounds", type=int, default=100, help="exercises per user")
+    parser.add_argument("--users", type=int, default=4, help="users per ability")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+
+    with mock_aws():
+        counter = CallCounter()
+        os.environ["TABLE_NAME"] = os.environ["TABLE_EXERCISE"] = create_exercise_table(EXERCISE_TYPE)
+        user_count_table = os.environ["TABLE_USER_COUNT"] = create_user_count_table()
+        os.environ["EXERCISE_TYPE"] = EXERCISE_TYPE
+
+        generators = load_lambda("generators.py")
+        evaluators = load_lambda("evaluator_lambdas.py")
+        answer_keys = load_lambda("answer_keys.py")
+        exercise_type = load_lambda("exercise_types.py").get(EXERCISE_TYPE)
+        skill = load_lambda("skill.py")
+        table = boto3.resource("dynamodb").Table(os.environ["TABLE_NAME"])
+        user_counts = boto3.resource("dynamodb").Table(user_count_table)
+
+        # rating of an exercise of level 0 that a user of level 0 solves with the target success rate
+        offset = 400 * math.log10(skill.TARGET / (1 - skill.TARGET))
+
+        print(f"{'mode':>9} {'ability':>8} {'level':>6} {'rating':>7} {'success':>8}   generator calls/batch")
+        for mode in ("uniform", "adaptive"):
+            users = {str(uuid.uuid4()): ability for ability in ABILITIES for _ in range(args.users)}
+            outcomes = defaultdict(list)
+            generator_calls = defaultdict(int)
+
+            for _ in range(args.rounds):
+                levels = skill.levels(EXERCISE_TYPE, users) if mode == "adaptive" else dict.fromkeys(users, 0)
+
+                # uniform: the generators do not know the skill table
+                if mode == "uniform":
+                    os.environ.pop("TABLE_USER_COUNT")
+                counter.reset()
+                # the generator handler without the cache, keeping the written exercises
+                records = sqs_event([{"uid": uid, "type": EXERCISE_TYPE, "count": 1} for uid in users])["Records"]
+                written = generators.write_exercises(table, generators.build_exercises(records, exercise_type))
+                for name, count in counter.calls.items():
+                    generator_calls[name] += count
+                os.environ["TABLE_USER_COUNT"] = user_count_table
+
+                messages = []
+                for item in written:
+                    uid = item["uid"]
+                    exercise_rating = skill.INITIAL + skill.POINTS_PER_LEVEL * levels[uid] - offset
+                    user_rating = skill.INITIAL + skill.POINTS_PER_LEVEL * users[uid]
+                    correct = rng.random() < 1 / (1 + 10 ** ((exercise_rating - user_rating) / 400))
+                    solution = answer_keys.solve(item["exercise"])
+                    messages.append({"uid": uid, "eid": item["id"], "type": EXERCISE_TYPE,
+                                     "solution": solution if correct else solution + 1})
+                    outcomes[uid].append(correct)
+                evaluators.handler(sqs_event(messages), None)
+
+                # the ratings are in UserCount, moto copies the whole table for every transaction
+                with table.batch_writer() as batch:
+                    for item in written:
+                        batch.delete_item(Key={"uid": item["uid"], "id": item["id"]})
+
+            final = skill.levels(EXERCISE_TYPE, users)
+            calls = ", ".join(f"{name.split('.')[1]} {count / args.rounds:.1f}"
+                              for name, count in sorted(generator_calls.items()))
+            for ability in ABILITIES:
+                uids = [uid for uid, a in users.items() if a == ability]
+                # the second half, after the rating had time to settle
+                answers = [c for uid in uids for c in outcomes[uid][args.rounds // 2:]]
+                level = sum(final[uid] for uid in uids) / len(uids) if mode == "adaptive" else 0
+                rating = sum(int(user_counts.get_item(Key={"uid": uid, "etype": EXERCISE_TYPE})["Item"]["skill"])
+                             for uid in uids) / len(uids)
+                print(f"{mode:>9} {ability:>8} {level:>6.1f} {rating:>7.0f} {sum(answers) / len(answers):>8.0%}   {calls}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+"""
+Folds answered exercises into the Stats table with lambdas/aggregator.py and
+compares what get-stats returns with the same views computed by scanning the
+Exercise table, plus the AWS calls per stream record and per view read.
+
+moto has no stream triggers, so the exercises are answered directly in the
+table, spread over a simulated day, and their NEW_AND_OLD_IMAGES records are
+handed to the aggregator in stream order. One batch is delivered twice, as a
+retried batch would be, and must not change the result; another fails after
+its stats transaction, at its leaderboard write, and is retried.
+
+    python benchmarks/bench_aggregator.py --users 200 --answers 20
+"""
+import argparse
+import json
+import os
+import time
+import uuid
+from collections import defaultdict
+
+import boto3
+import numpy as np
+from moto import mock_aws
+
+from local_aws import (CallCounter, answered_stream_event, api_event, create_exercise_table, create_stats_table,
+                       load_lambda)
+
+EXERCISE_TYPE = "addition"
+
+
+def fail_leaderboard(table, exercise_type, shard, updates):
+    raise RuntimeError("simulated throttling of the leaderboard write")
+
+
+def brute_force(stats, items):
+    """The views from every answered exercise of the type, as a scan would compute them."""
+    per_user = defaultdict(list)
+    for item in items:
+        per_user[item["uid"]["S"]].append((int(item["solveTime"]["N"]), item["correctness"]["BOOL"]))
+
+    accuracy = [0] * stats.ACCURACY_BUCKETS
+    solve_times = [0] * (len(stats.SOLVE_TIME_BOUNDS) + 1)
+    entries = []
+    for uid, answers in per_user.items():
+        answers.sort()
+        correct = sum(c for _, c in answers)
+        accuracy[stats.accuracy_bucket(correct, len(answers))] += 1
+        for (previous, _), (current, _) in zip(answers, answers[1:]):
+            if current - previous <= stats.SESSION_GAP_SECONDS:
+                solve_times[stats.solve_time_bucket(current - previous)] += 1
+        entries.append({"uid": uid, "correct": correct, "answered": len(answers)})
+
+    answered = len(items)
+    correct = sum(item["correctness"]["BOOL"] for item in items)
+    return {
+        "answered": answered,
+        "correct": correct,
+        "accuracyHistogram": accuracy,
+        "solveTimeHistogram": solve_times,
+        "leaderboard": stats.top(entries),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--answers", type=int, default=20, help="answered exercises per user")
+    parser.add_argument("--batch", type=int, default=100, help="stream batch size")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+
+    with mock_aws():
+        counter = CallCounter()
+        table_name = create_exercise_table(EXERCISE_TYPE)
+        os.environ.update({"TABLE_STATS": create_stats_table(), "EXERCISE_TYPE": EXERCISE_TYPE,
+                           "EXERCISE_TYPES": json.dumps([EXERCISE_TYPE])})
+
+        aggregator = load_lambda("aggregator.py")
+        get_stats = load_lambda("get-stats.py")
+        stats = load_lambda("stats.py")
+        client = boto3.client("dynamodb")
+
+        # answers over a day, in sessions of a few seconds to minutes between answers
+        answers = []
+        for _ in range(args.users):
+            uid = str(uuid.uuid4())
+            skill = rng.uniform(0.3, 1.0)
+            solve_time = int(rng.integers(0, 86400))
+            for _ in range(args.answers):
+                solve_time += int(rng.exponential(60)) if rng.random() > 0.1 else int(rng.integers(1800, 7200))
+                answers.append((solve_time, uid, bool(rng.random() < skill)))
+        answers.sort()
+
+        items = []
+        for solve_time, uid, correct in answers:
+            item = {
+                "uid": {"S": uid}, "id": {"S": str(uuid.uuid4())},
+                "exercise": {"M": {"type": {"S": EXERCISE_TYPE}}},
+                "answered": {"BOOL": True}, "answer": {"S": "0"},
+                "correctness": {"BOOL": correct}, "solveTime": {"N": str(solve_time)},
+            }
+            client.put_item(TableName=table_name, Item=item)
+            items.append(item)
+
+        counter.reset()
+        start = time.perf_counter()
+        batches = [items[i:i + args.batch] for i in range(0, len(items), args.batch)]
+        update_leaderboard = aggregator.update_leaderboard
+        for number, batch in enumerate(batches):
+            event = answered_stream_event(batch, first_sequence=number * args.batch + 1)
+            if number == len(batches) // 2:
+                aggregator.update_leaderboard = fail_leaderboard
+                try:
+                    aggregator.handler(event, None)
+                except RuntimeError:
+                    pass
+                aggregator.update_leaderboard = update_leaderboard
+            aggregator.handler(event, None)
+        seconds = time.perf_counter() - start
+        writes = (counter.total("dynamodb.UpdateItem") + counter.total("dynamodb.PutItem")
+                  + counter.total("dynamodb.TransactWriteItems"))
+        reads = counter.total("dynamodb.GetItem")
+        state_reads = counter.total("dynamodb.BatchGetItem")
+
+        # a retried batch, every user of it was folded already
+        aggregator.handler(answered_stream_event(batches[0], first_sequence=1), None)
+
+        counter.reset()
+        response = json.loads(get_stats.handler(api_event("reader", path_parameters={"type": EXERCISE_TYPE}), None)["body"])
+        view_calls = counter.total("dynamodb")
+
+        counter.reset()
+        scanned = []
+        paginator = client.get_paginator("scan")
+        for page in paginator.paginate(TableName=table_name):
+            scanned.extend(item for item in page["Items"] if item.get("answered", {}).get("BOOL"))
+        scan_calls = counter.total("dynamodb")
+        expected = brute_force(stats, scanned)
+
+        checks = {
+            "answered": response["answered"] == expected["answered"],
+            "correct": response["correct"] == expected["correct"],
+            "accuracy histogram": response["accuracyHistogram"] == expected["accuracyHistogram"],
+            "solve-time histogram": response["solveTime"]["histogram"] == expected["solveTimeHistogram"],
+            "leaderboard": response["leaderboard"] == expected["leaderboard"],
+        }
+
+        print(f"{len(items)} answers of {args.users} users in {len(batches)} stream batches, "
+              f"{seconds / len(items) * 1e6:.0f} us per record")
+        print(f"Stats writes per record {writes / len(items):.2f}, state reads {state_reads}, leaderboard reads {reads}")
+        print(f"get-stats: {view_calls} DynamoDB calls, scan: {scan_calls} calls over {len(scanned)} items")
+        print(f"solve time p50/p90/p99 <= {response['solveTime']['p50']}/{response['solveTime']['p90']}/"
+              f"{response['solveTime']['p99']} s")
+        for name, ok in checks.items():
+            print(f"{name:>22}: {'match' if ok else 'MISMATCH'}")
+
+
+if __name__ == "__main__":
+    main()
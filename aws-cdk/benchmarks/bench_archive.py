@@ -0,0 +1,182 @@
+"""
+Moves answered exercises older than ARCHIVE_AFTER_DAYS to S3 with
+lambdas/archiver.py and checks that nothing the users see changes: every
+history page walk returns the same answers in the same order as before, and
+the profile totals in UserCount stay the same. Reports the items left in the
+Exercise table, the archive size against the DynamoDB size of the same items,
+the AWS calls of the run and of a history page from the table and from the
+archive.
+
+A second run with a shorter age fails after writing its pointers, as a run
+cut off by the Lambda timeout would; the run after it has to delete the
+leftovers without archiving them twice.
+
+    python benchmarks/bench_archive.py --users 40 --answers 150 --days 180
+"""
+import argparse
+import json
+import os
+import random
+import time
+import uuid
+
+import boto3
+from moto import mock_aws
+
+from local_aws import CallCounter, api_event, create_exercise_table, create_user_count_table, load_lambda
+
+EXERCISE_TYPE = "addition"
+BUCKET = "profile-pic-bucket-1"
+PAGE_SIZE = 20
+
+
+def item_size(item):
+    # DynamoDB bills attribute names plus values, 100 bytes more per item in each index holding it
+    size = 0
+    for name, value in item.items():
+        kind, raw = next(iter(value.items()))
+        size += len(name) + (len(raw) if kind in ("S", "B") else len(str(raw)) if kind == "N" else 1)
+    return size + (100 if "solveTime" in item else 0)
+
+
+def history(get_history, uid):
+    """Every page of the user's history, the calls per page."""
+    items, pages, cursor = [], [], None
+    while True:
+        event = api_event(uid, path_parameters={"type": EXERCISE_TYPE})
+        event["queryStringParameters"] = {"limit": str(PAGE_SIZE), **({"cursor": cursor} if cursor else {})}
+        page = json.loads(get_history.handler(event, None)["body"])
+        items.extend(page["items"])
+        pages.append(len(page["items"]))
+        cursor = page["cursor"]
+        if not cursor:
+            return items, pages
+
+
+def histories(get_history, counter, uids):
+    counter.reset()
+    walks = {uid: history(get_history, uid) for uid in uids}
+    pages = sum(len(p) for _, p in walks.values())
+    return {uid: items for uid, (items, _) in walks.items()}, counter.total() / pages
+
+
+def profiles(get_profile, uids):
+    return {uid: json.loads(get_profile.handler(api_event(uid), None)["body"]) for uid in uids}
+
+
+def fail_deletes(params, **kwargs):
+    if any("DeleteRequest" in r for requests in params["RequestItems"].values() for r in requests):
+        raise RuntimeError("simulated timeout before the deletes")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=40)
+    parser.add_argument("--answers", type=int, default=150, help="answered exercises per user")
+    parser.add_argument("--days", type=int, default=180, help="the answers are spread over this many days")
+    parser.add_argument("--after-days", type=int, default=90)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+
+    with mock_aws():
+        counter = CallCounter()
+        table_name = create_exercise_table(EXERCISE_TYPE)
+        boto3.client("s3").create_bucket(
+            Bucket=BUCKET, CreateBucketConfiguration={"LocationConstraint": os.environ["AWS_DEFAULT_REGION"]})
+        os.environ.update({
+            "TABLE_NAME": table_name,
+            "TABLE_USER_COUNT": create_user_count_table(),
+            "EXERCISE_TYPE": EXERCISE_TYPE,
+            "EXERCISE_TYPES": json.dumps([EXERCISE_TYPE]),
+            "EXERCISE_ENCODING": "binary",
+            "ARCHIVE_BUCKET": BUCKET,
+            "ARCHIVE_AFTER_DAYS": str(args.after_days),
+        })
+
+        codec = load_lambda("codec.py")
+        exercise_type = load_lambda("exercise_types.py").get(EXERCISE_TYPE)
+        archiver = load_lambda("archiver.py")
+        get_history = load_lambda("get-history.py")
+        get_profile = load_lambda("get-profile.py")
+        client = boto3.client("dynamodb")
+        user_counts = boto3.resource("dynamodb").Table(os.environ["TABLE_USER_COUNT"])
+
+        now = int(time.time())
+        uids = [str(uuid.uuid4()) for _ in range(args.users)]
+        sizes = {}
+        for uid in uids:
+            exercises = exercise_type.generate(args.answers + 5)
+            # distinct solve times, the order of a history is unambiguous
+            solve_times = rng.sample(range(now - args.days * 86400, now), args.answers)
+            correct = 0
+            for i, exercise in enumerate(exercises):
+                item = {"uid": {"S": uid}, "id": {"S": str(uuid.uuid4())},
+                        "exercise": {"B": codec.stored_exercise(exercise, "binary").value}}
+                if i < args.answers:
+                    answer = sum(exercise["addends"]) + (rng.random() < 0.2)
+                    correct += answer == sum(exercise["addends"])
+                    item.update({"answered": {"BOOL": True}, "answer": codec.answer_attribute(answer, "binary"),
+                                 "correctness": {"BOOL": answer == sum(exercise["addends"])},
+                                 "solveTime": {"N": str(solve_times[i])}})
+                else:
+                    item.update({"answered": {"BOOL": False}, "openSince": {"N": str(now * 1000)}})
+                client.put_item(TableName=table_name, Item=item)
+                sizes[item["id"]["S"]] = item_size(item)
+            user_counts.put_item(Item={"uid": uid, "etype": EXERCISE_TYPE, "correctCount": correct,
+                                       "falseCount": args.answers - correct})
+
+        before, table_calls = histories(get_history, counter, uids)
+        profiles_before = profiles(get_profile, uids)
+        items_before = client.scan(TableName=table_name, Select="COUNT")["Count"]
+
+        counter.reset()
+        start = time.perf_counter()
+        result = archiver.handler({}, None)
+        seconds = time.perf_counter() - start
+        run_calls = ", ".join(f"{name} {count}" for name, count in sorted(counter.calls.items()))
+
+        after, archive_calls = histories(get_history, counter, uids)
+        items_after = client.scan(TableName=table_name, Select="COUNT")["Count"]
+        pointers = sum(1 for page in client.get_paginator("scan").paginate(TableName=table_name)
+                       for item in page["Items"] if item["id"]["S"].startswith("archive#"))
+        archived_ids = {r["id"] for items in before.values() for r in items} - {
+            item["id"]["S"] for page in client.get_paginator("scan").paginate(TableName=table_name)
+            for item in page["Items"]}
+        dynamodb_bytes = sum(sizes[i] for i in archived_ids)
+
+        print(f"archived {result['archived']} of {args.users * args.answers} answers in {seconds:.1f} s, "
+              f"{result['objects']} objects")
+        print(f"  table items {items_before} -> {items_after} ({pointers} archive pointers)")
+        print(f"  size {dynamodb_bytes / 1024:.0f} KiB in DynamoDB -> {result['bytes'] / 1024:.0f} KiB in S3 "
+              f"({result['bytes'] / max(result['archived'], 1):.0f} bytes per answer)")
+        print(f"  run calls: {run_calls}")
+        print(f"  AWS calls per history page: {table_calls:.2f} before, {archive_calls:.2f} after")
+
+        # a run that stops between its pointers and its deletes, then a complete one
+        os.environ["ARCHIVE_AFTER_DAYS"] = str(args.after_days // 3)
+        boto3.DEFAULT_SESSION.events.register("provide-client-params.dynamodb.BatchWriteItem", fail_deletes)
+        archiver.dynamodb = boto3.resource("dynamodb")
+        try:
+            archiver.handler({}, None)
+        except RuntimeError as e:
+            print(f"  interrupted run: {e}")
+        boto3.DEFAULT_SESSION.events.unregister("provide-client-params.dynamodb.BatchWriteItem", fail_deletes)
+        archiver.dynamodb = boto3.resource("dynamodb")
+        resumed = archiver.handler({}, None)
+        print(f"  resumed run: {resumed['archived']} archived, {resumed['leftover']} leftovers deleted")
+        final, _ = histories(get_history, counter, uids)
+
+        checks = {
+            "same history after the run": after == before,
+            "same history after an interrupted run": final == before,
+            "same profile totals": profiles(get_profile, uids) == profiles_before,
+            "second run archives nothing": archiver.handler({}, None)["archived"] == 0,
+        }
+        for name, ok in checks.items():
+            print(f"  {name}: {'ok' if ok else 'FAILED'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Repeated dashboard loads (get-profile and get-exercise of every type) with and
+without the read-through cache of lambdas/cache.py, and a check that neither
+response is stale once an answer was graded.
+
+Modes: off (no CACHE_URL) and local (the in-process stand-in for the shared
+tier, ElastiCache in the CacheStack when deployed).
+
+    python benchmarks/bench_cache.py --loads 50 --latency 5
+"""
+import argparse
+import json
+import os
+import time
+import uuid
+
+import boto3
+from moto import mock_aws
+
+from local_aws import (EXERCISE_TYPES, CallCounter, api_event, create_exercise_table, create_submission_dedupe_table,
+                       create_user_count_table, load_lambda, percentile, simulate_latency)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--loads", type=int, default=50, help="dashboard loads per mode")
+    parser.add_argument("--latency", type=float, default=0.0, help="simulated ms per AWS call")
+    args = parser.parse_args()
+
+    with mock_aws():
+        counter = CallCounter()
+        if args.latency:
+            simulate_latency(args.latency)
+
+        tables = {exercise_type: create_exercise_table(exercise_type) for exercise_type in EXERCISE_TYPES}
+        topic_arn = boto3.client("sns").create_topic(Name="ExerciseEvaluateTopic")["TopicArn"]
+        os.environ.update({
+            "TABLE_USER_COUNT": create_user_count_table(),
+            "TABLE_SUBMISSION_DEDUPE": create_submission_dedupe_table(),
+            "SNS_TOPIC_ARN": topic_arn,
+            "GRADING_MODE": "inline",
+        })
+
+        generators = load_lambda("generators.py")
+        post_solution = load_lambda("post-solution.py")
+        answer_keys = load_lambda("answer_keys.py")
+
+        def use(exercise_type):
+            os.environ.update(TABLE_NAME=tables[exercise_type], TABLE_EXERCISE=tables[exercise_type],
+                              EXERCISE_TYPE=exercise_type)
+
+        def dashboard(uid):
+            # Dashboard.tsx and the task pages: the profile and the open exercise of every type
+            responses = {"profile": get_profile.handler(api_event(uid), None)["body"]}
+            for exercise_type in EXERCISE_TYPES:
+                use(exercise_type)
+                responses[exercise_type] = get_exercise.handler(api_event(uid), None)["body"]
+            return responses
+
+        print(f"{'mode':>8} {'p50 ms':>8} {'p95 ms':>8}  DynamoDB queries/load  fresh after grading")
+        for mode in ("off", "local"):
+            if mode == "local":
+                os.environ["CACHE_URL"] = mode
+            else:
+                os.environ.pop("CACHE_URL", None)
+            # new Cache instances
+            get_exercise = load_lambda("get-exercise.py")
+            get_profile = load_lambda("get-profile.py")
+
+            uid = str(uuid.uuid4())
+            for exercise_type in EXERCISE_TYPES:
+                generators.refill_now(generators.dynamodb.Table(tables[exercise_type]), exercise_type, uid, 5)
+
+            latencies = []
+            counter.reset()
+            for _ in range(args.loads):
+                start = time.perf_counter()
+                before = dashboard(uid)
+                latencies.append((time.perf_counter() - start) * 1000)
+            queries = counter.total("dynamodb.Query") / args.loads
+
+            # answer the open addition exercise, both of its responses have to change
+            use("addition")
+            exercise = json.loads(before["addition"])
+            solution = answer_keys.solve(exercise["exercise"])
+            post_solution.handler(api_event(uid, {"eid": exercise["id"], "solution": solution}), None)
+            after = dashboard(uid)
+            fresh = after["profile"] != before["profile"] and after["addition"] != before["addition"]
+
+            print(f"{mode:>8} {percentile(latencies, 50):>8.2f} {percentile(latencies, 95):>8.2f}  "
+                  f"{queries:>21.2f}  {fresh}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Stored size and encode/decode cost of exercises and answers, the nested DynamoDB
+map and JSON string versus the binary encoding of lambdas/codec.py.
+
+Sizes follow the DynamoDB item size rules (attribute name plus value, numbers
+about one byte per two digits, one byte per map or list element), which read
+and write units are billed on. Encoding covers the low-level attribute the
+client sends, decoding the JSON get-exercise makes of a read item.
+
+    python benchmarks/bench_encoding.py --count 10000
+"""
+import argparse
+import json
+import time
+
+import numpy as np
+from boto3.dynamodb.types import TypeDeserializer, TypeSerializer
+
+from local_aws import load_lambda
+
+serializer = TypeSerializer()
+deserializer = TypeDeserializer()
+
+
+def number_size(text):
+    digits = text.lstrip("-").replace(".", "").strip("0") or "0"
+    return (len(digits) + 1) // 2 + 1
+
+
+def attribute_size(value):
+    # value in the low-level form, e.g. {"M": {"addends": {"L": [{"N": "3"}]}}}
+    (kind, inner), = value.items()
+    if kind == "N":
+        return number_size(inner)
+    if kind == "S":
+        return len(inner.encode())
+    if kind == "B":
+        return len(inner)
+    if kind == "BOOL":
+        return 1
+    if kind == "M":
+        return 3 + sum(len(name.encode()) + attribute_size(v) + 1 for name, v in inner.items())
+    if kind == "L":
+        return 3 + sum(attribute_size(v) + 1 for v in inner)
+    raise ValueError(kind)
+
+
+def timed(function, values):
+    start = time.perf_counter()
+    for value in values:
+        function(value)
+    return (time.perf_counter() - start) / len(values) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--count", type=int, default=10000, help="exercises per type")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    exercise_types = load_lambda("exercise_types.py")
+    answer_keys = load_lambda("answer_keys.py")
+    codec = load_lambda("codec.py")
+
+    print(f"{'type':>15} {'':>8} {'exercise B':>11} {'answer B':>9} {'encode us':>10} {'decode us':>10}")
+    for name, exercise_type in exercise_types.REGISTRY.items():
+        exercises = exercise_type.generate(args.count, np.random.default_rng(args.seed))
+        answers = answer_keys.solve_all(exercises)
+
+        # map: what the resource writes and returns, Decimals included
+        maps = [serializer.serialize(exercise) for exercise in exercises]
+        strings = [{"S": json.dumps(answer)} for answer in answers]
+
+        binary_exercises = [{"B": codec.encode_exercise(exercise)} for exercise in exercises]
+        binary_answers = [codec.answer_attribute(answer, "binary") for answer in answers]
+        assert all(codec.decode_exercise(b["B"]) == e for b, e in zip(binary_exercises, exercises))
+        assert all(codec.decode_answer(next(iter(b.values()))) == a for b, a in zip(binary_answers, answers))
+
+        rows = {
+            "map": (
+                maps, strings,
+                timed(serializer.serialize, exercises),
+                timed(lambda m: json.dumps(deserializer.deserialize(m), default=float), maps),
+            ),
+            "binary": (
+                binary_exercises, binary_answers,
+                timed(codec.encode_exercise, exercises),
+                timed(lambda b: json.dumps(codec.decode_exercise(b)), [b["B"] for b in binary_exercises]),
+            ),
+        }
+        for encoding, (stored, stored_answers, encode_us, decode_us) in rows.items():
+            exercise_bytes = np.mean([len("exercise") + attribute_size(v) for v in stored])
+            answer_bytes = np.mean([len("answer") + attribute_size(v) for v in stored_answers])
+            print(f"{name:>15} {encoding:>8} {exercise_bytes:>11.1f} {answer_bytes:>9.1f} "
+                  f"{encode_us:>10.2f} {decode_us:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+DynamoDB calls and latency per SQS batch of the evaluator, grading every
+submission in its own transaction versus the grouped transactions of
+grading.grade_batch.
+
+    python benchmarks/bench_evaluators.py --batch 25 --users 5 --wrong 0.2
+"""
+import argparse
+import os
+import random
+import time
+import uuid
+
+import boto3
+from moto import mock_aws
+
+from local_aws import CallCounter, create_exercise_table, create_user_count_table, load_lambda, percentile, sqs_event
+
+
+def open_exercises(generators, users, per_user):
+    event = sqs_event([{"uid": str(uuid.uuid4()), "type": "addition", "count": per_user} for _ in range(users)])
+    generators.handler(event, None)
+
+    table = boto3.resource("dynamodb").Table(os.environ["TABLE_NAME"])
+    return [item for item in table.scan()["Items"] if not item["answered"]]
+
+
+def submissions(exercises, wrong, answer_keys, codec):
+    messages = []
+    for exercise in exercises:
+        solution = answer_keys.solve(codec.decode_exercise(exercise["exercise"]))
+        messages.append({
+            "uid": exercise["uid"], "eid": exercise["id"], "type": "addition",
+            "solution": solution + 1 if random.random() < wrong else solution,
+        })
+    return messages
+
+
+def grade_single(grading, message):
+    # the former per-submission path: one optimistic transaction per answer
+    submission = {"messageId": message["eid"], "uid": message["uid"], "eid": message["eid"],
+                  "answer": message["solution"]}
+    return grading.grade_batch("addition", [submission], read_first=False)[message["eid"]]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--batch", type=int, default=25, help="submissions per SQS batch")
+    parser.add_argument("--users", type=int, default=5, help="distinct users per batch")
+    parser.add_argument("--wrong", type=float, default=0.2, help="share of wrong answers")
+    parser.add_argument("--iterations", type=int, default=20)
+    args = parser.parse_args()
+
+    with mock_aws():
+        counter = CallCounter()
+        os.environ["TABLE_NAME"] = os.environ["TABLE_EXERCISE"] = create_exercise_table("addition")
+        os.environ["TABLE_USER_COUNT"] = create_user_count_table()
+        os.environ["EXERCISE_TYPE"] = "addition"
+        generators = load_lambda("generators.py")
+        evaluators = load_lambda("evaluator_lambdas.py")
+        answer_keys = load_lambda("answer_keys.py")
+        codec = load_lambda("codec.py")
+        # the module instance the evaluator grades with
+        import grading
+
+        for mode in ("single", "grouped"):
+            latencies = []
+            transactions = 0
+            for i in range(args.iterations):
+                exercises = open_exercises(generators, args.users, args.batch // args.users)
+                messages = submissions(exercises, args.wrong, answer_keys, codec)
+                counter.reset()
+
+                start = time.perf_counter()
+                if mode == "grouped":
+                    evaluators.handler(sqs_event(messages), None)
+                else:
+                    for message in messages:
+                        grade_single(grading, message)
+                latencies.append((time.perf_counter() - start) * 1000)
+                transactions += counter.total("dynamodb.TransactWriteItems")
+
+            print(f"{mode:>8}: {transactions / args.iterations:6.1f} transactions/batch  "
+                  f"p50 {percentile(latencies, 50):7.2f} ms  p95 {percentile(latencies, 95):7.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
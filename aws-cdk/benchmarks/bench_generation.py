@@ -0,0 +1,62 @@
+"""
+Generating exercises in memory: the former per-operand random.randint with a
+JSON round trip per exercise versus the seeded bulk generators of the registry.
+
+    python benchmarks/bench_generation.py --count 10000
+"""
+import argparse
+import json
+import random
+import time
+
+from local_aws import load_lambda, percentile
+
+OPERAND_FIELDS = {"addition": "addends", "multiplication": "multipliers"}
+
+
+def per_operand(exercise_type, count):
+    # generate_random_*_exercise before the registry, loaded again by the caller
+    exercises = []
+    for n in range(count):
+        if exercise_type == "derivatives":
+            power = random.randint(2, 10)
+            exercise = {"type": "derivative", "power": power, "coeffs": [random.randint(1, 10) for i in range(power + 1)]}
+        else:
+            operands = [random.randint(1, 10) for i in range(random.randint(2, 10))]
+            exercise = {"type": exercise_type, OPERAND_FIELDS[exercise_type]: operands}
+        exercises.append(json.loads(json.dumps(exercise)))
+    return exercises
+
+
+def timed(function, iterations):
+    latencies = []
+    for i in range(iterations):
+        start = time.perf_counter()
+        function()
+        latencies.append((time.perf_counter() - start) * 1000)
+    return percentile(latencies, 50)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--count", type=int, default=10000, help="exercises per call")
+    parser.add_argument("--iterations", type=int, default=10)
+    parser.add_argument("--max-product", type=int, default=1000, help="bound of the bounded multiplication run")
+    args = parser.parse_args()
+
+    exercise_types = load_lambda("exercise_types.py")
+
+    print(f"{args.count} exercises per call, p50 of {args.iterations} calls")
+    for name in exercise_types.REGISTRY:
+        exercise_type = exercise_types.get(name)
+        old = timed(lambda: per_operand(name, args.count), args.iterations)
+        bulk = timed(lambda: exercise_type.generate(args.count, exercise_types.seeded_rng(1)), args.iterations)
+        print(f"{name:>16}: per-operand {old:8.2f} ms  bulk {bulk:7.2f} ms")
+
+    bounded = timed(lambda: exercise_types.generate_multiplications(
+        args.count, exercise_types.seeded_rng(1), max_product=args.max_product), args.iterations)
+    print(f"{'multiplication':>16}: bounded to products <= {args.max_product}: {bounded:7.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
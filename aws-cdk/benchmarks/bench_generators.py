@@ -0,0 +1,67 @@
+"""
+Benchmark of the exercise generators against a local DynamoDB (moto).
+
+Compares the bulk generation path of generators.handler with the previous
+behaviour of one put_item per exercise for every record of the batch.
+
+    python benchmarks/bench_generators.py --records 5 --count 10
+"""
+import argparse
+import os
+import time
+import uuid
+
+from moto import mock_aws
+
+from local_aws import CallCounter, create_exercise_table, load_lambda, percentile, sqs_event
+
+
+def per_item_writes(table, messages, exercise_type):
+    # the old code path: every exercise of every record was written for every user of the batch
+    for message in messages:
+        for i in range(message["count"]):
+            exercise = exercise_type.generate(1)[0]
+            for other in messages:
+                table.put_item(Item={"uid": other["uid"], "id": str(uuid.uuid4()), "exercise": exercise, "answered": False})
+
+
+def run(mode, generators, table, counter, args):
+    latencies = []
+    counter.reset()
+
+    for i in range(args.iterations):
+        messages = [{"uid": str(uuid.uuid4()), "type": "addition", "count": args.count} for _ in range(args.records)]
+        event = sqs_event(messages)
+        start = time.perf_counter()
+        if mode == "bulk":
+            generators.handler(event, None)
+        else:
+            per_item_writes(table, messages, generators.exercise_types.get("addition"))
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    writes = counter.total("dynamodb.")
+    print(f"{mode:>8}: {writes / args.iterations:8.1f} DynamoDB calls/batch  "
+          f"p50 {percentile(latencies, 50):7.2f} ms  p95 {percentile(latencies, 95):7.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--records", type=int, default=5, help="SQS records per batch")
+    parser.add_argument("--count", type=int, default=10, help="exercises requested per record")
+    parser.add_argument("--iterations", type=int, default=20)
+    args = parser.parse_args()
+
+    with mock_aws():
+        counter = CallCounter()
+        os.environ["TABLE_NAME"] = create_exercise_table("addition")
+        os.environ["EXERCISE_TYPE"] = "addition"
+        generators = load_lambda("generators.py")
+        table = generators.dynamodb.Table(os.environ["TABLE_NAME"])
+
+        print(f"{args.records} records x {args.count} exercises per SQS batch")
+        run("per-item", generators, table, counter, args)
+        run("bulk", generators, table, counter, args)
+
+
+if __name__ == "__main__":
+    main()
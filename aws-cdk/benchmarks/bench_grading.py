@@ -0,0 +1,103 @@
+"""
+Answer-to-result latency of post-solution in both grading modes: async, where the
+answer is published and graded by the evaluator behind SNS and SQS, and inline,
+where post-solution grades it and answers with the result.
+
+The async path of a lone submission also waits for the batching window of the
+evaluator's SqsEventSource (maxBatchingWindow in lambda-stack.ts), which moto
+does not have; it is added to the measured time with --window-ms.
+
+    python benchmarks/bench_grading.py --submissions 200 --latency 5 --window-ms 1000
+"""
+import argparse
+import json
+import os
+import random
+import time
+import uuid
+
+import boto3
+from moto import mock_aws
+
+from local_aws import (CallCounter, api_event, create_exercise_table, create_submission_dedupe_table,
+                       create_user_count_table, load_lambda, percentile, simulate_latency)
+
+EXERCISE_TYPE = "addition"
+
+
+def evaluate_queue(topic_arn):
+    # mirrors the evaluate subscription in lambda-stack.ts, graded events are filtered out
+    sqs = boto3.client("sqs")
+    queue_url = sqs.create_queue(QueueName="Exercise-addition-EvaluateQueue")["QueueUrl"]
+    queue_arn = sqs.get_queue_attributes(QueueUrl=queue_url, AttributeNames=["QueueArn"])["Attributes"]["QueueArn"]
+    boto3.client("sns").subscribe(
+        TopicArn=topic_arn, Protocol="sqs", Endpoint=queue_arn,
+        Attributes={"FilterPolicy": json.dumps({"type": [EXERCISE_TYPE], "event": [{"exists": False}]})},
+    )
+    return queue_url
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--submissions", type=int, default=200)
+    parser.add_argument("--wrong", type=float, default=0.2, help="share of wrong answers")
+    parser.add_argument("--latency", type=float, default=0.0, help="simulated ms per AWS call")
+    parser.add_argument("--window-ms", type=float, default=1000.0, help="batching window of the evaluator")
+    args = parser.parse_args()
+
+    with mock_aws():
+        counter = CallCounter()
+        if args.latency:
+            simulate_latency(args.latency)
+
+        table_name = create_exercise_table(EXERCISE_TYPE)
+        topic_arn = boto3.client("sns").create_topic(Name="ExerciseEvaluateTopic")["TopicArn"]
+        queue_url = evaluate_queue(topic_arn)
+        os.environ.update({
+            "TABLE_NAME": table_name,
+            "TABLE_EXERCISE": table_name,
+            "TABLE_USER_COUNT": create_user_count_table(),
+            "TABLE_SUBMISSION_DEDUPE": create_submission_dedupe_table(),
+            "SNS_TOPIC_ARN": topic_arn,
+            "EXERCISE_TYPE": EXERCISE_TYPE,
+        })
+
+        generators = load_lambda("generators.py")
+        post_solution = load_lambda("post-solution.py")
+        evaluators = load_lambda("evaluator_lambdas.py")
+        answer_keys = load_lambda("answer_keys.py")
+        sqs = boto3.client("sqs")
+
+        print(f"{'mode':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}  AWS calls/answer")
+        for mode in ("async", "inline"):
+            os.environ["GRADING_MODE"] = mode
+            uid = str(uuid.uuid4())
+            exercises = generators.refill_now(generators.dynamodb.Table(table_name), EXERCISE_TYPE, uid,
+                                              args.submissions)
+            latencies = []
+            counter.reset()
+
+            for exercise in exercises:
+                solution = answer_keys.solve(exercise["exercise"])
+                if random.random() < args.wrong:
+                    solution += 1
+
+                start = time.perf_counter()
+                response = post_solution.handler(api_event(uid, {"eid": exercise["id"], "solution": solution}), None)
+                if mode == "async":
+                    # a lone submission: the event source delivers a batch of one after the window
+                    messages = sqs.receive_message(QueueUrl=queue_url, MaxNumberOfMessages=1)["Messages"]
+                    evaluators.handler({"Records": [{"messageId": m["MessageId"], "body": m["Body"]}
+                                                    for m in messages]}, None)
+                    sqs.delete_message(QueueUrl=queue_url, ReceiptHandle=messages[0]["ReceiptHandle"])
+                latencies.append((time.perf_counter() - start) * 1000 + (args.window_ms if mode == "async" else 0))
+                assert response["statusCode"] == 200, response
+
+            calls = ", ".join(f"{op} {count / len(exercises):.1f}" for op, count in sorted(counter.calls.items())
+                              if op.startswith(("dynamodb.", "sns.")))
+            print(f"{mode:>7} {percentile(latencies, 50):>8.2f} {percentile(latencies, 95):>8.2f} "
+                  f"{percentile(latencies, 99):>8.2f}  {calls}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+Read cost of finding an open exercise as the answered history of a user grows.
+
+Compares the old filtered query over the whole user partition (paginated, as
+it would have to be to be correct past 1 MB) with the query of get-exercise on
+the sparse open exercise index, a few candidates plus the consistent GetItem
+that confirms the first one.
+
+    python benchmarks/bench_open_index.py --history 10 100 1000 10000 100000
+"""
+import argparse
+import json
+import math
+import os
+import time
+import uuid
+
+import boto3
+from boto3.dynamodb.conditions import Attr, Key
+from moto import mock_aws
+
+from local_aws import create_exercise_table, load_lambda
+
+OPEN_EXERCISES = 5
+
+
+def fill(table, uid, answered):
+    now = int(time.time())
+    with table.batch_writer() as batch:
+        for i in range(answered):
+            batch.put_item(Item={
+                "uid": uid, "id": str(uuid.uuid4()), "answered": True, "correctness": True,
+                "exercise": {"type": "addition", "addends": [3, 4, 5]}, "answer": "12", "solveTime": now - i,
+            })
+        for i in range(OPEN_EXERCISES):
+            batch.put_item(Item={
+                "uid": uid, "id": str(uuid.uuid4()), "answered": False, "openSince": now * 1000 + i,
+                "exercise": {"type": "addition", "addends": [3, 4, 5]},
+            })
+
+
+def read_units(items_scanned, item_bytes, consistent=True):
+    # strongly consistent reads cost one unit per started 4 KB of scanned data, eventually consistent half
+    units = math.ceil(items_scanned * item_bytes / 4096)
+    return units if consistent else units / 2
+
+
+def filtered_query(table, uid):
+    scanned, pages = 0, 0
+    kwargs = {
+        "KeyConditionExpression": Key("uid").eq(uid),
+        "FilterExpression": Attr("answered").eq(False),
+        "ConsistentRead": True,
+    }
+    while True:
+        response = table.query(**kwargs)
+        scanned += response["ScannedCount"]
+        pages += 1
+        if "LastEvaluatedKey" not in response:
+            return scanned, pages
+        kwargs["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+
+
+def index_query(table, uid, candidates):
+    response = table.query(
+        IndexName=table.name + "OpenGSI",
+        KeyConditionExpression=Key("uid").eq(uid),
+        Limit=candidates,
+    )
+    return response["ScannedCount"], 1
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--history", type=int, nargs="+", default=[10, 100, 1000, 10000, 100000],
+                        help="answered exercises per user")
+    args = parser.parse_args()
+
+    with mock_aws():
+        os.environ["TABLE_NAME"] = create_exercise_table("addition")
+        table = boto3.resource("dynamodb").Table(os.environ["TABLE_NAME"])
+        get_exercise = load_lambda("get-exercise.py")
+        item_bytes = len(json.dumps({"uid": str(uuid.uuid4()), "id": str(uuid.uuid4()), "answered": True,
+                                     "exercise": {"type": "addition", "addends": [3, 4, 5]}}))
+
+        print(f"{'history':>8} {'filtered RCU':>13} {'pages':>6} {'index RCU':>10} {'get-exercise ms':>16}")
+        for answered in args.history:
+            uid = str(uuid.uuid4())
+            fill(table, uid, answered)
+
+            filtered_scanned, pages = filtered_query(table, uid)
+            index_scanned, _ = index_query(table, uid, get_exercise.CANDIDATES)
+
+            event = {"requestContext": {"authorizer": {"claims": {"sub": uid}}}}
+            start = time.perf_counter()
+            assert get_exercise.handler(event, None)["statusCode"] == 200
+            latency = (time.perf_counter() - start) * 1000
+
+            # the confirming GetItem of one item is one strongly consistent unit
+            index_units = read_units(index_scanned, item_bytes, consistent=False) + read_units(1, item_bytes)
+            print(f"{answered:>8} {read_units(filtered_scanned, item_bytes):>13} {pages:>6} "
+                  f"{index_units:>10} {latency:>16.2f}")
+
+
+if __name__ == "__main__":
+    main()
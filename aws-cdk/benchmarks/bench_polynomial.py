@@ -0,0 +1,84 @@
+"""
+Solving derivative exercises and bringing submitted answers into canonical form:
+a per-record Python loop versus the vectorized polynomial module, for batches of
+growing size. These are the two steps production runs: the generators solve a
+batch to store its answer keys (answer_keys.solve_all), the evaluators and inline
+grading canonicalize a batch of answers (exercise_types.encode_polynomials) and
+then only compare keys.
+
+    python benchmarks/bench_polynomial.py --batches 10 100 1000
+"""
+import argparse
+import time
+
+import numpy as np
+
+from local_aws import load_lambda, percentile
+
+
+def derivative_loop(coeffs, order=1):
+    # per-record Python loop with the semantics of the polynomial module (zeros, negatives, order)
+    power = len(coeffs) - 1
+    derived = []
+    for i, coeff in enumerate(coeffs[:len(coeffs) - order]):
+        factor = 1
+        for k in range(order):
+            factor *= power - i - k
+        derived.append(coeff * factor)
+
+    while len(derived) > 1 and derived[0] == 0:
+        derived.pop(0)
+    derived = derived or [0]
+    return {"power": len(derived) - 1, "coeffs": derived}
+
+
+def canonical_loop(answer):
+    # per-record Python loop with the semantics of polynomial.canonical
+    coeffs = answer.get("coeffs") if isinstance(answer, dict) else None
+    if not isinstance(coeffs, list) or not all(isinstance(c, (int, float)) and not isinstance(c, bool) for c in coeffs):
+        return None
+
+    coeffs = [int(c) if c == int(c) else c for c in coeffs]
+    while len(coeffs) > 1 and coeffs[0] == 0:
+        coeffs.pop(0)
+    coeffs = coeffs or [0]
+    return {"power": len(coeffs) - 1, "coeffs": coeffs}
+
+
+def timed(function, iterations):
+    latencies = []
+    for i in range(iterations):
+        start = time.perf_counter()
+        function()
+        latencies.append((time.perf_counter() - start) * 1000)
+    return percentile(latencies, 50)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--batches", type=int, nargs="+", default=[10, 100, 1000], help="exercises per batch")
+    parser.add_argument("--iterations", type=int, default=50)
+    args = parser.parse_args()
+
+    polynomial = load_lambda("polynomial.py")
+    rng = np.random.default_rng(1)
+
+    print(f"{'batch':>6} {'loop solve ms':>14} {'vector solve ms':>16} {'loop canon ms':>14} {'vector canon ms':>16}")
+    for size in args.batches:
+        exercises = polynomial.generate(size, rng)
+        answers = polynomial.derivatives(exercises)
+
+        loop_solve = timed(lambda: [derivative_loop(e["coeffs"]) for e in exercises], args.iterations)
+        vector_solve = timed(lambda: polynomial.derivatives(exercises), args.iterations)
+        # submitted answers as a client sends them, some with a leading zero or float coefficients
+        submitted = [{**a, "coeffs": [0] + a["coeffs"]} if i % 3 == 0 else
+                     {**a, "coeffs": [float(c) for c in a["coeffs"]]} if i % 3 == 1 else a
+                     for i, a in enumerate(answers)]
+        loop_canonical = timed(lambda: [canonical_loop(a) for a in submitted], args.iterations)
+        vector_canonical = timed(lambda: polynomial.canonical(submitted), args.iterations)
+
+        print(f"{size:>6} {loop_solve:>14.3f} {vector_solve:>16.3f} {loop_canonical:>14.3f} {vector_canonical:>16.3f}")
+
+
+if __name__ == "__main__":
+    main()
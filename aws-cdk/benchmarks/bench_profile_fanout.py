@@ -0,0 +1,77 @@
+"""
+Latency of loading the results page: get-profile plus the first history page
+of every exercise type, with get-history querying the types sequentially
+(FANOUT_WORKERS=1) or in parallel.
+
+A fixed delay per AWS call stands in for the round trip to DynamoDB.
+
+    python benchmarks/bench_profile_fanout.py --latency-ms 15 --history 200
+"""
+import argparse
+import os
+import time
+import uuid
+
+import boto3
+from moto import mock_aws
+
+from local_aws import (EXERCISE_TYPES, CallCounter, create_exercise_table, create_user_count_table, load_lambda,
+                       percentile, simulate_latency)
+
+
+def fill(uid, history):
+    now = int(time.time())
+    dynamodb = boto3.resource("dynamodb")
+    for exercise_type in EXERCISE_TYPES:
+        with dynamodb.Table("Exercise" + exercise_type).batch_writer() as batch:
+            for i in range(history):
+                batch.put_item(Item={
+                    "uid": uid, "id": str(uuid.uuid4()), "answered": True, "correctness": i % 3 != 0,
+                    "exercise": {"type": exercise_type, "addends": [3, 4, 5]}, "answer": "12", "solveTime": now - i,
+                })
+        dynamodb.Table("UserCount").put_item(Item={
+            "uid": uid, "etype": exercise_type, "correctCount": history - history // 3, "falseCount": history // 3,
+        })
+
+
+def run(mode, workers, counter, event, iterations):
+    os.environ["FANOUT_WORKERS"] = str(workers)
+    get_profile = load_lambda("get-profile.py")
+    get_history = load_lambda("get-history.py")
+
+    latencies = []
+    counter.reset()
+    for i in range(iterations):
+        start = time.perf_counter()
+        assert get_profile.handler(event, None)["statusCode"] == 200
+        assert get_history.handler(event, None)["statusCode"] == 200
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    print(f"{mode:>10}: {counter.total() / iterations:4.1f} calls/load  p50 {percentile(latencies, 50):7.2f} ms  "
+          f"p95 {percentile(latencies, 95):7.2f} ms  p99 {percentile(latencies, 99):7.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--latency-ms", type=float, default=15, help="simulated round trip per AWS call")
+    parser.add_argument("--history", type=int, default=200, help="answered exercises per type")
+    parser.add_argument("--iterations", type=int, default=50)
+    args = parser.parse_args()
+
+    with mock_aws():
+        counter = CallCounter()
+        for exercise_type in EXERCISE_TYPES:
+            create_exercise_table(exercise_type)
+        os.environ["TABLE_USER_COUNT"] = create_user_count_table()
+
+        uid = str(uuid.uuid4())
+        fill(uid, args.history)
+        event = {"requestContext": {"authorizer": {"claims": {"sub": uid}}}, "pathParameters": None}
+
+        simulate_latency(args.latency_ms)
+        run("sequential", 1, counter, event, args.iterations)
+        run("parallel", len(EXERCISE_TYPES), counter, event, args.iterations)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+"""
+Onboarding a class: one signup plus post_confirmation per student versus one
+roster import (lambdas/../cognito/roster.py). Reports the wall time, the AWS
+calls, the peak rate of Cognito calls against the UserCreation quota, the
+generation messages and the generator invocations they take, and checks that
+the initial pools of the imported students are written.
+
+moto runs no Cognito triggers, post_confirmation is invoked after each signup
+as the user pool would.
+
+    python benchmarks/bench_roster.py --students 500 --latency 20
+    python benchmarks/bench_roster.py --students 500 --passwords
+"""
+import argparse
+import json
+import os
+import time
+import uuid
+from collections import Counter
+
+import boto3
+from boto3.dynamodb.conditions import Key
+from moto import mock_aws
+
+from local_aws import (EXERCISE_TYPES, CallCounter, create_exercise_table, create_user_table, load_lambda,
+                       simulate_latency)
+
+# default quota of AdminCreateUser and SignUp per user pool
+USER_CREATION_QUOTA = 50
+# batchSize of the generators' SqsEventSource in lambda-stack.ts
+GENERATOR_BATCH = 5
+REFILL_POLICY = {"addition": {"low": 5, "high": 10}, "multiplication": {"low": 5, "high": 10},
+                 "derivatives": {"low": 3, "high": 8}}
+
+
+def generate_queue(topic_arn):
+    sqs = boto3.client("sqs")
+    queue_url = sqs.create_queue(QueueName=f"Generate-{uuid.uuid4().hex[:8]}")["QueueUrl"]
+    queue_arn = sqs.get_queue_attributes(QueueUrl=queue_url, AttributeNames=["QueueArn"])["Attributes"]["QueueArn"]
+    boto3.client("sns").subscribe(TopicArn=topic_arn, Protocol="sqs", Endpoint=queue_arn)
+    return queue_url
+
+
+def drain(queue_url):
+    sqs = boto3.client("sqs")
+    messages = []
+    while True:
+        received = sqs.receive_message(QueueUrl=queue_url, MaxNumberOfMessages=10).get("Messages", [])
+        if not received:
+            return messages
+        messages.extend(received)
+        sqs.delete_message_batch(QueueUrl=queue_url, Entries=[
+            {"Id": str(i), "ReceiptHandle": m["ReceiptHandle"]} for i, m in enumerate(received)])
+
+
+def students(count):
+    return [{"email": f"student{i}-{uuid.uuid4().hex[:6]}@example.com", "firstName": "Student", "lastName": str(i),
+             "password": "Passw0rd!Passw0rd"} for i in range(count)]
+
+
+def peak_rate(timestamps):
+    # most calls within one second
+    timestamps = sorted(timestamps)
+    peak = start = 0
+    for end, t in enumerate(timestamps):
+        while t - timestamps[start] >= 1:
+            start += 1
+        peak = max(peak, end - start + 1)
+    return peak
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--students", type=int, default=500)
+    parser.add_argument("--latency", type=float, default=20.0, help="simulated ms per AWS call")
+    parser.add_argument("--passwords", action="store_true",
+                        help="import with passwords (one more Cognito call each) instead of invitations")
+    args = parser.parse_args()
+
+    with mock_aws():
+        counter = CallCounter()
+        cognito_calls = []
+        boto3.DEFAULT_SESSION.events.register(
+            "before-call.cognito-idp", lambda **kwargs: cognito_calls.append(time.monotonic()))
+        if args.latency:
+            simulate_latency(args.latency)
+
+        cognito = boto3.client("cognito-idp")
+        user_pool_id = cognito.create_user_pool(PoolName="UserPool")["UserPool"]["Id"]
+        client_id = cognito.create_user_pool_client(
+            UserPoolId=user_pool_id, ClientName="UserPoolClient")["UserPoolClient"]["ClientId"]
+        topic_arn = boto3.client("sns").create_topic(Name="ExerciseGenerateTopic")["TopicArn"]
+        tables = {exercise_type: create_exercise_table(exercise_type) for exercise_type in EXERCISE_TYPES}
+        os.environ.update({
+            "CLIENT_ID": client_id,
+            "USER_POOL_ID": user_pool_id,
+            "TABLE_NAME": create_user_table(),
+            "SNS_TOPIC_ARN": topic_arn,
+            "REFILL_POLICY": json.dumps(REFILL_POLICY),
+            "EXERCISE_TYPES": json.dumps(EXERCISE_TYPES),
+        })
+
+        signup = load_lambda("signup.py", "cognito")
+        post_confirmation = load_lambda("post_confirmation.py", "cognito")
+        roster = load_lambda("roster.py", "cognito")
+        generators = load_lambda("generators.py")
+
+        print(f"{'mode':>12} {'seconds':>8} {'Cognito peak/s':>15} {'SNS messages':>13} {'generator runs':>15}  AWS calls")
+        for mode in ("per student", "roster"):
+            queue_url = generate_queue(topic_arn)
+            roster_students = students(args.students)
+            counter.reset()
+            cognito_calls.clear()
+
+            start = time.perf_counter()
+            if mode == "per student":
+                for student in roster_students:
+                    response = signup.handler({"body": json.dumps(student)}, None)
+                    uid = json.loads(response["body"])["data"]["UserSub"]
+                    event = {"request": {"userAttributes": {"sub": uid, "given_name": student["firstName"],
+                                                            "family_name": student["lastName"]}}}
+                    post_confirmation.handler(event, None)
+                uids = None
+            else:
+                if not args.passwords:
+                    roster_students = [{k: v for k, v in s.items() if k != "password"} for s in roster_students]
+                claims = {"sub": "teacher", "cognito:groups": "teachers"}
+                event = {"requestContext": {"authorizer": {"claims": claims}},
+                         "body": json.dumps({"students": roster_students})}
+                report = json.loads(roster.handler(event, None)["body"])
+                uids = [s["uid"] for s in report["students"] if s["status"] == "created"]
+            seconds = time.perf_counter() - start
+            calls = dict(counter.calls)
+
+            messages = drain(queue_url)
+            per_type = Counter(json.loads(json.loads(m["Body"])["Message"])["type"] for m in messages)
+            generator_runs = sum(-(-count // GENERATOR_BATCH) for count in per_type.values())
+            summary = ", ".join(f"{name} {count}" for name, count in sorted(calls.items()))
+            print(f"{mode:>12} {seconds:>8.1f} {peak_rate(cognito_calls):>10} / {USER_CREATION_QUOTA:<2} "
+                  f"{len(messages):>13} {generator_runs:>15}  {summary}")
+
+            if uids is not None:
+                # the generators take the multi-user messages in SQS batches, every student gets the full pool
+                for exercise_type in EXERCISE_TYPES:
+                    records = [{"messageId": m["MessageId"], "body": m["Body"]} for m in messages
+                               if json.loads(json.loads(m["Body"])["Message"])["type"] == exercise_type]
+                    os.environ.update(TABLE_NAME=tables[exercise_type], EXERCISE_TYPE=exercise_type)
+                    for i in range(0, len(records), GENERATOR_BATCH):
+                        generators.handler({"Records": records[i:i + GENERATOR_BATCH]}, None)
+                table = boto3.resource("dynamodb").Table(tables["addition"])
+                pools = {table.query(KeyConditionExpression=Key("uid").eq(uid), Select="COUNT")["Count"]
+                         for uid in uids[:20]}
+                print(f"{'':>12} {report['created']} created, {report['failed']} failed, "
+                      f"addition pools of the first 20 students: {sorted(pools)}")
+
+
+if __name__ == "__main__":
+    main()
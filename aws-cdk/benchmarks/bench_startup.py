@@ -0,0 +1,133 @@
+"""
+Cold init and warm invocation time of every Python handler.
+
+Cold init is the import of the handler module in a fresh interpreter, without
+moto (which would import boto3 ahead of the handler). Invocations run in a
+second fresh interpreter against moto: the first invocation after init and the
+following warm ones.
+
+    python benchmarks/bench_startup.py --runs 5 --invocations 50
+"""
+import argparse
+import importlib.util
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+LIB_DIR = os.path.join(BENCHMARK_DIR, "..", "lib")
+
+# name: (code directory, file, handler function)
+HANDLERS = {
+    "generators": ("lambdas", "generators.py", "handler"),
+    "evaluator": ("lambdas", "evaluator_lambdas.py", "handler"),
+    "get-exercise": ("lambdas", "get-exercise.py", "handler"),
+    "get-profile": ("lambdas", "get-profile.py", "handler"),
+    "get-history": ("lambdas", "get-history.py", "handler"),
+    "post-solution": ("lambdas", "post-solution.py", "handler"),
+    "watcher": ("lambdas", "watcher.py", "handler"),
+    "post_confirmation": ("cognito", "post_confirmation.py", "handler"),
+}
+
+
+def child_init(name):
+    directory, filename, function = HANDLERS[name]
+    os.environ.update({"AWS_DEFAULT_REGION": "eu-central-1", "AWS_ACCESS_KEY_ID": "test",
+                       "AWS_SECRET_ACCESS_KEY": "test", "EXERCISE_TYPE": "addition"})
+    sys.path[:0] = [os.path.join(LIB_DIR, "layer", "python"), os.path.join(LIB_DIR, directory)]
+
+    start = time.perf_counter()
+    spec = importlib.util.spec_from_file_location(filename[:-3].replace("-", "_"), os.path.join(LIB_DIR, directory, filename))
+    spec.loader.exec_module(importlib.util.module_from_spec(spec))
+    print(json.dumps({"init_ms": (time.perf_counter() - start) * 1000}))
+
+
+def child_invoke(name, invocations):
+    import uuid
+
+    import boto3
+    from moto import mock_aws
+
+    import local_aws
+
+    directory, filename, function = HANDLERS[name]
+    with mock_aws():
+        local_aws.create_exercise_table("addition")
+        local_aws.create_user_table()
+        topic_arn = boto3.client("sns").create_topic(Name="ExerciseTopic")["TopicArn"]
+        os.environ.update({
+            "TABLE_NAME": "User" if name == "post_confirmation" else "Exerciseaddition",
+            "TABLE_EXERCISE": "Exerciseaddition",
+            "TABLE_USER_COUNT": local_aws.create_user_count_table(),
+            "TABLE_SUBMISSION_DEDUPE": local_aws.create_submission_dedupe_table(),
+            "SNS_TOPIC_ARN": topic_arn,
+            "EXERCISE_TYPE": "addition",
+        })
+
+        uid = str(uuid.uuid4())
+        generators = local_aws.load_lambda("generators.py")
+        exercises = generators.refill_now(generators.dynamodb.Table("Exerciseaddition"), "addition", uid,
+                                          invocations + 1)
+
+        def event(i):
+            exercise = exercises[i]
+            if name == "generators":
+                return local_aws.sqs_event([{"uid": uid, "type": "addition", "count": 10}])
+            if name == "evaluator":
+                return local_aws.sqs_event([{"uid": uid, "eid": exercise["id"], "solution": 3}])
+            if name == "post-solution":
+                return local_aws.api_event(uid, {"eid": exercise["id"], "solution": 3})
+            if name == "watcher":
+                return local_aws.stream_event([uid])
+            if name == "post_confirmation":
+                return {"request": {"userAttributes": {"sub": str(uuid.uuid4()), "given_name": "A", "family_name": "B"}}}
+            return local_aws.api_event(uid)
+
+        handler = getattr(local_aws.load_lambda(filename, directory), function)
+
+        start = time.perf_counter()
+        handler(event(0), None)
+        first = (time.perf_counter() - start) * 1000
+
+        warm = []
+        for i in range(1, invocations + 1):
+            start = time.perf_counter()
+            handler(event(i), None)
+            warm.append((time.perf_counter() - start) * 1000)
+
+    print(json.dumps({"first_ms": first, "warm_p50_ms": local_aws.percentile(warm, 50),
+                      "warm_p99_ms": local_aws.percentile(warm, 99)}))
+
+
+def run_child(*args):
+    output = subprocess.run([sys.executable, __file__, *args], cwd=BENCHMARK_DIR, check=True,
+                            capture_output=True, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5, help="fresh interpreters per cold init measurement")
+    parser.add_argument("--invocations", type=int, default=50, help="warm invocations per handler")
+    parser.add_argument("--child-init")
+    parser.add_argument("--child-invoke")
+    args = parser.parse_args()
+
+    if args.child_init:
+        return child_init(args.child_init)
+    if args.child_invoke:
+        return child_invoke(args.child_invoke, args.invocations)
+
+    print(f"{'handler':>18} {'cold init ms':>13} {'first call ms':>14} {'warm p50 ms':>12} {'warm p99 ms':>12}")
+    for name in HANDLERS:
+        init = statistics.median(run_child("--child-init", name)["init_ms"] for i in range(args.runs))
+        invoke = run_child("--child-invoke", name, "--invocations", str(args.invocations))
+        print(f"{name:>18} {init:>13.1f} {invoke['first_ms']:>14.2f} {invoke['warm_p50_ms']:>12.2f} "
+              f"{invoke['warm_p99_ms']:>12.2f}")
+
+
+if __name__ == "__main__":
+    main()
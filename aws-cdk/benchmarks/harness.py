@@ -0,0 +1,351 @@
+"""
+Load test of the whole exercise loop, every Python handler in-process against moto:
+
+    signup -> post_confirmation -> generators -> get-exercise -> post-solution
+           -> evaluator_lambdas -> watcher -> generators ...    and get-profile
+
+Synthetic users arrive at --rate per second. SNS -> SQS delivery goes through moto
+with the filter policies of lambda-stack.ts, the queues are drained in batches
+like the SqsEventSource would. moto has no stream triggers, so the exercises
+graded by an evaluator batch or inline by post-solution (--grading inline) are
+handed to the watcher as the MODIFY records they cause.
+
+Reports throughput, p50/p95/p99 latency and the DynamoDB/SNS calls per invocation
+of every stage. A run can be saved as baseline and later runs compared to it:
+
+    python benchmarks/harness.py --users 50 --rate 10 --save baseline.json
+    python benchmarks/harness.py --users 50 --rate 10 --compare baseline.json
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+import uuid
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+
+import boto3
+from moto import mock_aws
+
+import local_aws
+from local_aws import EXERCISE_TYPES, CallCounter, api_event, percentile, simulate_latency, stream_event
+
+PERCENTILES = (50, 95, 99)
+
+
+class Stage:
+    """Latency, items and AWS calls of all invocations of one handler."""
+
+    def __init__(self):
+        self.latencies = []
+        self.items = 0
+        self.calls = Counter()
+
+    def summary(self, wall_seconds):
+        invocations = len(self.latencies)
+        return {
+            "invocations": invocations,
+            "items": self.items,
+            "throughput": self.items / wall_seconds if wall_seconds else 0.0,
+            **{f"p{p}_ms": percentile(self.latencies, p) for p in PERCENTILES},
+            "calls_per_invocation": {name: count / invocations for name, count in sorted(self.calls.items())},
+        }
+
+
+class Harness:
+
+    def __init__(self, wrong_share, latency_ms, grading="async"):
+        self.wrong_share = wrong_share
+        self.grading = grading
+        self.counter = CallCounter()
+        if latency_ms:
+            simulate_latency(latency_ms)
+        self.stages = defaultdict(Stage)
+        self.graded = 0
+        # uids of graded exercises per type, the MODIFY records not yet seen by the watcher
+        self.stream = defaultdict(list)
+
+        self.tables = {exercise_type: local_aws.create_exercise_table(exercise_type) for exercise_type in EXERCISE_TYPES}
+        self.user_table = local_aws.create_user_table()
+        self.user_count_table = local_aws.create_user_count_table()
+        self.submission_dedupe_table = local_aws.create_submission_dedupe_table()
+
+        cognito = boto3.client("cognito-idp")
+        self.user_pool_id = cognito.create_user_pool(PoolName="UserPool")["UserPool"]["Id"]
+        self.client_id = cognito.create_user_pool_client(
+            UserPoolId=self.user_pool_id, ClientName="UserPoolClient")["UserPoolClient"]["ClientId"]
+
+        sns = boto3.client("sns")
+        self.generate_topic = sns.create_topic(Name="ExerciseGenerateTopic")["TopicArn"]
+        self.evaluate_topic = sns.create_topic(Name="ExerciseEvaluateTopic")["TopicArn"]
+        self.generate_queues = {t: self.subscribe_queue(self.generate_topic, "Generate", t) for t in EXERCISE_TYPES}
+        self.evaluate_queues = {t: self.subscribe_queue(self.evaluate_topic, "Evaluate", t) for t in EXERCISE_TYPES}
+
+        self.signup = local_aws.load_lambda("signup.py", "cognito")
+        self.post_confirmation = local_aws.load_lambda("post_confirmation.py", "cognito")
+        self.generators = local_aws.load_lambda("generators.py")
+        self.get_exercise = local_aws.load_lambda("get-exercise.py")
+        self.post_solution = local_aws.load_lambda("post-solution.py")
+        self.evaluators = local_aws.load_lambda("evaluator_lambdas.py")
+        self.watcher = local_aws.load_lambda("watcher.py")
+        self.get_profile = local_aws.load_lambda("get-profile.py")
+        self.answer_keys = local_aws.load_lambda("answer_keys.py")
+
+    def subscribe_queue(self, topic_arn, name, exercise_type):
+        sqs = boto3.client("sqs")
+        queue_url = sqs.create_queue(QueueName=f"Exercise{name}Queue{exercise_type}")["QueueUrl"]
+        queue_arn = sqs.get_queue_attributes(QueueUrl=queue_url, AttributeNames=["QueueArn"])["Attributes"]["QueueArn"]
+        boto3.client("sns").subscribe(
+            TopicArn=topic_arn, Protocol="sqs", Endpoint=queue_arn,
+            Attributes={"FilterPolicy": json.dumps(
+                {"type": [exercise_type]} if name == "Generate" else {"type": [exercise_type], "event": [{"exists": False}]}
+            )},
+        )
+        return queue_url
+
+    @contextmanager
+    def environment(self, **variables):
+        # the handlers of all types share one process, each reads its own environment per invocation
+        previous = {name: os.environ.get(name) for name in variables}
+        os.environ.update(variables)
+        try:
+            yield
+        finally:
+            for name, value in previous.items():
+                if value is None:
+                    os.environ.pop(name, None)
+                else:
+                    os.environ[name] = value
+
+    def invoke(self, stage_name, function, event, items=1, **variables):
+        stage = self.stages[stage_name]
+        before = Counter(self.counter.calls)
+
+        with self.environment(**variables):
+            start = time.perf_counter()
+            result = function(event, None)
+            stage.latencies.append((time.perf_counter() - start) * 1000)
+
+        stage.items += items
+        stage.calls.update(self.counter.calls - before)
+        return result
+
+    # user steps
+
+    def register(self):
+        email = f"{uuid.uuid4().hex[:12]}@example.com"
+        body = {"email": email, "password": "Passw0rd!Passw0rd", "firstName": "Load", "lastName": "Test"}
+        response = self.invoke("signup", self.signup.handler, {"body": json.dumps(body)}, CLIENT_ID=self.client_id)
+        uid = json.loads(response["body"])["data"]["UserSub"]
+
+        # the confirmation code step of the client, not part of any handler
+        boto3.client("cognito-idp").admin_confirm_sign_up(UserPoolId=self.user_pool_id, Username=email)
+        event = {"request": {"userAttributes": {"sub": uid, "given_name": "Load", "family_name": "Test"}}}
+        self.invoke("post_confirmation", self.post_confirmation.handler, event,
+                    TABLE_NAME=self.user_table, SNS_TOPIC_ARN=self.generate_topic)
+        return uid
+
+    def solve_one(self, uid):
+        exercise_type = random.choice(EXERCISE_TYPES)
+        response = self.invoke("get-exercise", self.get_exercise.handler, api_event(uid),
+                               TABLE_NAME=self.tables[exercise_type], EXERCISE_TYPE=exercise_type,
+                               TABLE_USER_COUNT=self.user_count_table)
+        if response["statusCode"] != 200:
+            return
+
+        exercise = json.loads(response["body"])
+        solution = self.answer_keys.solve(exercise["exercise"])
+        if random.random() < self.wrong_share:
+            solution = {"power": -1, "coeffs": []} if isinstance(solution, dict) else solution + 1
+
+        response = self.invoke("post-solution", self.post_solution.handler,
+                               api_event(uid, {"eid": exercise["id"], "solution": solution}),
+                               EXERCISE_TYPE=exercise_type, SNS_TOPIC_ARN=self.evaluate_topic,
+                               TABLE_SUBMISSION_DEDUPE=self.submission_dedupe_table, GRADING_MODE=self.grading,
+                               TABLE_EXERCISE=self.tables[exercise_type], TABLE_USER_COUNT=self.user_count_table)
+        if "correct" in json.loads(response["body"]):
+            self.graded += 1
+            self.stream[exercise_type].append(uid)
+
+    def profile(self, uid):
+        self.invoke("get-profile", self.get_profile.handler, api_event(uid), TABLE_USER_COUNT=self.user_count_table)
+
+    # asynchronous part
+
+    def receive(self, queue_url, batch_size):
+        sqs = boto3.client("sqs")
+        messages = []
+        while len(messages) < batch_size:
+            received = sqs.receive_message(QueueUrl=queue_url, MaxNumberOfMessages=min(10, batch_size - len(messages)))
+            if not received.get("Messages"):
+                break
+            messages.extend(received["Messages"])
+        return messages
+
+    def delete(self, queue_url, messages):
+        sqs = boto3.client("sqs")
+        for i in range(0, len(messages), 10):
+            sqs.delete_message_batch(QueueUrl=queue_url, Entries=[
+                {"Id": str(n), "ReceiptHandle": m["ReceiptHandle"]} for n, m in enumerate(messages[i:i + 10])
+            ])
+
+    def drain(self, generator_batch, evaluator_batch, watcher_batch):
+        """Delivers queued messages until the loop is quiet."""
+        while True:
+            delivered = 0
+
+            for exercise_type, queue_url in self.generate_queues.items():
+                messages = self.receive(queue_url, generator_batch)
+                if messages:
+                    event = {"Records": [{"messageId": m["MessageId"], "body": m["Body"]} for m in messages]}
+                    self.invoke("generators", self.generators.handler, event, items=len(messages),
+                                TABLE_NAME=self.tables[exercise_type], EXERCISE_TYPE=exercise_type,
+                                TABLE_USER_COUNT=self.user_count_table)
+                    self.delete(queue_url, messages)
+                    delivered += 1
+
+            for exercise_type, queue_url in self.evaluate_queues.items():
+                messages = self.receive(queue_url, evaluator_batch)
+                if not messages:
+                    continue
+
+                event = {"Records": [{"messageId": m["MessageId"], "body": m["Body"]} for m in messages]}
+                result = self.invoke("evaluator", self.evaluators.handler, event, items=len(messages),
+                                     TABLE_EXERCISE=self.tables[exercise_type], TABLE_USER_COUNT=self.user_count_table,
+                                     EXERCISE_TYPE=exercise_type)
+                failed = {failure["itemIdentifier"] for failure in result["batchItemFailures"]}
+                # failed messages become visible again and are redelivered, like with the SqsEventSource
+                self.delete(queue_url, [m for m in messages if m["MessageId"] not in failed])
+                self.graded += len(messages) - len(failed)
+                delivered += 1
+                self.stream[exercise_type].extend(json.loads(json.loads(m["Body"])["Message"])["uid"] for m in messages)
+
+            for exercise_type, uids in self.stream.items():
+                for i in range(0, len(uids), watcher_batch):
+                    self.invoke("watcher", self.watcher.handler, stream_event(uids[i:i + watcher_batch]),
+                                items=len(uids[i:i + watcher_batch]), TABLE_NAME=self.tables[exercise_type],
+                                EXERCISE_TYPE=exercise_type, SNS_TOPIC_ARN=self.generate_topic,
+                                TABLE_USER_COUNT=self.user_count_table)
+                    delivered += 1
+            self.stream.clear()
+
+            if not delivered:
+                return
+
+
+def run(args):
+    random.seed(args.seed)
+    # read by lambdas/codec.py when the handlers are loaded, like EXERCISE_ENCODING of lambda-stack.ts
+    os.environ["EXERCISE_ENCODING"] = args.encoding
+
+    with mock_aws():
+        harness = Harness(args.wrong, args.latency, args.grading)
+        # every user: sign up, solve --exercises exercises, look at the profile
+        steps = {}
+        arrivals = 0
+        start = time.perf_counter()
+
+        while arrivals < args.users or steps:
+            elapsed = time.perf_counter() - start
+            while arrivals < args.users and arrivals <= elapsed * args.rate:
+                steps[harness.register()] = 0
+                arrivals += 1
+                # the initial pool is generated while the new user looks at the dashboard
+                harness.drain(args.generator_batch, args.evaluator_batch, args.watcher_batch)
+
+            for uid in list(steps):
+                if steps[uid] < args.exercises:
+                    harness.solve_one(uid)
+                    steps[uid] += 1
+                else:
+                    harness.profile(uid)
+                    del steps[uid]
+
+            harness.drain(args.generator_batch, args.evaluator_batch, args.watcher_batch)
+
+            if not steps and arrivals < args.users:
+                time.sleep(max(0.0, (arrivals / args.rate) - (time.perf_counter() - start)))
+
+        wall_seconds = time.perf_counter() - start
+
+    return {
+        "config": {name: value for name, value in vars(args).items() if name not in ("save", "compare")},
+        "wall_seconds": wall_seconds,
+        "graded_per_second": harness.graded / wall_seconds,
+        "stages": {name: stage.summary(wall_seconds) for name, stage in harness.stages.items()},
+    }
+
+
+def report(result):
+    print(f"{result['graded_per_second']:.1f} graded submissions/s over {result['wall_seconds']:.1f} s\n")
+    print(f"{'stage':>18} {'calls':>6} {'items/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}  AWS calls/invocation")
+    for name, stage in result["stages"].items():
+        calls = ", ".join(f"{op} {count:.1f}" for op, count in stage["calls_per_invocation"].items()
+                          if op.startswith(("dynamodb.", "sns.")))
+        print(f"{name:>18} {stage['invocations']:>6} {stage['throughput']:>8.1f} {stage['p50_ms']:>8.2f} "
+              f"{stage['p95_ms']:>8.2f} {stage['p99_ms']:>8.2f}  {calls}")
+
+
+def compare(result, baseline, tolerance):
+    """Prints the change against a baseline, returns the regressions beyond the tolerance."""
+    regressions = []
+    print(f"\ncompared to baseline (tolerance {tolerance:.0%}):")
+
+    for name, stage in result["stages"].items():
+        before = baseline["stages"].get(name)
+        if not before:
+            print(f"{name:>18}  new stage")
+            continue
+
+        values = [(f"p{p}_ms", stage[f"p{p}_ms"], before[f"p{p}_ms"]) for p in PERCENTILES]
+        for op in sorted(set(stage["calls_per_invocation"]) | set(before["calls_per_invocation"])):
+            values.append((op, stage["calls_per_invocation"].get(op, 0.0), before["calls_per_invocation"].get(op, 0.0)))
+
+        changes = []
+        for label, now, then in values:
+            change = (now - then) / then if then else (1.0 if now else 0.0)
+            if change > tolerance:
+                regressions.append(f"{name} {label}: {then:.2f} -> {now:.2f}")
+            changes.append(f"{label} {change:+.0%}")
+        print(f"{name:>18}  " + ", ".join(changes))
+
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=20, help="synthetic users")
+    parser.add_argument("--rate", type=float, default=5.0, help="user arrivals per second")
+    parser.add_argument("--exercises", type=int, default=5, help="exercises solved per user")
+    parser.add_argument("--wrong", type=float, default=0.2, help="share of wrong answers")
+    parser.add_argument("--latency", type=float, default=0.0, help="simulated ms per AWS call")
+    parser.add_argument("--generator-batch", type=int, default=10, help="SQS batch size of the generators")
+    parser.add_argument("--evaluator-batch", type=int, default=25, help="SQS batch size of the evaluators")
+    parser.add_argument("--watcher-batch", type=int, default=100, help="stream batch size of the watchers")
+    parser.add_argument("--grading", choices=("async", "inline"), default="async", help="GRADING_MODE of post-solution")
+    parser.add_argument("--encoding", choices=("binary", "map"), default="binary", help="EXERCISE_ENCODING")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--save", help="write the result as JSON baseline")
+    parser.add_argument("--compare", help="baseline JSON to compare against, exits 1 on regressions")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="relative increase counted as regression")
+    args = parser.parse_args()
+
+    result = run(args)
+    report(result)
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(result, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(result, json.load(f), args.tolerance)
+        if regressions:
+            print("\nregressions:\n  " + "\n  ".join(regressions))
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,214 @@
+"""
+Helpers to run the Lambda handlers in-process against moto.
+
+The handlers create their boto3 clients at import time, so a module has to be
+loaded (load_lambda) after the mock has been started.
+"""
+import importlib.util
+import json
+import os
+import sys
+import time
+import uuid
+from collections import Counter
+
+import boto3
+
+os.environ.setdefault("AWS_ACCESS_KEY_ID", "test")
+os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "test")
+os.environ.setdefault("AWS_DEFAULT_REGION", "eu-central-1")
+# the EMF documents of every invocation would flood the output, METRICS=on measures with them
+os.environ.setdefault("METRICS", "off")
+
+LIB_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "lib")
+# SharedRuntimeLayer, on the path of every function in the Lambda runtime
+LAYER_DIR = os.path.join(LIB_DIR, "layer", "python")
+EXERCISE_TYPES = ["addition", "multiplication", "derivatives"]
+
+
+def load_lambda(filename, directory="lambdas"):
+    # file names like get-exercise.py are no valid module names
+    path = os.path.join(LIB_DIR, directory, filename)
+    # shared modules are imported from the code asset directory and the layer, as in the Lambda runtime
+    for module_dir in (LAYER_DIR, os.path.dirname(path)):
+        if module_dir not in sys.path:
+            sys.path.insert(0, module_dir)
+    name = os.path.splitext(filename)[0].replace("-", "_")
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def create_exercise_table(exercise_type):
+    # mirrors the Exercise<type> tables in dynamodb-stack.ts
+    table_name = "Exercise" + exercise_type
+    boto3.client("dynamodb").create_table(
+        TableName=table_name,
+        KeySchema=[
+            {"AttributeName": "uid", "KeyType": "HASH"},
+            {"AttributeName": "id", "KeyType": "RANGE"},
+        ],
+        AttributeDefinitions=[
+            {"AttributeName": "uid", "AttributeType": "S"},
+            {"AttributeName": "id", "AttributeType": "S"},
+            {"AttributeName": "solveTime", "AttributeType": "N"},
+            {"AttributeName": "openSince", "AttributeType": "N"},
+        ],
+        LocalSecondaryIndexes=[
+            {
+                "IndexName": table_name + "LSI",
+                "KeySchema": [
+                    {"AttributeName": "uid", "KeyType": "HASH"},
+                    {"AttributeName": "solveTime", "KeyType": "RANGE"},
+                ],
+                "Projection": {"ProjectionType": "ALL"},
+            },
+        ],
+        GlobalSecondaryIndexes=[
+            {
+                "IndexName": table_name + "OpenGSI",
+                "KeySchema": [
+                    {"AttributeName": "uid", "KeyType": "HASH"},
+                    {"AttributeName": "openSince", "KeyType": "RANGE"},
+                ],
+                "Projection": {"ProjectionType": "INCLUDE", "NonKeyAttributes": ["exercise", "answered"]},
+            },
+        ],
+        BillingMode="PAY_PER_REQUEST",
+    )
+    return table_name
+
+
+def create_user_table():
+    # mirrors the User table in dynamodb-stack.ts
+    boto3.client("dynamodb").create_table(
+        TableName="User",
+        KeySchema=[{"AttributeName": "id", "KeyType": "HASH"}],
+        AttributeDefinitions=[{"AttributeName": "id", "AttributeType": "S"}],
+        BillingMode="PAY_PER_REQUEST",
+    )
+    return "User"
+
+
+def create_user_count_table():
+    # mirrors the UserCount table in dynamodb-stack.ts
+    boto3.client("dynamodb").create_table(
+        TableName="UserCount",
+        KeySchema=[{"AttributeName": "uid", "KeyType": "HASH"}, {"AttributeName": "etype", "KeyType": "RANGE"}],
+        AttributeDefinitions=[{"AttributeName": "uid", "AttributeType": "S"},
+                              {"AttributeName": "etype", "AttributeType": "S"}],
+        BillingMode="PAY_PER_REQUEST",
+    )
+    return "UserCount"
+
+
+def create_submission_dedupe_table():
+    # mirrors the SubmissionDedupe table in dynamodb-stack.ts, the TTL is not enforced locally
+    boto3.client("dynamodb").create_table(
+        TableName="SubmissionDedupe",
+        KeySchema=[{"AttributeName": "id", "KeyType": "HASH"}],
+        AttributeDefinitions=[{"AttributeName": "id", "AttributeType": "S"}],
+        BillingMode="PAY_PER_REQUEST",
+    )
+    return "SubmissionDedupe"
+
+
+def create_stats_table():
+    # mirrors the Stats table in dynamodb-stack.ts
+    boto3.client("dynamodb").create_table(
+        TableName="Stats",
+        KeySchema=[{"AttributeName": "pk", "KeyType": "HASH"}, {"AttributeName": "sk", "KeyType": "RANGE"}],
+        AttributeDefinitions=[{"AttributeName": "pk", "AttributeType": "S"},
+                              {"AttributeName": "sk", "AttributeType": "S"}],
+        BillingMode="PAY_PER_REQUEST",
+    )
+    return "Stats"
+
+
+class CallCounter:
+    """Counts the AWS API calls made through the default boto3 session."""
+
+    def __init__(self):
+        self.calls = Counter()
+        boto3.setup_default_session()
+        # clients copy the session's event handlers when they are created
+        boto3.DEFAULT_SESSION.events.register("before-call", self._count)
+
+    def _count(self, event_name, **kwargs):
+        _, service, operation = event_name.split(".")
+        self.calls[f"{service}.{operation}"] += 1
+
+    def reset(self):
+        self.calls.clear()
+
+    def total(self, prefix=""):
+        return sum(count for name, count in self.calls.items() if name.startswith(prefix))
+
+
+def simulate_latency(milliseconds):
+    # moto answers in-process, a sleep per call stands in for the network round trip
+    def sleep(**kwargs):
+        time.sleep(milliseconds / 1000)
+
+    boto3.DEFAULT_SESSION.events.register("before-call", sleep)
+
+
+def sqs_event(messages):
+    # SNS -> SQS envelope as seen by the SqsEventSource handlers
+    return {
+        "Records": [
+            {
+                "messageId": str(uuid.uuid4()),
+                "body": json.dumps({"Message": json.dumps(message)}),
+            }
+            for message in messages
+        ]
+    }
+
+
+def api_event(uid, body=None, path_parameters=None):
+    # API Gateway proxy event behind the Cognito authorizer
+    return {
+        "requestContext": {"authorizer": {"claims": {"sub": uid}}},
+        "body": json.dumps(body) if body is not None else None,
+        "pathParameters": path_parameters,
+        "queryStringParameters": None,
+    }
+
+
+def stream_event(uids):
+    # KEYS_ONLY MODIFY records of an Exercise<type> table stream
+    return {
+        "Records": [
+            {"eventName": "MODIFY", "dynamodb": {"Keys": {"uid": {"S": uid}, "id": {"S": str(uuid.uuid4())}}}}
+            for uid in uids
+        ]
+    }
+
+
+def answered_stream_event(items, first_sequence=1):
+    # NEW_AND_OLD_IMAGES MODIFY records of answered exercises, items in the low-level form of the client
+    return {
+        "Records": [
+            {
+                "eventName": "MODIFY",
+                "dynamodb": {
+                    "Keys": {"uid": item["uid"], "id": item["id"]},
+                    "NewImage": item,
+                    "OldImage": {**{k: v for k, v in item.items() if k not in ("answer", "correctness", "solveTime")},
+                                 "answered": {"BOOL": False}},
+                    "SequenceNumber": str(first_sequence + i),
+                },
+            }
+            for i, item in enumerate(items)
+        ]
+    }
+
+
+def percentile(values, p):
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, max(0, round(p / 100 * len(ordered)) - 1))
+    return ordered[index]
@@ -8,6 +8,7 @@ import { ApiGatewayStack } from '../lib/api-gateway-stack';
 import { DynamoDBStack } from "../lib/dynamodb-stack";
 import { LambdaStack } from '../lib/lambda-stack';
 import { AmazonSnsStack } from "../lib/sns-stack";
+import { CacheStack } from "../lib/cache-stack";
 dotenv.config();
 
 const app = new cdk.App();
@@ -16,7 +17,8 @@ const snsStack = new AmazonSnsStack(app, 'AwsSnsStack');
 const dynamoStack = new DynamoDBStack(app, 'DynamoDBStack', snsStack);
 
 const s3Stack = new S3Stack(app, 'AwsCdkStack');
-const lambdaStack = new LambdaStack(app, 'LambdaStack', snsStack, dynamoStack);
+const cacheStack = new CacheStack(app, 'CacheStack');
+const lambdaStack = new LambdaStack(app, 'LambdaStack', snsStack, dynamoStack, s3Stack, cacheStack);
 const cognitoStack = new AmazonCognitoStack(app, 'AmazonCognitoStack', snsStack, dynamoStack, lambdaStack);
 
 // API Gateway
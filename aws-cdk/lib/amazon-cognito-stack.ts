@@ -1,4 +1,4 @@
-import { Stack, StackProps } from 'aws-cdk-lib';
+import { Duration, Stack, StackProps } from 'aws-cdk-lib';
 import * as cognito from 'aws-cdk-lib/aws-cognito';
 import { UserPool, UserPoolClient, VerificationEmailStyle } from 'aws-cdk-lib/aws-cognito';
 import * as lambda from 'aws-cdk-lib/aws-lambda';
@@ -13,6 +13,7 @@ export class AmazonCognitoStack extends Stack {
     public readonly userPoolClient: UserPoolClient;
     public readonly signUpFunction: lambda.Function;
     public readonly loginFunction: lambda.Function;
+    public readonly rosterFunction: lambda.Function;
 
     constructor(
         scope: Construct,
@@ -63,6 +64,18 @@ export class AmazonCognitoStack extends Stack {
             },
         });
 
+        // Login Lambda, password, refresh token or new password challenge flow (cognito/login.py)
+        this.loginFunction = new lambda.Function(this, 'LoginLambda', {
+            functionName: 'LoginLambda',
+            runtime: lambda.Runtime.PYTHON_3_9,
+            code: lambda.Code.fromAsset(path.join(__dirname, 'cognito')),
+            handler: 'login.handler',
+            layers: [lambdaStack.sharedLayer],
+            environment: {
+                CLIENT_ID: this.userPoolClient.userPoolClientId,
+            },
+        });
+
         //Pre Signup Lambda for Verification
         const preSignUpLambda = new lambda.Function(this, 'PreSignUpLambda', {
             functionName: 'PreSignUpLambda',
@@ -78,15 +91,47 @@ export class AmazonCognitoStack extends Stack {
             runtime: lambda.Runtime.PYTHON_3_9,
             code: lambda.Code.fromAsset(path.join(__dirname, 'cognito')),
             handler: 'post_confirmation.handler',
+            layers: [lambdaStack.sharedLayer],
             environment: {
                 TABLE_NAME: dynamoStack.userTable.tableName,
                 SNS_TOPIC_ARN: snsStack.exerciseGenerateTopic.topicArn,
-                SNS_EVALUATE_TOPIC_ARN: snsStack.exerciseEvaluateTopic.topicArn
+                REFILL_POLICY: JSON.stringify(lambdaStack.refillPolicy),
+                EXERCISE_TYPES: JSON.stringify(snsStack.exerciseTypeList),
             },
         });
         this.userPool.addTrigger(cognito.UserPoolOperation.POST_CONFIRMATION, postConfirmationLambda);
 
         dynamoStack.userTable.grantWriteData(postConfirmationLambda); 
         snsStack.exerciseGenerateTopic.grantPublish(postConfirmationLambda); 
+
+        // members may import class rosters
+        new cognito.CfnUserPoolGroup(this, 'TeachersGroup', {
+            userPoolId: this.userPool.userPoolId,
+            groupName: 'teachers',
+        });
+
+        // Roster Lambda, creates the users of a class in bulk (cognito/roster.py)
+        this.rosterFunction = new lambda.Function(this, 'RosterLambda', {
+            functionName: 'RosterLambda',
+            runtime: lambda.Runtime.PYTHON_3_9,
+            code: lambda.Code.fromAsset(path.join(__dirname, 'cognito')),
+            handler: 'roster.handler',
+            layers: [lambdaStack.sharedLayer],
+            // the API Gateway limit, roster.py takes at most ROSTER_RATE x 23 s of Cognito calls per request:
+            // 1035 invited students or 517 with a password at the default rate
+            timeout: Duration.seconds(29),
+            environment: {
+                USER_POOL_ID: this.userPool.userPoolId,
+                TABLE_NAME: dynamoStack.userTable.tableName,
+                SNS_TOPIC_ARN: snsStack.exerciseGenerateTopic.topicArn,
+                REFILL_POLICY: JSON.stringify(lambdaStack.refillPolicy),
+                EXERCISE_TYPES: JSON.stringify(snsStack.exerciseTypeList),
+                TEACHERS_GROUP: 'teachers',
+            },
+        });
+
+        this.userPool.grant(this.rosterFunction, 'cognito-idp:AdminCreateUser', 'cognito-idp:AdminSetUserPassword');
+        dynamoStack.userTable.grantWriteData(this.rosterFunction);
+        snsStack.exerciseGenerateTopic.grantPublish(this.rosterFunction);
     }
 }
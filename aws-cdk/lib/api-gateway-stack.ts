@@ -114,40 +114,45 @@ export class ApiGatewayStack extends Stack {
             }
         );
 
+        // Login endpoint, password, refresh token or new password challenge (Lambda, InitiateAuth with the flow of the body)
         const loginResource = authResource.addResource('login');
         loginResource.addMethod(
             'POST',
-            new apigateway.AwsIntegration({
-                service: 'cognito-idp',
-                integrationHttpMethod: 'POST',
-                action: 'InitiateAuth',
-                options: {
-                    credentialsRole: apiGatewayRole,
-                    requestParameters: {
-                        'integration.request.header.Content-Type': "'application/x-amz-json-1.1'",
-                        'integration.request.header.X-Amz-Target': "'AWSCognitoIdentityProviderService.InitiateAuth'",
+            new apigateway.LambdaIntegration(cognitoStack.loginFunction, {
+                integrationResponses: [
+                    {
+                        statusCode: '200',
+                        responseParameters: {
+                            'method.response.header.Access-Control-Allow-Origin': "'*'",
+                            'method.response.header.Access-Control-Allow-Methods': "'POST,OPTIONS'",
+                            'method.response.header.Access-Control-Allow-Headers': "'Content-Type,Authorization'",
+                        },
                     },
-                    requestTemplates: {
-                        'application/json': JSON.stringify({
-                            AuthFlow: 'USER_PASSWORD_AUTH',
-                            ClientId: cognitoStack.userPoolClient.userPoolClientId,
-                            AuthParameters: {
-                                USERNAME: "$input.path('$.email')",
-                                PASSWORD: "$input.path('$.password')",
-                            },
-                        }),
+                    {
+                        statusCode: '400',
+                        responseParameters: {
+                            'method.response.header.Access-Control-Allow-Origin': "'*'",
+                            'method.response.header.Access-Control-Allow-Methods': "'POST,OPTIONS'",
+                            'method.response.header.Access-Control-Allow-Headers': "'Content-Type,Authorization'",
+                        },
                     },
-                    integrationResponses: [
-                        {
-                            statusCode: '200',
-                            responseParameters: {
-                                'method.response.header.Access-Control-Allow-Origin': "'*'",
-                                'method.response.header.Access-Control-Allow-Methods': "'POST,OPTIONS'",
-                                'method.response.header.Access-Control-Allow-Headers': "'Content-Type,Authorization'",
-                            },
+                    {
+                        statusCode: '401',
+                        responseParameters: {
+                            'method.response.header.Access-Control-Allow-Origin': "'*'",
+                            'method.response.header.Access-Control-Allow-Methods': "'POST,OPTIONS'",
+                            'method.response.header.Access-Control-Allow-Headers': "'Content-Type,Authorization'",
                         },
-                    ],
-                },
+                    },
+                    {
+                        statusCode: '429',
+                        responseParameters: {
+                            'method.response.header.Access-Control-Allow-Origin': "'*'",
+                            'method.response.header.Access-Control-Allow-Methods': "'POST,OPTIONS'",
+                            'method.response.header.Access-Control-Allow-Headers': "'Content-Type,Authorization'",
+                        },
+                    },
+                ],
             }),
             {
                 authorizationType: apigateway.AuthorizationType.NONE,
@@ -160,6 +165,109 @@ export class ApiGatewayStack extends Stack {
                             'method.response.header.Access-Control-Allow-Headers': true,
                         },
                     },
+                    {
+                        statusCode: '400',
+                        responseParameters: {
+                            'method.response.header.Access-Control-Allow-Origin': true,
+                            'method.response.header.Access-Control-Allow-Methods': true,
+                            'method.response.header.Access-Control-Allow-Headers': true,
+                        },
+                    },
+                    {
+                        statusCode: '401',
+                        responseParameters: {
+                            'method.response.header.Access-Control-Allow-Origin': true,
+                            'method.response.header.Access-Control-Allow-Methods': true,
+                            'method.response.header.Access-Control-Allow-Headers': true,
+                        },
+                    },
+                    {
+                        statusCode: '429',
+                        responseParameters: {
+                            'method.response.header.Access-Control-Allow-Origin': true,
+                            'method.response.header.Access-Control-Allow-Methods': true,
+                            'method.response.header.Access-Control-Allow-Headers': true,
+                        },
+                    },
+                ],
+            }
+        );
+
+        // Roster endpoint, teachers onboard a whole class in one request
+        authResource.addResource('roster').addMethod(
+            'POST',
+            new apigateway.LambdaIntegration(cognitoStack.rosterFunction, {
+                integrationResponses: [
+                    {
+                        statusCode: '200',
+                        responseParameters: {
+                            'method.response.header.Access-Control-Allow-Origin': "'*'",
+                            'method.response.header.Access-Control-Allow-Methods': "'POST,OPTIONS'",
+                            'method.response.header.Access-Control-Allow-Headers': "'Content-Type,Authorization'",
+                        },
+                    },
+                    {
+                        statusCode: '400',
+                        responseParameters: {
+                            'method.response.header.Access-Control-Allow-Origin': "'*'",
+                            'method.response.header.Access-Control-Allow-Methods': "'POST,OPTIONS'",
+                            'method.response.header.Access-Control-Allow-Headers': "'Content-Type,Authorization'",
+                        },
+                    },
+                    {
+                        statusCode: '403',
+                        responseParameters: {
+                            'method.response.header.Access-Control-Allow-Origin': "'*'",
+                            'method.response.header.Access-Control-Allow-Methods': "'POST,OPTIONS'",
+                            'method.response.header.Access-Control-Allow-Headers': "'Content-Type,Authorization'",
+                        },
+                    },
+                    {
+                        statusCode: '500',
+                        responseParameters: {
+                            'method.response.header.Access-Control-Allow-Origin': "'*'",
+                            'method.response.header.Access-Control-Allow-Methods': "'POST,OPTIONS'",
+                            'method.response.header.Access-Control-Allow-Headers': "'Content-Type,Authorization'",
+                        },
+                    },
+                ],
+            }),
+            {
+                authorizationType: apigateway.AuthorizationType.COGNITO,
+                authorizer,
+                methodResponses: [
+                    {
+                        statusCode: '200',
+                        responseParameters: {
+                            'method.response.header.Access-Control-Allow-Origin': true,
+                            'method.response.header.Access-Control-Allow-Methods': true,
+                            'method.response.header.Access-Control-Allow-Headers': true,
+                        },
+                    },
+                    {
+                        statusCode: '400',
+                        responseParameters: {
+                            'method.response.header.Access-Control-Allow-Origin': true,
+                            'method.response.header.Access-Control-Allow-Methods': true,
+                            'method.response.header.Access-Control-Allow-Headers': true,
+                        },
+                    },
+                    {
+                        statusCode: '403',
+                        responseParameters: {
+                            'method.response.header.Access-Control-Allow-Origin': true,
+                            'method.response.header.Access-Control-Allow-Methods': true,
+                            'method.response.header.Access-Control-Allow-Headers': true,
+                        },
+                    },
+                    {
+                        statusCode: '500',
+                        responseParameters: {
+                            'method.response.header.Access-Control-Allow-Origin': true,
+                            'method.response.header.Access-Control-Allow-Methods': true,
+                            'method.response.header.Access-Control-Allow-Headers': true,
+                        },
+                    },
                 ],
             }
         );
@@ -524,6 +632,164 @@ export class ApiGatewayStack extends Stack {
             }
         )
 
+        // GET profile history, /history/{type}?limit=&cursor= pages one exercise type,
+        // /history?limit= returns the first page of every type
+        const historyResource = profileResource.addResource('history');
+        const historyTypeResource = historyResource.addResource('{type}');
+
+        for (const resource of [historyResource, historyTypeResource]) {
+            resource.addMethod(
+                'GET',
+                new apigateway.LambdaIntegration(lambdaStack.getHistoryLambda, {
+                    integrationResponses: [
+                        {
+                            statusCode: '200',
+                            responseParameters: {
+                                'method.response.header.Access-Control-Allow-Origin': "'*'",
+                                'method.response.header.Access-Control-Allow-Methods': "'OPTIONS,GET'",
+                                'method.response.header.Access-Control-Allow-Headers': "'Content-Type,Authorization'",
+                            },
+                        },
+                        {
+                            statusCode: '400',
+                            responseParameters: {
+                                'method.response.header.Access-Control-Allow-Origin': "'*'",
+                                'method.response.header.Access-Control-Allow-Methods': "'OPTIONS,GET'",
+                                'method.response.header.Access-Control-Allow-Headers': "'Content-Type,Authorization'",
+                            },
+                        },
+                        {
+                            statusCode: '404',
+                            responseParameters: {
+                                'method.response.header.Access-Control-Allow-Origin': "'*'",
+                                'method.response.header.Access-Control-Allow-Methods': "'OPTIONS,GET'",
+                                'method.response.header.Access-Control-Allow-Headers': "'Content-Type,Authorization'",
+                            },
+                        },
+                        {
+                            statusCode: '500',
+                            responseParameters: {
+                                'method.response.header.Access-Control-Allow-Origin': "'*'",
+                                'method.response.header.Access-Control-Allow-Methods': "'OPTIONS,GET'",
+                                'method.response.header.Access-Control-Allow-Headers': "'Content-Type,Authorization'",
+                            },
+                        }
+                    ]
+                }),
+                {
+                    authorizationType: apigateway.AuthorizationType.COGNITO,
+                    authorizer,
+                    requestParameters: {
+                        ...(resource === historyTypeResource ? {'method.request.path.type': true} : {}),
+                        'method.request.querystring.limit': false,
+                        'method.request.querystring.cursor': false,
+                    },
+                    methodResponses: [
+                        {
+                            statusCode: '200',
+                            responseParameters: {
+                                'method.response.header.Access-Control-Allow-Origin': true,
+                                'method.response.header.Access-Control-Allow-Methods': true,
+                                'method.response.header.Access-Control-Allow-Headers': true,
+                            },
+                        },
+                        {
+                            statusCode: '400',
+                            responseParameters: {
+                                'method.response.header.Access-Control-Allow-Origin': true,
+                                'method.response.header.Access-Control-Allow-Methods': true,
+                                'method.response.header.Access-Control-Allow-Headers': true,
+                            },
+                        },
+                        {
+                            statusCode: '404',
+                            responseParameters: {
+                                'method.response.header.Access-Control-Allow-Origin': true,
+                                'method.response.header.Access-Control-Allow-Methods': true,
+                                'method.response.header.Access-Control-Allow-Headers': true,
+                            },
+                        },
+                        {
+                            statusCode: '500',
+                            responseParameters: {
+                                'method.response.header.Access-Control-Allow-Origin': true,
+                                'method.response.header.Access-Control-Allow-Methods': true,
+                                'method.response.header.Access-Control-Allow-Headers': true,
+                            },
+                        },
+                    ]
+                }
+            )
+        }
+
+        // GET leaderboard and statistics of an exercise type, pre-aggregated by the aggregators
+        const statsResource = api.root.addResource('stats');
+        const statsTypeResource = statsResource.addResource('{type}');
+        statsTypeResource.addMethod(
+            'GET',
+            new apigateway.LambdaIntegration(lambdaStack.getStatsLambda, {
+                integrationResponses: [
+                    {
+                        statusCode: '200',
+                        responseParameters: {
+                            'method.response.header.Access-Control-Allow-Origin': "'*'",
+                            'method.response.header.Access-Control-Allow-Methods': "'OPTIONS,GET'",
+                            'method.response.header.Access-Control-Allow-Headers': "'Content-Type,Authorization'",
+                        },
+                    },
+                    {
+                        statusCode: '404',
+                        responseParameters: {
+                            'method.response.header.Access-Control-Allow-Origin': "'*'",
+                            'method.response.header.Access-Control-Allow-Methods': "'OPTIONS,GET'",
+                            'method.response.header.Access-Control-Allow-Headers': "'Content-Type,Authorization'",
+                        },
+                    },
+                    {
+                        statusCode: '500',
+                        responseParameters: {
+                            'method.response.header.Access-Control-Allow-Origin': "'*'",
+                            'method.response.header.Access-Control-Allow-Methods': "'OPTIONS,GET'",
+                            'method.response.header.Access-Control-Allow-Headers': "'Content-Type,Authorization'",
+                        },
+                    },
+                ]
+            }),
+            {
+                authorizationType: apigateway.AuthorizationType.COGNITO,
+                authorizer,
+                requestParameters: {
+                    'method.request.path.type': true,
+                },
+                methodResponses: [
+                    {
+                        statusCode: '200',
+                        responseParameters: {
+                            'method.response.header.Access-Control-Allow-Origin': true,
+                            'method.response.header.Access-Control-Allow-Methods': true,
+                            'method.response.header.Access-Control-Allow-Headers': true,
+                        },
+                    },
+                    {
+                        statusCode: '404',
+                        responseParameters: {
+                            'method.response.header.Access-Control-Allow-Origin': true,
+                            'method.response.header.Access-Control-Allow-Methods': true,
+                            'method.response.header.Access-Control-Allow-Headers': true,
+                        },
+                    },
+                    {
+                        statusCode: '500',
+                        responseParameters: {
+                            'method.response.header.Access-Control-Allow-Origin': true,
+                            'method.response.header.Access-Control-Allow-Methods': true,
+                            'method.response.header.Access-Control-Allow-Headers': true,
+                        },
+                    },
+                ]
+            }
+        )
+
         const deployment = new apigateway.Deployment(this, 'ApiGatewayDeployment', {
             api,
         });
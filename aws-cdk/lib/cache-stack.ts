@@ -0,0 +1,56 @@
+import {Stack, StackProps} from "aws-cdk-lib";
+import * as ec2 from "aws-cdk-lib/aws-ec2";
+import * as elasticache from "aws-cdk-lib/aws-elasticache";
+import {Construct} from "constructs";
+
+// shared tier of lambdas/cache.py: a Redis node the functions that read or invalidate the cached
+// responses reach from the isolated subnets of the VPC, without NAT
+export class CacheStack extends Stack {
+    public readonly vpc: ec2.Vpc;
+    public readonly functionSecurityGroup: ec2.SecurityGroup;
+    public readonly cacheUrl: string;
+
+    constructor(scope: Construct, id: string, props?: StackProps) {
+        super(scope, id, props);
+
+        this.vpc = new ec2.Vpc(this, "CacheVpc", {
+            maxAzs: 2,
+            natGateways: 0,
+            subnetConfiguration: [{name: "Functions", subnetType: ec2.SubnetType.PRIVATE_ISOLATED, cidrMask: 24}],
+        });
+
+        // the AWS services the functions in the VPC call; DynamoDB and S3 through free gateway endpoints,
+        // SNS (post-solution publishes the submissions) through an interface endpoint
+        this.vpc.addGatewayEndpoint("DynamoDbEndpoint", {service: ec2.GatewayVpcEndpointAwsService.DYNAMODB});
+        this.vpc.addGatewayEndpoint("S3Endpoint", {service: ec2.GatewayVpcEndpointAwsService.S3});
+        this.vpc.addInterfaceEndpoint("SnsEndpoint", {service: ec2.InterfaceVpcEndpointAwsService.SNS});
+
+        this.functionSecurityGroup = new ec2.SecurityGroup(this, "CacheClientSecurityGroup", {
+            vpc: this.vpc,
+            description: "Functions that read or invalidate the response cache",
+        });
+
+        const cacheSecurityGroup = new ec2.SecurityGroup(this, "CacheSecurityGroup", {
+            vpc: this.vpc,
+            description: "Response cache",
+            allowAllOutbound: false,
+        });
+        cacheSecurityGroup.addIngressRule(this.functionSecurityGroup, ec2.Port.tcp(6379), "Redis from the functions");
+
+        const subnetGroup = new elasticache.CfnSubnetGroup(this, "CacheSubnetGroup", {
+            description: "Subnets of the response cache",
+            subnetIds: this.vpc.isolatedSubnets.map(subnet => subnet.subnetId),
+        });
+
+        // the cache only holds copies, a lost node costs one DynamoDB read per response until it is refilled
+        const cluster = new elasticache.CfnCacheCluster(this, "ResponseCache", {
+            engine: "redis",
+            cacheNodeType: "cache.t3.micro",
+            numCacheNodes: 1,
+            cacheSubnetGroupName: subnetGroup.ref,
+            vpcSecurityGroupIds: [cacheSecurityGroup.securityGroupId],
+        });
+
+        this.cacheUrl = `redis://${cluster.attrRedisEndpointAddress}:${cluster.attrRedisEndpointPort}`;
+    }
+}
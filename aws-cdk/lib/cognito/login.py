@@ -1,34 +1,95 @@
-import boto3
+import runtime  # first import, starts the init timer
+import metrics
+
 import json
 import os
+import time
+
+from botocore.exceptions import ClientError
+
+HEADERS = {
+    'Access-Control-Allow-Origin': '*',
+    'Access-Control-Allow-Methods': 'POST,OPTIONS',
+    'Access-Control-Allow-Headers': 'Content-Type,Authorization',
+}
+
+# created once per container and reused by warm invocations
+cognito_client = runtime.client('cognito-idp')
+
+# wrong password or an expired / revoked refresh token, the client logs in with the password then
+UNAUTHORIZED = {'NotAuthorizedException', 'UserNotFoundException', 'UserNotConfirmedException'}
+
+
+def authenticate(body):
+    # a refresh token skips the password check, Cognito only validates the token
+    if body.get('refreshToken'):
+        return 'REFRESH_TOKEN_AUTH', {'REFRESH_TOKEN': body['refreshToken']}
+    # the answer to a NEW_PASSWORD_REQUIRED challenge, students invited by a roster import set their password
+    if body.get('session'):
+        return 'RESPOND_TO_AUTH_CHALLENGE', {
+            'USERNAME': body['email'], 'NEW_PASSWORD': body['newPassword'], 'SESSION': body['session'],
+        }
+    return 'USER_PASSWORD_AUTH', {'USERNAME': body['email'], 'PASSWORD': body['password']}
+
+
+def initiate(flow, parameters):
+    if flow == 'RESPOND_TO_AUTH_CHALLENGE':
+        return cognito_client.respond_to_auth_challenge(
+            ClientId=os.environ['CLIENT_ID'],
+            ChallengeName='NEW_PASSWORD_REQUIRED',
+            Session=parameters['SESSION'],
+            ChallengeResponses={'USERNAME': parameters['USERNAME'], 'NEW_PASSWORD': parameters['NEW_PASSWORD']},
+        )
+    return cognito_client.initiate_auth(AuthFlow=flow, ClientId=os.environ['CLIENT_ID'], AuthParameters=parameters)
+
 
-cognito_client = boto3.client('cognito-idp')
+def response(status_code, body):
+    return {'statusCode': status_code, 'headers': HEADERS, 'body': json.dumps(body)}
 
 
+# example bodies: {"email": "...", "password": "..."}, {"refreshToken": "eyJjdHki..."}
+#                or {"email": "...", "session": "...", "newPassword": "..."} after a NEW_PASSWORD_REQUIRED challenge
+@metrics.instrument("login")
 def handler(event, context):
     try:
         body = json.loads(event['body'])
-        email = body['email']
-        password = body['password']
+        flow, parameters = authenticate(body)
+    except (TypeError, KeyError, AttributeError, json.JSONDecodeError) as e:
+        return response(400, {'error': f'Invalid request: {e}'})
 
-        response = cognito_client.initiate_auth(
-            AuthFlow='USER_PASSWORD_AUTH',
-            ClientId=os.environ['CLIENT_ID'],
-            AuthParameters={
-                'USERNAME': email,
-                'PASSWORD': password
-            }
-        )
+    start = time.perf_counter()
+    try:
+        auth = initiate(flow, parameters)
+    except ClientError as e:
+        code = e.response.get('Error', {}).get('Code')
+        if code in UNAUTHORIZED:
+            return response(401, {'error': str(e)})
+        if code == 'TooManyRequestsException':
+            return response(429, {'error': str(e)})
+        return response(400, {'error': str(e)})
+    finally:
+        # per flow, the refresh path should stay well below the password path
+        metrics.record('AuthTime', (time.perf_counter() - start) * 1000, flow)
 
-        return {
-            "statusCode": 200,
-            "body": json.dumps({
-                "message": "Login successful",
-                "token": response['AuthenticationResult']['IdToken']
-            })
-        }
-    except Exception as e:
-        return {
-            "statusCode": 400,
-            "body": json.dumps({"error": str(e)})
-        }
+    # a challenge (new password, MFA) comes without tokens, the login is not complete;
+    # the client answers NEW_PASSWORD_REQUIRED with the session, other challenges are not supported
+    if 'AuthenticationResult' not in auth:
+        challenge = auth.get('ChallengeName')
+        return response(401, {
+            'error': f'Login requires the {challenge} challenge',
+            'ChallengeName': challenge,
+            'Session': auth.get('Session'),
+        })
+
+    result = auth['AuthenticationResult']
+    # the refresh flow returns no new refresh token, the old one stays valid
+    result.setdefault('RefreshToken', parameters.get('REFRESH_TOKEN'))
+
+    return response(200, {
+        'message': 'Login successful',
+        'token': result['IdToken'],
+        'AuthenticationResult': result,
+    })
+
+
+runtime.report_init("login")
@@ -1,46 +1,63 @@
-import boto3
+import runtime  # first import, starts the init timer
+import metrics
+
 import json
+import logging
 import os
 
-dynamodb = boto3.resource("dynamodb")
-sns_client = boto3.client("sns")
+from botocore.exceptions import ClientError
+
+from publisher import Publisher
+
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+dynamodb = runtime.resource("dynamodb")
+sns_client = runtime.client("sns")
 
+@metrics.instrument("post_confirmation")
 def handler(event, context):
     # user_pool_id = event["userPoolId"]
     user_attributes = event["request"]["userAttributes"]
     user_id = user_attributes["sub"]  # Cognito user ID
 
-    # Insert user into DynamoDB
+    # Insert user into DynamoDB, once: a student of a roster import (roster.py) has the row and the initial
+    # pools already when they confirm, and a confirmed password reset calls this trigger again
     table = dynamodb.Table(os.environ["TABLE_NAME"])
-    table.put_item(
-        Item={
-            "id": user_id,
-            "firstName": user_attributes.get("given_name", ""),
-            "lastName": user_attributes.get("family_name", "")
-        }
-    )
+    try:
+        table.put_item(
+            Item={
+                "id": user_id,
+                "firstName": user_attributes.get("given_name", ""),
+                "lastName": user_attributes.get("family_name", "")
+            },
+            ConditionExpression="attribute_not_exists(id)"
+        )
+    except ClientError as e:
+        if e.response.get("Error", {}).get("Code") != "ConditionalCheckFailedException":
+            raise
+        logger.info(f"User {user_id} is provisioned already, no initial exercises requested")
+        return event
 
     # Publish messages to SNS for exercise creation
     topic_arn = os.environ["SNS_TOPIC_ARN"]
-    evaluate_topic_arn = os.environ["SNS_EVALUATE_TOPIC_ARN"]
-    exercise_types = ["addition", "multiplication", "derivatives"]
+    # the deployed types, from exerciseTypeList of sns-stack.ts
+    exercise_types = json.loads(os.environ.get("EXERCISE_TYPES", '["addition", "multiplication", "derivatives"]'))
+
+    # initial pool up to the high watermark of the refill policy
+    refill_policy = json.loads(os.environ.get("REFILL_POLICY", "{}"))
 
-    print(f"Running post_confirmation lambda on user {user_id}")
+    logger.info(f"Running post_confirmation lambda on user {user_id}")
+    # one PublishBatch call for the initial pools of all types
+    publisher = Publisher(sns_client)
     for exercise_type in exercise_types:
-        sns_client.publish(
-            TopicArn=topic_arn,
-            Message=json.dumps({"uid": user_id, "type": exercise_type, "count": 10}),
-            MessageAttributes={
-                "type": {"DataType": "String", "StringValue": exercise_type},
-            },
-        )
+        count = refill_policy.get(exercise_type, {}).get("high", 10)
+        publisher.add(topic_arn, {"uid": user_id, "type": exercise_type, "count": count}, type=exercise_type)
 
-        # warm up evaluators
-        sns_client.publish(
-            TopicArn=evaluate_topic_arn,
-            Message=json.dumps({"type": "warmup"}),
-            MessageAttributes={
-                "type": {"DataType": "String", "StringValue": exercise_type},
-            },
-        )
+    # a pool that was not generated is refilled by get-exercise on the first request
+    for failed in publisher.flush():
+        logger.error(f"Initial exercises of user {user_id} not requested: {failed['Message']}")
     return event
+
+
+runtime.report_init("post_confirmation")
@@ -1,4 +1,8 @@
 def handler(event, context):
+    # users of a roster import are created confirmed by roster.py
+    if event.get("triggerSource") == "PreSignUp_AdminCreateUser":
+        return event
+
     # Automatically confirm the user and mark the email as verified
     event["response"]["autoConfirmUser"] = True
     event["response"]["autoVerifyEmail"] = True
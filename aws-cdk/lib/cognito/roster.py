@@ -0,0 +1,244 @@
+import runtime  # first import, starts the init timer
+import metrics
+
+import json
+import logging
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from botocore.exceptions import ClientError
+
+from publisher import Publisher
+
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+HEADERS = {
+    'Access-Control-Allow-Origin': '*',
+    'Access-Control-Allow-Methods': 'POST,OPTIONS',
+    'Access-Control-Allow-Headers': 'Content-Type,Authorization',
+}
+
+# Cognito calls in flight and per second, below the UserCreation quota of a user pool (50/s by default)
+CONCURRENCY = int(os.environ.get('ROSTER_CONCURRENCY', 8))
+RATE = float(os.environ.get('ROSTER_RATE', 45))
+# seconds of the 29 s API Gateway timeout spent on Cognito calls, the rest writes the User rows and messages
+TIME_BUDGET_SECONDS = float(os.environ.get('ROSTER_TIME_BUDGET_SECONDS', 23))
+# an invited student is one Cognito call, one with a password two; a larger roster is split by the client
+MAX_CALLS = int(RATE * TIME_BUDGET_SECONDS)
+MAX_STUDENTS = MAX_CALLS
+# users per generation message, one generator invocation of 5 messages writes the pools of 125 users
+USERS_PER_MESSAGE = int(os.environ.get('ROSTER_USERS_PER_MESSAGE', 25))
+PROGRESS_EVERY = 50
+
+# created once per container and reused by warm invocations
+cognito_client = runtime.client('cognito-idp')
+dynamodb = runtime.resource('dynamodb')
+sns_client = runtime.client('sns')
+
+
+class RateLimiter:
+    """Spaces the calls of several threads out to at most `rate` per second."""
+
+    def __init__(self, rate):
+        self.interval = 1 / rate if rate > 0 else 0
+        self.lock = threading.Lock()
+        self.next_slot = time.monotonic()
+
+    def wait(self):
+        with self.lock:
+            now = time.monotonic()
+            slot = max(self.next_slot, now)
+            self.next_slot = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+def is_teacher(claims):
+    # the authorizer passes the groups as one string, e.g. "teachers" or "[teachers admins]"
+    groups = re.split(r'[\s,\[\]]+', claims.get('cognito:groups', ''))
+    return os.environ.get('TEACHERS_GROUP', 'teachers') in groups
+
+
+def response(status_code, body):
+    return {'statusCode': status_code, 'headers': HEADERS, 'body': json.dumps(body)}
+
+
+def invalid(student):
+    """Why a roster entry cannot be imported, None if it can."""
+    if not isinstance(student, dict) or not all(
+            isinstance(student.get(f), str) and student[f] for f in ('email', 'firstName', 'lastName')):
+        return 'email, firstName and lastName are required strings'
+    if student.get('password') is not None and not isinstance(student['password'], str):
+        return 'password has to be a string'
+    return None
+
+
+def create_student(student, limiter):
+    """Creates the Cognito user of one student, returns the student's result."""
+    email = student['email']
+    result = {'email': email}
+    request = {
+        'UserPoolId': os.environ['USER_POOL_ID'],
+        'Username': email,
+        'UserAttributes': [
+            {'Name': 'email', 'Value': email},
+            {'Name': 'email_verified', 'Value': 'true'},
+            {'Name': 'given_name', 'Value': student['firstName']},
+            {'Name': 'family_name', 'Value': student['lastName']},
+        ],
+    }
+    # with a password the student logs in right away, without it Cognito sends an invitation
+    if student.get('password'):
+        request['MessageAction'] = 'SUPPRESS'
+    else:
+        request['DesiredDeliveryMediums'] = ['EMAIL']
+
+    try:
+        limiter.wait()
+        user = cognito_client.admin_create_user(**request)['User']
+    except ClientError as e:
+        code = e.response.get('Error', {}).get('Code')
+        if code == 'UsernameExistsException':
+            return {**result, 'status': 'exists'}
+        return {**result, 'status': 'failed', 'error': str(e)}
+
+    result.update({
+        'status': 'created',
+        'uid': next(a['Value'] for a in user['Attributes'] if a['Name'] == 'sub'),
+        'firstName': student['firstName'],
+        'lastName': student['lastName'],
+    })
+
+    if student.get('password'):
+        try:
+            limiter.wait()
+            cognito_client.admin_set_user_password(
+                UserPoolId=os.environ['USER_POOL_ID'], Username=email, Password=student['password'], Permanent=True
+            )
+        except ClientError as e:
+            # the user exists, a password reset gets them in
+            result['error'] = f'Password not set: {e}'
+
+    return result
+
+
+def create_students(students):
+    limiter = RateLimiter(RATE)
+    results = [None] * len(students)
+
+    with ThreadPoolExecutor(max_workers=CONCURRENCY) as executor:
+        futures = {executor.submit(create_student, student, limiter): i for i, student in enumerate(students)}
+        for done, future in enumerate(as_completed(futures), 1):
+            i = futures[future]
+            try:
+                results[i] = future.result()
+            except Exception as e:
+                results[i] = {'email': students[i]['email'], 'status': 'failed', 'error': str(e)}
+            if done % PROGRESS_EVERY == 0 or done == len(students):
+                logger.info(f'Roster import: {done}/{len(students)} students processed')
+
+    return results
+
+
+def write_users(created):
+    # the rows post_confirmation writes for a single signup, BatchWriteItem of 25 per call
+    table = dynamodb.Table(os.environ['TABLE_NAME'])
+    with table.batch_writer() as batch:
+        for student in created:
+            batch.put_item(Item={
+                'id': student['uid'],
+                'firstName': student['firstName'],
+                'lastName': student['lastName'],
+            })
+
+
+def request_exercises(created):
+    """Asks for the initial pools of all users in a few messages per type, returns the uids not requested."""
+    topic_arn = os.environ['SNS_TOPIC_ARN']
+    exercise_types = json.loads(os.environ.get('EXERCISE_TYPES', '["addition", "multiplication", "derivatives"]'))
+    refill_policy = json.loads(os.environ.get('REFILL_POLICY', '{}'))
+
+    uids = [student['uid'] for student in created]
+    publisher = Publisher(sns_client)
+    for exercise_type in exercise_types:
+        count = refill_policy.get(exercise_type, {}).get('high', 10)
+        for start in range(0, len(uids), USERS_PER_MESSAGE):
+            message = {'uids': uids[start:start + USERS_PER_MESSAGE], 'type': exercise_type, 'count': count}
+            publisher.add(topic_arn, message, type=exercise_type)
+
+    # a pool that was not generated is refilled by get-exercise on the first request
+    not_requested = set()
+    for failed in publisher.flush():
+        logger.error(f'Initial exercises not requested: {failed["Message"]}')
+        not_requested.update(json.loads(failed['Message'])['uids'])
+    return not_requested
+
+
+# example body: {"students": [{"email": "...", "firstName": "...", "lastName": "...", "password": "..."}]}
+@metrics.instrument("roster")
+def handler(event, context):
+    claims = event.get('requestContext', {}).get('authorizer', {}).get('claims', {})
+    if not claims.get('sub'):
+        return response(401, {'error': 'Unauthorized or user ID not found'})
+    if not is_teacher(claims):
+        return response(403, {'error': 'Only teachers can import a roster'})
+
+    try:
+        students = json.loads(event['body'])['students']
+        if not isinstance(students, list) or len(students) > MAX_STUDENTS:
+            raise ValueError(f'students has to be a list of at most {MAX_STUDENTS} entries')
+    except (TypeError, KeyError, ValueError) as e:
+        return response(400, {'error': f'Invalid request: {e}'})
+
+    results = [None] * len(students)
+    valid = {}
+    calls = 0
+    for i, student in enumerate(students):
+        error = invalid(student)
+        if error:
+            email = student.get('email') if isinstance(student, dict) else None
+            results[i] = {'email': email if isinstance(email, str) else None, 'status': 'failed', 'error': error}
+        elif student['email'] in valid:
+            results[i] = {'email': student['email'], 'status': 'failed', 'error': 'Duplicate email in the roster'}
+        else:
+            valid[student['email']] = i
+            calls += 2 if student.get('password') else 1
+
+    # the report is only returned if every student is done before the timeout
+    if calls > MAX_CALLS:
+        return response(400, {'error': f'Invalid request: the roster needs {calls} Cognito calls, at most {MAX_CALLS} '
+                                       f'fit into one request ({MAX_CALLS} invited students or {MAX_CALLS // 2} '
+                                       'with a password), split it'})
+
+    try:
+        for i, result in zip(valid.values(), create_students([students[i] for i in valid.values()])):
+            results[i] = result
+
+        created = [result for result in results if result['status'] == 'created']
+        write_users(created)
+        not_requested = request_exercises(created)
+        for result in created:
+            if result['uid'] in not_requested:
+                result.setdefault('error', 'Initial exercises are generated on the first request')
+    except Exception as e:
+        logger.error(f'Roster import failed: {e}')
+        # the Cognito users created so far, without names or raw error messages
+        code = e.response.get('Error', {}).get('Code') if isinstance(e, ClientError) else type(e).__name__
+        return response(500, {'error': code, 'students': [{k: v for k, v in r.items() if k in ('email', 'status', 'uid')}
+                                                          for r in results if r]})
+
+    # the names were only needed for the User rows
+    report = [{k: v for k, v in r.items() if k in ('email', 'status', 'uid', 'error')} for r in results]
+    return response(200, {
+        'created': sum(r['status'] == 'created' for r in report),
+        'existing': sum(r['status'] == 'exists' for r in report),
+        'failed': sum(r['status'] == 'failed' for r in report),
+        'students': report,
+    })
+
+
+runtime.report_init("roster")
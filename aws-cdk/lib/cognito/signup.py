@@ -1,10 +1,13 @@
-import boto3
+import runtime  # first import, starts the init timer
+import metrics
+
 import json
 import os
 
-cognito_client = boto3.client('cognito-idp')
+cognito_client = runtime.client('cognito-idp')
 
 
+@metrics.instrument("signup")
 def handler(event, context):
     try:
         body = json.loads(event['body'])
@@ -34,3 +37,6 @@ def handler(event, context):
             "statusCode": 400,
             "body": json.dumps({"error": str(e)})
         }
+
+
+runtime.report_init("signup")
@@ -10,6 +10,8 @@ interface DynamoDBStackProps extends StackProps {
 export class DynamoDBStack extends Stack {
     public readonly userTable: Table;
     public readonly userCountTable: Table;
+    public readonly submissionDedupeTable: Table;
+    public readonly statsTable: Table;
     public readonly exerciseTables: Record<string, Table> = {};
 
     constructor(scope: Construct, id: string, snsStack: AmazonSnsStack, props?: DynamoDBStackProps) {
@@ -35,6 +37,29 @@ export class DynamoDBStack extends Stack {
             }
         });
 
+        // idempotency keys uid#eid of submitted solutions, expired by TTL after a few minutes
+        this.submissionDedupeTable = new Table(this, 'SubmissionDedupe', {
+            tableName: 'SubmissionDedupe',
+            partitionKey: {
+                name: 'id',
+                type: AttributeType.STRING,
+            },
+            timeToLiveAttribute: 'expiresAt',
+        });
+
+        // pre-aggregated leaderboards and statistics per type, written by the aggregators (lambdas/stats.py)
+        this.statsTable = new Table(this, 'Stats', {
+            tableName: 'Stats',
+            partitionKey: {
+                name: 'pk',
+                type: AttributeType.STRING,
+            },
+            sortKey: {
+                name: 'sk',
+                type: AttributeType.STRING,
+            }
+        });
+
         for(let exerciseType of snsStack.exerciseTypeList) {
             const table = new Table(this, 'Exercise'+exerciseType, {
                 tableName: 'Exercise'+exerciseType,
@@ -46,7 +71,8 @@ export class DynamoDBStack extends Stack {
                     name: 'id',  // has to be unique for all exercise types
                     type: AttributeType.STRING,
                 },
-                stream: StreamViewType.KEYS_ONLY
+                // the aggregator reads correctness and solveTime of the answered exercise from the images
+                stream: StreamViewType.NEW_AND_OLD_IMAGES
             });
 
             table.addLocalSecondaryIndex({
@@ -58,6 +84,23 @@ export class DynamoDBStack extends Stack {
                 projectionType: ProjectionType.ALL
             });
 
+            // sparse index, only unanswered exercises carry openSince; a global index, since a local one
+            // cannot be added to the existing tables without replacing them and their data;
+            // the exercises written before it are added by scripts/backfill_open_index.py
+            table.addGlobalSecondaryIndex({
+                indexName: 'Exercise'+exerciseType+"OpenGSI",
+                partitionKey: {
+                    name: 'uid',
+                    type: AttributeType.STRING,
+                },
+                sortKey: {
+                    name: "openSince",
+                    type: AttributeType.NUMBER,
+                },
+                projectionType: ProjectionType.INCLUDE,
+                nonKeyAttributes: ["exercise", "answered"]
+            });
+
             this.exerciseTables[exerciseType] = table;
         }
 
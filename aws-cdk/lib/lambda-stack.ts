@@ -2,9 +2,14 @@ import * as lambda from 'aws-cdk-lib/aws-lambda';
 import * as sns from 'aws-cdk-lib/aws-sns';
 import * as sns_subs from 'aws-cdk-lib/aws-sns-subscriptions';
 import * as dynamodb from 'aws-cdk-lib/aws-dynamodb';
+import * as ec2 from 'aws-cdk-lib/aws-ec2';
+import * as events from 'aws-cdk-lib/aws-events';
+import * as targets from 'aws-cdk-lib/aws-events-targets';
 import {Stack, StackProps} from "aws-cdk-lib";
 import {DynamoDBStack} from "./dynamodb-stack";
 import {AmazonSnsStack} from "./sns-stack";
+import {S3Stack} from "./s3-stack";
+import {CacheStack} from "./cache-stack";
 import {Construct} from "constructs";
 import path from "path";
 import * as sqs from "aws-cdk-lib/aws-sqs";
@@ -17,348 +22,359 @@ export class LambdaStack extends Stack {
     public readonly getExerciseLambdas: Record<string, lambda.Function> = {};
     public readonly postSolutionLambdas: Record<string, lambda.Function> = {};
     public readonly getProfileLambda: lambda.Function;
+    public readonly getHistoryLambda: lambda.Function;
+    public readonly getStatsLambda: lambda.Function;
+    public readonly sharedLayer: lambda.LayerVersion;
+
+    // open exercise pool per type: refilled below low, up to high (plus lookahead for fast solvers)
+    public readonly refillPolicy: Record<string, { low: number, high: number }> = {
+        addition: {low: 5, high: 10},
+        multiplication: {low: 5, high: 10},
+        derivatives: {low: 3, high: 8},
+    };
+
+    // difficulty bounds of the bulk generators in lambdas/exercise_types.py
+    public readonly difficulty: Record<string, object> = {
+        multiplication: {max_product: 1000000},
+    };
+
+    // binary: exercises and answers are written in the compact encoding of lambdas/codec.py, map: as before;
+    // readers accept both, scripts/migrate_exercise_encoding.py converts existing items
+    public readonly exerciseEncoding: string = "binary";
+
+    // inline: post-solution grades and answers with the result, async (default): graded by the evaluator
+    public readonly gradingMode: Record<string, string> = {
+        addition: "inline",
+        multiplication: "inline",
+    };
+
+    // answered exercises older than this move from the Exercise tables to the bucket of s3-stack.ts,
+    // lambdas/archiver.py runs once a day per type
+    public readonly archiveAfterDays: number = 90;
+    public readonly archivePrefix: string = "archive";
 
 
     constructor(scope: Construct, id: string,
                 snsStack: AmazonSnsStack,
                 dynamoStack: DynamoDBStack,
+                s3Stack: S3Stack,
+                cacheStack: CacheStack,
                 props?: StackProps) {
         super(scope, id, props);
 
-        const addition_table = dynamoStack.exerciseTables["addition"];
-        const derivatives_table = dynamoStack.exerciseTables["derivatives"];
-        const multiplication_table = dynamoStack.exerciseTables["multiplication"];
-
-
-        const generatorAddition = new lambda.Function(this, "addition" + "Generator", {
-            functionName: "addition" + "Generator",
-            runtime: lambda.Runtime.PYTHON_3_9,
-            code: lambda.Code.fromAsset(path.join(__dirname, "lambdas")),
-            handler: "generators.generate_addition_exercises",
-            environment: {
-                TABLE_NAME: addition_table.tableName,
-            }
+        // runtime.py: clients created once per container with pooled keep-alive connections,
+        // plus the packages of layer/requirements.txt (numpy for the polynomial exercises)
+        this.sharedLayer = new lambda.LayerVersion(this, "SharedRuntimeLayer", {
+            layerVersionName: "SharedRuntimeLayer",
+            code: lambda.Code.fromAsset(path.join(__dirname, "layer"), {
+                bundling: {
+                    image: lambda.Runtime.PYTHON_3_9.bundlingImage,
+                    command: [
+                        "bash", "-c",
+                        "pip install -r requirements.txt -t /asset-output/python && cp -r python/. /asset-output/python",
+                    ],
+                },
+            }),
+            compatibleRuntimes: [lambda.Runtime.PYTHON_3_9],
         });
 
-        const queueGenerator1 = new sqs.Queue(this, "Exercise-" + "addition" + "-Queue", {
-            queueName: "Exercise-" + "addition" + "-Queue",
-            visibilityTimeout: cdk.Duration.seconds(300),
-        });
+        // evaluators grade whole batches and report failed messages only
+        const evaluatorBatching = {
+            batchSize: 25,
+            maxBatchingWindow: cdk.Duration.seconds(1),
+            reportBatchItemFailures: true,
+        };
+
+        // read-through cache of get-exercise and get-profile on the Redis node of cache-stack.ts; the readers
+        // and every writer of a user's exercises run in its VPC, the writers bump the versions of lambdas/cache.py
+        const cacheEnvironment: Record<string, string> = {CACHE_URL: cacheStack.cacheUrl};
+        const cacheAccess = {
+            vpc: cacheStack.vpc,
+            vpcSubnets: {subnetType: ec2.SubnetType.PRIVATE_ISOLATED},
+            securityGroups: [cacheStack.functionSecurityGroup],
+        };
+
+        // larger stream batches let the watcher coalesce more answers of the same user
+        const watcherBatching = {
+            startingPosition: StartingPosition.LATEST,
+            batchSize: 100,
+            maxBatchingWindow: cdk.Duration.seconds(2),
+        };
+
+        // the handlers are generic, EXERCISE_TYPE selects the type in lambdas/exercise_types.py
+        for (let exerciseType of snsStack.exerciseTypeList) {
+            const table = dynamoStack.exerciseTables[exerciseType];
+            const title = exerciseType.charAt(0).toUpperCase() + exerciseType.slice(1);
+
+            // generator
+            const generator = new lambda.Function(this, exerciseType + "Generator", {
+                functionName: exerciseType + "Generator",
+                runtime: lambda.Runtime.PYTHON_3_9,
+                layers: [this.sharedLayer],
+                code: lambda.Code.fromAsset(path.join(__dirname, "lambdas")),
+                handler: "generators.handler",
+                ...cacheAccess,
+                environment: {
+                    ...cacheEnvironment,
+                    TABLE_NAME: table.tableName,
+                    EXERCISE_TYPE: exerciseType,
+                    DIFFICULTY: JSON.stringify(this.difficulty),
+                    EXERCISE_ENCODING: this.exerciseEncoding,
+                    TABLE_USER_COUNT: dynamoStack.userCountTable.tableName,
+                }
+            });
+            table.grantWriteData(generator);
+            // skill levels of the users of a batch, lambdas/skill.py, and the in flight marks of the top-ups
+            dynamoStack.userCountTable.grantReadWriteData(generator);
 
-        // subscribe queue to SNS
-        snsStack.exerciseGenerateTopic.addSubscription(new subs.SqsSubscription(queueGenerator1, {
-            filterPolicy: {
-                type: sns.SubscriptionFilter.stringFilter({allowlist: ["addition"]})
-            }
-        }));
+            const generateQueue = new sqs.Queue(this, "Exercise-" + exerciseType + "-Queue", {
+                queueName: "Exercise-" + exerciseType + "-Queue",
+                visibilityTimeout: cdk.Duration.seconds(300),
+            });
 
-        // Add SQS as an event source for the Lambda function
-        generatorAddition.addEventSource(new SqsEventSource(queueGenerator1, {
-            batchSize: 5, //TODO do we need batch size
-        }));
-        addition_table.grantWriteData(generatorAddition);
+            // subscribe queue to SNS
+            snsStack.exerciseGenerateTopic.addSubscription(new subs.SqsSubscription(generateQueue, {
+                filterPolicy: {
+                    type: sns.SubscriptionFilter.stringFilter({allowlist: [exerciseType]})
+                }
+            }));
 
-        // get exercise
-        const getLambdaAddition = new lambda.Function(this, "addition-getExerciseLambda", {
-            functionName: "addition-getExerciseLambda",
-            runtime: lambda.Runtime.PYTHON_3_9,
-            code: lambda.Code.fromAsset(path.join(__dirname, "lambdas")),
-            handler: "get-exercise.handler",
-            environment: {
-                TABLE_NAME: addition_table.tableName,
-            }
-        });
-        addition_table.grantReadData(getLambdaAddition);
+            // Add SQS as an event source for the Lambda function
+            generateQueue.grantConsumeMessages(generator);
+            generator.addEventSource(new SqsEventSource(generateQueue, {
+                batchSize: 5, //TODO do we need batch size
+            }));
 
-        this.getExerciseLambdas["addition"] = getLambdaAddition;
+            // get exercise
+            const getExerciseLambda = new lambda.Function(this, exerciseType + "-getExerciseLambda", {
+                functionName: exerciseType + "-getExerciseLambda",
+                runtime: lambda.Runtime.PYTHON_3_9,
+                layers: [this.sharedLayer],
+                code: lambda.Code.fromAsset(path.join(__dirname, "lambdas")),
+                handler: "get-exercise.handler",
+                ...cacheAccess,
+                environment: {
+                    ...cacheEnvironment,
+                    TABLE_NAME: table.tableName,
+                    EXERCISE_TYPE: exerciseType,
+                    REFILL_POLICY: JSON.stringify(this.refillPolicy),
+                    DIFFICULTY: JSON.stringify(this.difficulty),
+                    EXERCISE_ENCODING: this.exerciseEncoding,
+                    TABLE_USER_COUNT: dynamoStack.userCountTable.tableName,
+                }
+            });
+            // writes when an empty pool is refilled synchronously
+            table.grantReadWriteData(getExerciseLambda);
+            dynamoStack.userCountTable.grantReadData(getExerciseLambda);
 
+            this.getExerciseLambdas[exerciseType] = getExerciseLambda;
 
-        const generatorMultiplication = new lambda.Function(this, "multiplication" + "Generator", {
-            functionName: "multiplication" + "Generator",
-            runtime: lambda.Runtime.PYTHON_3_9,
-            code: lambda.Code.fromAsset(path.join(__dirname, "lambdas")),
-            handler: "generators.generate_multiplication_exercises",
-            environment: {
-                TABLE_NAME: multiplication_table.tableName,
-            }
-        });
-        multiplication_table.grantWriteData(generatorMultiplication);
+            // evaluator
+            const evaluator = new lambda.Function(this, title + "Evaluator", {
+                functionName: title + "Evaluator",
+                runtime: lambda.Runtime.PYTHON_3_9,
+                layers: [this.sharedLayer],
+                code: lambda.Code.fromAsset(path.join(__dirname, "lambdas")),
+                handler: "evaluator_lambdas.handler",
+                ...cacheAccess,
+                environment: {
+                    ...cacheEnvironment,
+                    TABLE_USER_COUNT: dynamoStack.userCountTable.tableName,
+                    TABLE_EXERCISE: table.tableName,
+                    EXERCISE_TYPE: exerciseType,
+                    EXERCISE_ENCODING: this.exerciseEncoding,
+                }
+            });
 
-        const queueGenerator2 = new sqs.Queue(this, "Exercise-" + "multiplication" + "-Queue", {
-            queueName: "Exercise-" + "multiplication" + "-Queue",
-            visibilityTimeout: cdk.Duration.seconds(300),
-        });
+            table.grantReadWriteData(evaluator);
+            dynamoStack.userCountTable.grantWriteData(evaluator);
 
-        // subscribe queue to SNS
-        snsStack.exerciseGenerateTopic.addSubscription(new subs.SqsSubscription(queueGenerator2, {
-            filterPolicy: {
-                type: sns.SubscriptionFilter.stringFilter({allowlist: ["multiplication"]})
-            }
-        }));
+            const evaluateQueue = new sqs.Queue(this, "Exercise" + title + "EvaluateQueue", {
+                queueName: "Exercise-" + exerciseType + "-EvaluateQueue",
+                visibilityTimeout: cdk.Duration.seconds(300),
+            });
 
-        // Add SQS as an event source for the Lambda function
-        generatorMultiplication.addEventSource(new SqsEventSource(queueGenerator2, {
-            batchSize: 5, //TODO do we need batch size
-        }));
+            snsStack.exerciseEvaluateTopic.addSubscription(new subs.SqsSubscription(evaluateQueue, {
+                filterPolicy: {
+                    type: sns.SubscriptionFilter.stringFilter({allowlist: [exerciseType]}),
+                    // events of inline graded submissions are not for the evaluator
+                    event: new sns.SubscriptionFilter([{exists: false}]),
+                }
+            }));
 
-        const getLambdaMultiplication = new lambda.Function(this, "multiplication-getExerciseLambda", {
-            functionName: "multiplication-getExerciseLambda",
-            runtime: lambda.Runtime.PYTHON_3_9,
-            code: lambda.Code.fromAsset(path.join(__dirname, "lambdas")),
-            handler: "get-exercise.handler",
-            environment: {
-                TABLE_NAME: multiplication_table.tableName,
-            }
-        });
-        multiplication_table.grantReadData(getLambdaMultiplication);
+            evaluateQueue.grantConsumeMessages(evaluator);
+            evaluator.addEventSource(new SqsEventSource(evaluateQueue, evaluatorBatching));
 
-        this.getExerciseLambdas["multiplication"] = getLambdaMultiplication;
+            // post solution
+            const postSolutionLambda = new lambda.Function(this, "post" + title + "SolutionLambda", {
+                functionName: "Post" + title + "Solution",
+                runtime: lambda.Runtime.PYTHON_3_9,
+                layers: [this.sharedLayer],
+                code: lambda.Code.fromAsset(path.join(__dirname, "lambdas")),
+                handler: "post-solution.handler",
+                ...cacheAccess,
+                environment: {
+                    ...cacheEnvironment,
+                    SNS_TOPIC_ARN: snsStack.exerciseEvaluateTopic.topicArn,
+                    EXERCISE_TYPE: exerciseType,
+                    TABLE_SUBMISSION_DEDUPE: dynamoStack.submissionDedupeTable.tableName,
+                    GRADING_MODE: this.gradingMode[exerciseType] ?? "async",
+                    TABLE_EXERCISE: table.tableName,
+                    TABLE_USER_COUNT: dynamoStack.userCountTable.tableName,
+                    EXERCISE_ENCODING: this.exerciseEncoding,
+                }
+            });
 
-        const generatorDerivatives = new lambda.Function(this, "derivatives" + "Generator", {
-            functionName: "derivatives" + "Generator",
-            runtime: lambda.Runtime.PYTHON_3_9,
-            code: lambda.Code.fromAsset(path.join(__dirname, "lambdas")),
-            handler: "generators.generate_derivative_exercises",
-            environment: {
-                TABLE_NAME: derivatives_table.tableName,
+            snsStack.exerciseEvaluateTopic.grantPublish(postSolutionLambda)
+            dynamoStack.submissionDedupeTable.grantWriteData(postSolutionLambda)
+            if (this.gradingMode[exerciseType] === "inline") {
+                table.grantReadWriteData(postSolutionLambda);
+                dynamoStack.userCountTable.grantWriteData(postSolutionLambda);
             }
-        });
-        derivatives_table.grantWriteData(generatorDerivatives);
-        const queueGenerator3 = new sqs.Queue(this, "Exercise-" + "derivatives" + "-Queue", {
-            queueName: "Exercise-" + "derivatives" + "-Queue",
-            visibilityTimeout: cdk.Duration.seconds(300),
-        });
 
-        // subscribe queue to SNS
-        snsStack.exerciseGenerateTopic.addSubscription(new subs.SqsSubscription(queueGenerator3, {
-            filterPolicy: {
-                type: sns.SubscriptionFilter.stringFilter({allowlist: ["derivatives"]})
-            }
-        }));
+            this.postSolutionLambdas[exerciseType] = postSolutionLambda;
 
-        // Add SQS as an event source for the Lambda function
-        generatorDerivatives.addEventSource(new SqsEventSource(queueGenerator3, {
-            batchSize: 5, //TODO do we need batch size
-        }));
+            // watcher
+            const watcherLambda = new lambda.Function(this, "watcher" + title + "Lambda", {
+                functionName: "Watcher" + title + "Exercises",
+                runtime: lambda.Runtime.PYTHON_3_9,
+                layers: [this.sharedLayer],
+                code: lambda.Code.fromAsset(path.join(__dirname, "lambdas")),
+                handler: "watcher.handler",
+                environment: {
+                    TABLE_NAME: table.tableName,
+                    SNS_TOPIC_ARN: snsStack.exerciseGenerateTopic.topicArn,
+                    EXERCISE_TYPE: exerciseType,
+                    REFILL_POLICY: JSON.stringify(this.refillPolicy),
+                    TABLE_USER_COUNT: dynamoStack.userCountTable.tableName,
+                }
+            });
 
-        // Grant Lambda permissions to read from SQS
-        queueGenerator3.grantConsumeMessages(generatorDerivatives);
+            table.grantReadData(watcherLambda)
+            // marks a top-up in flight, lambdas/refill.py
+            dynamoStack.userCountTable.grantWriteData(watcherLambda)
+            table.grantStreamRead(watcherLambda)
+            snsStack.exerciseGenerateTopic.grantPublish(watcherLambda)
 
-        const getLambdaDerivatives = new lambda.Function(this, "derivatives-getExerciseLambda", {
-            functionName: "derivatives-getExerciseLambda",
-            runtime: lambda.Runtime.PYTHON_3_9,
-            code: lambda.Code.fromAsset(path.join(__dirname, "lambdas")),
-            handler: "get-exercise.handler",
-            environment: {
-                TABLE_NAME: derivatives_table.tableName,
-            }
-        });
-        derivatives_table.grantReadData(getLambdaDerivatives);
+            watcherLambda.addEventSource(
+                new DynamoEventSource(table, watcherBatching)
+            );
 
-        this.getExerciseLambdas["derivatives"] = getLambdaDerivatives;
+            // aggregator, folds answered exercises into the Stats table
+            const aggregatorLambda = new lambda.Function(this, "aggregate" + title + "Lambda", {
+                functionName: "Aggregate" + title + "Stats",
+                runtime: lambda.Runtime.PYTHON_3_9,
+                layers: [this.sharedLayer],
+                code: lambda.Code.fromAsset(path.join(__dirname, "lambdas")),
+                handler: "aggregator.handler",
+                environment: {
+                    TABLE_STATS: dynamoStack.statsTable.tableName,
+                    EXERCISE_TYPE: exerciseType,
+                }
+            });
 
-        const derivatives_evaluator = new lambda.Function(this, "DerivativesEvaluator", {
-                functionName: "DerivativesEvaluator",
+            table.grantStreamRead(aggregatorLambda)
+            dynamoStack.statsTable.grantReadWriteData(aggregatorLambda)
+
+            aggregatorLambda.addEventSource(new DynamoEventSource(table, {
+                ...watcherBatching,
+                // only the answer of an exercise, not its creation or later updates
+                filters: [lambda.FilterCriteria.filter({
+                    eventName: lambda.FilterRule.isEqual('MODIFY'),
+                    dynamodb: {
+                        NewImage: {answered: {BOOL: lambda.FilterRule.isEqual(true)}},
+                        OldImage: {answered: {BOOL: lambda.FilterRule.isEqual(false)}},
+                    },
+                })],
+            }));
+
+            // archiver, moves old answers to S3 and deletes them from the table
+            const archiverLambda = new lambda.Function(this, "archive" + title + "Lambda", {
+                functionName: "Archive" + title + "Exercises",
                 runtime: lambda.Runtime.PYTHON_3_9,
+                layers: [this.sharedLayer],
                 code: lambda.Code.fromAsset(path.join(__dirname, "lambdas")),
-                handler: "evaluator_lambdas.evaluate_derivatives",
+                handler: "archiver.handler",
+                timeout: cdk.Duration.minutes(15),
+                memorySize: 512,
                 environment: {
+                    TABLE_NAME: table.tableName,
                     TABLE_USER_COUNT: dynamoStack.userCountTable.tableName,
-                    TABLE_EXERCISE: derivatives_table.tableName,
+                    EXERCISE_TYPE: exerciseType,
+                    ARCHIVE_BUCKET: s3Stack.bucket.bucketName,
+                    ARCHIVE_PREFIX: this.archivePrefix,
+                    ARCHIVE_AFTER_DAYS: String(this.archiveAfterDays),
                 }
             });
 
-        derivatives_table.grantReadWriteData(derivatives_evaluator);
-        dynamoStack.userCountTable.grantWriteData(derivatives_evaluator);
-
-        const queueDerivativesEvaluator = new sqs.Queue(this, "ExerciseDerivativesEvaluateQueue", {
-                    queueName: "Exercise-derivatives-EvaluateQueue",
-                    visibilityTimeout: cdk.Duration.seconds(300),
-        });
+            table.grantReadWriteData(archiverLambda)
+            dynamoStack.userCountTable.grantReadData(archiverLambda)
+            s3Stack.bucket.grantPut(archiverLambda, this.archivePrefix + "/*")
 
-        snsStack.exerciseEvaluateTopic.addSubscription(new subs.SqsSubscription(queueDerivativesEvaluator, {
-        filterPolicy: {
-                type: sns.SubscriptionFilter.stringFilter({allowlist: ["derivatives"]})
-        }
-        }));
-
-        queueDerivativesEvaluator.grantConsumeMessages(derivatives_evaluator);
-        derivatives_evaluator.addEventSource(new SqsEventSource(queueDerivativesEvaluator, {}));
-
-        const addition_evaluator = new lambda.Function(this, "AdditionEvaluator", {
-                    functionName: "AdditionEvaluator",
-                    runtime: lambda.Runtime.PYTHON_3_9,
-                    code: lambda.Code.fromAsset(path.join(__dirname, "lambdas")),
-                    handler: "evaluator_lambdas.evaluate_addition",
-                    environment: {
-                        TABLE_USER_COUNT: dynamoStack.userCountTable.tableName,
-                        TABLE_EXERCISE: addition_table.tableName,
-                    }
-                });
-
-        addition_table.grantReadWriteData(addition_evaluator);
-        dynamoStack.userCountTable.grantWriteData(addition_evaluator);
-
-        const queueAdditionEvaluator = new sqs.Queue(this, "ExerciseAdditionEvaluateQueue", {
-                    queueName: "Exercise-addition-EvaluateQueue",
-                    visibilityTimeout: cdk.Duration.seconds(300),
-        });
-
-        snsStack.exerciseEvaluateTopic.addSubscription(new subs.SqsSubscription(queueAdditionEvaluator, {
-        filterPolicy: {
-                type: sns.SubscriptionFilter.stringFilter({allowlist: ["addition"]})
-        }
-        }));
-
-        queueAdditionEvaluator.grantConsumeMessages(addition_evaluator);
-        addition_evaluator.addEventSource(new SqsEventSource(queueAdditionEvaluator, {}));
-
-        const multiplication_evaluator = new lambda.Function(this, "MultiplicationEvaluator", {
-                    functionName: "MultiplicationEvaluator",
-                    runtime: lambda.Runtime.PYTHON_3_9,
-                    code: lambda.Code.fromAsset(path.join(__dirname, "lambdas")),
-                    handler: "evaluator_lambdas.evaluate_multiplication",
-                    environment: {
-                        TABLE_USER_COUNT: dynamoStack.userCountTable.tableName,
-                        TABLE_EXERCISE: multiplication_table.tableName,
-                    }
-                });
-
-        multiplication_table.grantReadWriteData(multiplication_evaluator);
-        dynamoStack.userCountTable.grantWriteData(multiplication_evaluator);
-
-        const queueMultiplicationEvaluator = new sqs.Queue(this, "ExerciseMultiplicationEvaluateQueue", {
-                    queueName: "Exercise-Multiplication-EvaluateQueue",
-                    visibilityTimeout: cdk.Duration.seconds(300),
-        });
-
-        snsStack.exerciseEvaluateTopic.addSubscription(new subs.SqsSubscription(queueMultiplicationEvaluator, {
-        filterPolicy: {
-                type: sns.SubscriptionFilter.stringFilter({allowlist: ["multiplication"]})
+            new events.Rule(this, "archive" + title + "Schedule", {
+                schedule: events.Schedule.cron({minute: "0", hour: "3"}),
+                targets: [new targets.LambdaFunction(archiverLambda)],
+            });
         }
-        }));
-
-        queueMultiplicationEvaluator.grantConsumeMessages(multiplication_evaluator);
-        multiplication_evaluator.addEventSource(new SqsEventSource(queueMultiplicationEvaluator, {}));
-
 
-        // Post solution lambdas
 
-        const postAdditionSolutionLambda = new lambda.Function(this, "postAdditionSolutionLambda", {
-            functionName: "PostAdditionSolution",
-            runtime: lambda.Runtime.PYTHON_3_9,
-            code: lambda.Code.fromAsset(path.join(__dirname, "lambdas")),
-            handler: "post-solution.handler",
-            environment: {
-                SNS_TOPIC_ARN: snsStack.exerciseEvaluateTopic.topicArn,
-                EXERCISE_TYPE: 'addition'
-            }
-        });
-
-        const postMultiplicationSolutionLambda = new lambda.Function(this, "postMultiplicationSolutionLambda", {
-            functionName: "PostMultiplicationSolution",
-            runtime: lambda.Runtime.PYTHON_3_9,
-            code: lambda.Code.fromAsset(path.join(__dirname, "lambdas")),
-            handler: "post-solution.handler",
-            environment: {
-                SNS_TOPIC_ARN: snsStack.exerciseEvaluateTopic.topicArn,
-                EXERCISE_TYPE: 'multiplication'
-            }
-        });
+        // get profile lambda
 
-        const postDerivativeSolutionLambda = new lambda.Function(this, "postDerivativeSolutionLambda", {
-            functionName: "PostDerivativeSolution",
+        const getProfileLambda = new lambda.Function(this, "getProfileLambda", {
+            functionName: "GetProfileLambda",
             runtime: lambda.Runtime.PYTHON_3_9,
+            layers: [this.sharedLayer],
             code: lambda.Code.fromAsset(path.join(__dirname, "lambdas")),
-            handler: "post-solution.handler",
+            handler: "get-profile.handler",
+            ...cacheAccess,
             environment: {
-                SNS_TOPIC_ARN: snsStack.exerciseEvaluateTopic.topicArn,
-                EXERCISE_TYPE: 'derivatives'
+                ...cacheEnvironment,
+                TABLE_USER_COUNT: dynamoStack.userCountTable.tableName,
+                EXERCISE_TYPES: JSON.stringify(snsStack.exerciseTypeList),
             }
         });
 
-        snsStack.exerciseEvaluateTopic.grantPublish(postAdditionSolutionLambda)
-        snsStack.exerciseEvaluateTopic.grantPublish(postMultiplicationSolutionLambda)
-        snsStack.exerciseEvaluateTopic.grantPublish(postDerivativeSolutionLambda)
+        dynamoStack.userCountTable.grantReadData(getProfileLambda)
 
-        this.postSolutionLambdas['addition'] = postAdditionSolutionLambda;
-        this.postSolutionLambdas['derivatives'] = postDerivativeSolutionLambda;
-        this.postSolutionLambdas['multiplication'] = postMultiplicationSolutionLambda;
+        this.getProfileLambda = getProfileLambda;
 
-        // watcher
-        const watcherAdditionLambda = new lambda.Function(this, "watcherAdditionLambda", {
-            functionName: "WatcherAdditionExercises",
+        // answered exercises, paginated over the solveTime LSI and then the archive
+        const getHistoryLambda = new lambda.Function(this, "getHistoryLambda", {
+            functionName: "GetHistoryLambda",
             runtime: lambda.Runtime.PYTHON_3_9,
+            layers: [this.sharedLayer],
             code: lambda.Code.fromAsset(path.join(__dirname, "lambdas")),
-            handler: "watcher.handler",
+            handler: "get-history.handler",
             environment: {
-                TABLE_NAME: addition_table.tableName,
-                SNS_TOPIC_ARN: snsStack.exerciseGenerateTopic.topicArn,
-                EXERCISE_TYPE: 'addition',
+                EXERCISE_TYPES: JSON.stringify(snsStack.exerciseTypeList),
+                ARCHIVE_BUCKET: s3Stack.bucket.bucketName,
+                ARCHIVE_PREFIX: this.archivePrefix,
             }
         });
 
+        for (let exerciseType of snsStack.exerciseTypeList) {
+            dynamoStack.exerciseTables[exerciseType].grantReadData(getHistoryLambda)
+        }
+        s3Stack.bucket.grantRead(getHistoryLambda, this.archivePrefix + "/*")
 
-        const watcherMultiplicationLambda = new lambda.Function(this, "watcherMultiplicationLambda", {
-            functionName: "WatcherMultiplicationExercises",
-            runtime: lambda.Runtime.PYTHON_3_9,
-            code: lambda.Code.fromAsset(path.join(__dirname, "lambdas")),
-            handler: "watcher.handler",
-            environment: {
-                TABLE_NAME: multiplication_table.tableName,
-                SNS_TOPIC_ARN: snsStack.exerciseGenerateTopic.topicArn,
-                EXERCISE_TYPE: 'multiplication',
-            }
-        });
+        this.getHistoryLambda = getHistoryLambda;
 
-        const watcherDerivativeLambda = new lambda.Function(this, "watcherDerivativeLambda", {
-            functionName: "WatcherDerivativeExercises",
+        // leaderboard and statistics of a type, read from the Stats table
+        const getStatsLambda = new lambda.Function(this, "getStatsLambda", {
+            functionName: "GetStatsLambda",
             runtime: lambda.Runtime.PYTHON_3_9,
+            layers: [this.sharedLayer],
             code: lambda.Code.fromAsset(path.join(__dirname, "lambdas")),
-            handler: "watcher.handler",
+            handler: "get-stats.handler",
             environment: {
-                TABLE_NAME: derivatives_table.tableName,
-                SNS_TOPIC_ARN: snsStack.exerciseGenerateTopic.topicArn,
-                EXERCISE_TYPE: 'derivatives',
+                TABLE_STATS: dynamoStack.statsTable.tableName,
+                EXERCISE_TYPES: JSON.stringify(snsStack.exerciseTypeList),
             }
         });
 
-        addition_table.grantStreamRead(watcherAdditionLambda)
-        multiplication_table.grantStreamRead(watcherMultiplicationLambda)
-        derivatives_table.grantStreamRead(watcherDerivativeLambda)
-
-        snsStack.exerciseGenerateTopic.grantPublish(watcherAdditionLambda)
-        snsStack.exerciseGenerateTopic.grantPublish(watcherMultiplicationLambda)
-        snsStack.exerciseGenerateTopic.grantPublish(watcherDerivativeLambda)
+        dynamoStack.statsTable.grantReadData(getStatsLambda)
 
-        watcherAdditionLambda.addEventSource(
-            new DynamoEventSource(addition_table, {startingPosition: StartingPosition.LATEST})
-        );
-
-        watcherMultiplicationLambda.addEventSource(
-            new DynamoEventSource(multiplication_table, {startingPosition: StartingPosition.LATEST})
-        );
-
-        watcherDerivativeLambda.addEventSource(
-            new DynamoEventSource(derivatives_table, {startingPosition: StartingPosition.LATEST})
-        );
-
-
-        // get profile lambda
-
-        const getProfileLambda = new lambda.Function(this, "getProfileLambda", {
-            functionName: "GetProfileLambda",
-            runtime: lambda.Runtime.PYTHON_3_9,
-            code: lambda.Code.fromAsset(path.join(__dirname, "lambdas")),
-            handler: "get-profile.handler",
-            environment: {}
-        });
-
-        addition_table.grantReadData(getProfileLambda)
-        multiplication_table.grantReadData(getProfileLambda)
-        derivatives_table.grantReadData(getProfileLambda)
-
-        this.getProfileLambda = getProfileLambda;
+        this.getStatsLambda = getStatsLambda;
 
     }
 }
@@ -0,0 +1,240 @@
+import runtime  # first import, starts the init timer
+import metrics
+
+import logging
+import os
+import random
+from collections import Counter, defaultdict
+
+from boto3.dynamodb.types import TypeDeserializer
+from botocore.exceptions import ClientError
+
+import stats
+
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+dynamodb = runtime.resource('dynamodb')
+deserializer = TypeDeserializer()
+
+# a leaderboard shard is written with a version check, conflicting writers read it again;
+# users whose state changed between read and commit are folded again
+MAX_ROUNDS = 5
+# lastSequence is stored as a zero padded string, the padding keeps them comparable
+SEQUENCE_DIGITS = 40
+
+# (type, shard) -> (version, entries) of the last leaderboard shard read or written by this container
+_boards = {}
+
+
+# NEW_AND_OLD_IMAGES stream of an Exercise<type> table, filtered to answers by the event source
+@metrics.instrument("aggregator")
+def handler(event, context):
+    exercise_type = os.environ['EXERCISE_TYPE']
+    table = dynamodb.Table(os.environ['TABLE_STATS'])
+
+    answers = answered(event['Records'])
+    if not answers:
+        return
+
+    # the user states and the totals they add are committed together, users of a retried batch that were
+    # folded already add nothing; the leaderboard entries are absolute and written for all users
+    board_updates = defaultdict(dict)
+    pending = list(answers)
+
+    for round_number in range(MAX_ROUNDS):
+        if not pending:
+            break
+        states = read_states(exercise_type, pending)
+        retry = []
+        for start in range(0, len(pending), runtime.MAX_TRANSACTION_ITEMS - 1):
+            chunk = pending[start:start + runtime.MAX_TRANSACTION_ITEMS - 1]
+            retry.extend(fold_chunk(table, exercise_type, chunk, answers, states, board_updates))
+        pending = retry
+
+    if pending:
+        # SQS-less stream batches are retried as a whole, the users folded so far are skipped then
+        raise RuntimeError(f'States of {len(pending)} users of {exercise_type} changed in every round')
+
+    for shard, entries in board_updates.items():
+        update_leaderboard(table, exercise_type, shard, entries)
+
+
+def sequence_key(sequence):
+    # stream sequence numbers have up to 40 digits, more than a DynamoDB number keeps
+    return f'{int(sequence):0{SEQUENCE_DIGITS}d}'
+
+
+def answered(records):
+    """uid -> (last sequence number, [(solveTime, correct)]) of the exercises answered in a batch."""
+    answers = {}
+
+    for record in records:
+        if record.get('eventName') != 'MODIFY':
+            continue
+        images = record['dynamodb']
+        new = {k: deserializer.deserialize(v) for k, v in images.get('NewImage', {}).items()}
+        old = {k: deserializer.deserialize(v) for k, v in images.get('OldImage', {}).items()}
+        # only the transition counts, later updates of an answered exercise do not
+        if not new.get('answered') or old.get('answered'):
+            continue
+
+        sequence, solved = answers.get(new['uid'], (0, []))
+        solved.append((int(new['solveTime']), bool(new.get('correctness'))))
+        answers[new['uid']] = (max(sequence, int(images['SequenceNumber'])), solved)
+
+    return answers
+
+
+def read_states(exercise_type, uids):
+    """uid -> stored state of the users, strongly consistent; users without one are missing."""
+    table_name = os.environ['TABLE_STATS']
+    states = {}
+    for start in range(0, len(uids), runtime.MAX_BATCH_GET_KEYS):
+        request = {table_name: {
+            'Keys': [stats.user_key(exercise_type, uid) for uid in uids[start:start + runtime.MAX_BATCH_GET_KEYS]],
+            'ConsistentRead': True,
+        }}
+        while request:
+            response = dynamodb.batch_get_item(RequestItems=request)
+            for item in response.get('Responses', {}).get(table_name, []):
+                states[item['pk'].rsplit('#', 1)[1]] = item
+            request = response.get('UnprocessedKeys')
+    return states
+
+
+def fold_chunk(table, exercise_type, uids, answers, states, board_updates):
+    """Commits the new states of the users and their totals in one transaction, returns the uids to retry."""
+    totals = Counter()
+    transact_items = []
+
+    for uid in uids:
+        sequence, solved = answers[uid]
+        state = states.get(uid, {})
+        stored_sequence = state.get('lastSequence')
+
+        if stored_sequence is not None and int(stored_sequence) >= sequence:
+            logger.info(f'Answers of user {uid} up to {sequence} were aggregated already')
+            new = {'answered': int(state['answered']), 'correct': int(state['correct'])}
+        else:
+            new = fold(state, solved, totals)
+            # optimistic: the state is only replaced if it is still the one the totals were computed from
+            if stored_sequence is None:
+                condition, values = 'attribute_not_exists(lastSequence)', {}
+            else:
+                condition, values = 'lastSequence = :read', {':read': stored_sequence}
+            transact_items.append({'Update': {
+                'TableName': table.name,
+                'Key': stats.user_key(exercise_type, uid),
+                'UpdateExpression': 'SET answered = :n, correct = :c, lastSolveTime = :last, lastSequence = :seq',
+                'ConditionExpression': condition,
+                'ExpressionAttributeValues': {
+                    **values, ':n': new['answered'], ':c': new['correct'], ':last': new['lastSolveTime'],
+                    ':seq': sequence_key(sequence),
+                },
+            }})
+
+        board_updates[stats.leaderboard_shard(uid)][uid] = {
+            'uid': uid, 'correct': new['correct'], 'answered': new['answered'],
+        }
+
+    totals = {name: value for name, value in totals.items() if value}
+    if totals:
+        transact_items.append({'Update': {
+            'TableName': table.name,
+            'Key': {'pk': stats.totals_pk(exercise_type), 'sk': stats.shard_sk(random.randrange(stats.TOTALS_SHARDS))},
+            'UpdateExpression': 'ADD ' + ', '.join(f'#{name} :{name}' for name in totals),
+            'ExpressionAttributeNames': {f'#{name}': name for name in totals},
+            'ExpressionAttributeValues': {f':{name}': value for name, value in totals.items()},
+        }})
+
+    if not transact_items:
+        return []
+
+    try:
+        dynamodb.meta.client.transact_write_items(TransactItems=transact_items)
+    except ClientError as e:
+        if e.response.get('Error', {}).get('Code') != 'TransactionCanceledException':
+            raise
+        # a state changed since it was read, e.g. by a concurrent retry; the chunk is read and folded again
+        logger.info(f'Stats transaction of {len(uids)} users of {exercise_type} cancelled, retried')
+        for uid in uids:
+            board_updates[stats.leaderboard_shard(uid)].pop(uid, None)
+        return list(uids)
+
+    return []
+
+
+def fold(state, solved, totals):
+    """The user's state after the answers, adds what changes in the totals."""
+    solved.sort()
+    old = {
+        'answered': int(state.get('answered', 0)),
+        'correct': int(state.get('correct', 0)),
+        'lastSolveTime': int(state['lastSolveTime']) if 'lastSolveTime' in state else None,
+    }
+    correct = sum(c for _, c in solved)
+    new = {
+        'answered': old['answered'] + len(solved),
+        'correct': old['correct'] + correct,
+        'lastSolveTime': solved[-1][0],
+    }
+    totals['answered'] += len(solved)
+    totals['correct'] += correct
+
+    # the user moves from one accuracy bucket to another
+    old_bucket = stats.accuracy_bucket(old['correct'], old['answered'])
+    new_bucket = stats.accuracy_bucket(new['correct'], new['answered'])
+    if old_bucket != new_bucket:
+        if old_bucket is not None:
+            totals[f'a{old_bucket}'] -= 1
+        totals[f'a{new_bucket}'] += 1
+
+    # time between consecutive answers of the user in one session
+    previous = old['lastSolveTime']
+    for solve_time, _ in solved:
+        if previous is not None and 0 <= solve_time - previous <= stats.SESSION_GAP_SECONDS:
+            totals[f't{stats.solve_time_bucket(solve_time - previous)}'] += 1
+        previous = solve_time
+
+    return new
+
+
+def update_leaderboard(table, exercise_type, shard, updates):
+    key = {'pk': stats.leaderboard_pk(exercise_type), 'sk': stats.shard_sk(shard)}
+    version, entries = _boards.get((exercise_type, shard), (None, None))
+
+    for round_number in range(MAX_ROUNDS):
+        if version is None:
+            item = table.get_item(Key=key, ConsistentRead=True).get('Item', {})
+            version, entries = int(item.get('version', 0)), item.get('entries', [])
+
+        current = {entry['uid']: entry for entry in entries}
+        full = len(current) >= stats.LEADERBOARD_SIZE
+        worst = max(map(stats.rank, current.values())) if current else None
+        # entries only improve, a user ranked below the worst known entry cannot be on the stored board either
+        candidates = {uid: e for uid, e in updates.items()
+                      if uid in current or not full or stats.rank(e) < worst}
+        if not candidates:
+            return
+
+        board = stats.top({**current, **candidates}.values())
+        try:
+            table.put_item(
+                Item={**key, 'entries': board, 'version': version + 1},
+                ConditionExpression='attribute_not_exists(version) OR version = :version',
+                ExpressionAttributeValues={':version': version},
+            )
+            _boards[(exercise_type, shard)] = (version + 1, board)
+            return
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') != 'ConditionalCheckFailedException':
+                raise
+            # written by another container in the meantime
+            version = None
+
+    # the batch is retried, its users are folded already and only their entries are written again
+    raise RuntimeError(f'Leaderboard shard {shard} of {exercise_type} not updated after {MAX_ROUNDS} rounds')
+
+
+runtime.report_init("aggregator")
@@ -0,0 +1,60 @@
+import hashlib
+import json
+import math
+from decimal import Decimal
+
+import exercise_types
+
+
+# canonical answers are computed once by the generators and stored as a compact key
+# next to the exercise, so the evaluators only compare keys
+def solve(exercise):
+    return solve_all([exercise])[0]
+
+
+def solve_all(exercises):
+    # one batch call per exercise type, e.g. one vectorized call for all derivatives
+    solutions = [None] * len(exercises)
+    rows_by_kind = {}
+
+    for i, exercise in enumerate(exercises):
+        rows_by_kind.setdefault(exercise['type'], []).append(i)
+
+    for kind, rows in rows_by_kind.items():
+        exercise_type = exercise_types.by_kind(kind)
+        batch = [normalize(exercises[i]) for i in rows]
+
+        for exercise in batch:
+            if not exercise_type.validate(exercise):
+                raise ValueError(f"Malformed {kind} exercise {exercise}")
+
+        for i, solution in zip(rows, exercise_type.solve(batch)):
+            solutions[i] = solution
+
+    return solutions
+
+
+def canonical_answers(exercise_type, answers):
+    return exercise_types.get(exercise_type).encode(answers)
+
+
+def normalize(value):
+    # DynamoDB returns Decimals and the client may send 12.0 for 12
+    if isinstance(value, dict):
+        return {k: normalize(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [normalize(v) for v in value]
+    # json.loads accepts NaN and turns 1e999 into inf, neither is an answer
+    if isinstance(value, float) and not math.isfinite(value) or isinstance(value, Decimal) and not value.is_finite():
+        raise ValueError(f"{value} is not a finite number")
+    if isinstance(value, (Decimal, float)) and value == int(value):
+        return int(value)
+    if isinstance(value, Decimal):
+        return float(value)
+    return value
+
+
+# example: answer_key("4f1c...", 12) -> "9b2f0c1d7e6a5b43"
+def answer_key(exercise_id, answer):
+    canonical = json.dumps(normalize(answer), sort_keys=True, separators=(',', ':'))
+    return hashlib.blake2b(f"{exercise_id}:{canonical}".encode(), digest_size=8).hexdigest()
@@ -0,0 +1,67 @@
+"""
+Answered exercises older than ARCHIVE_AFTER_DAYS, moved from the Exercise tables
+to gzipped NDJSON in S3 by archiver.py and read back by get-history.py.
+
+The objects are partitioned by type and the date of the run that wrote them:
+
+    archive/type=addition/date=2026-10-18/<run>-<part>.ndjson.gz
+
+One line per answer, the same fields the history returns, with the exercise
+and the answer decoded. Inside an object all answers of one user are one gzip
+member, newest first, so the object is valid gzip as a whole and a member can
+be read on its own with a ranged GET. A daily run thus adds one member per
+user, and a history page is usually one GET, where members per solve date
+would take one per day the user was active.
+
+For every member the archiver puts a pointer item into the user's partition
+of the Exercise table, `archive#<newest solveTime>#<run>`, with the object key
+and byte range. Pointers have no solveTime or openSince and stay out of both
+indexes; a query of the partition on the `archive#` prefix lists them newest
+first, which is where the history continues once the solveTime index ends.
+"""
+import gzip
+import json
+import os
+
+from answer_keys import normalize
+import codec
+
+PREFIX = os.environ.get("ARCHIVE_PREFIX", "archive")
+POINTER_PREFIX = "archive#"
+# sorts after every pointer id, the upper bound of a query over all of them
+LAST_POINTER = POINTER_PREFIX + "~"
+
+
+def after_days():
+    return int(os.environ.get("ARCHIVE_AFTER_DAYS", 90))
+
+
+def pointer_id(newest, run):
+    # zero padded, the ids sort like the solve times
+    return f"{POINTER_PREFIX}{int(newest):010d}#{run}"
+
+
+def object_key(exercise_type, date, run, part):
+    return f"{PREFIX}/type={exercise_type}/date={date}/{run}-{part:04d}.ndjson.gz"
+
+
+def record(item):
+    """The archived line of an answered exercise, item as read by the resource API."""
+    return {
+        "id": item["id"],
+        "exercise": normalize(codec.decode_exercise(item["exercise"])),
+        "answer": normalize(codec.decode_answer(item["answer"])) if "answer" in item else None,
+        "correctness": item.get("correctness"),
+        "solveTime": int(item["solveTime"]),
+    }
+
+
+def encode_member(records):
+    lines = "".join(json.dumps(r, separators=(",", ":")) + "\n" for r in records)
+    return gzip.compress(lines.encode())
+
+
+def read_member(s3, bucket, key, start, length):
+    """The records of one member, newest first."""
+    body = s3.get_object(Bucket=bucket, Key=key, Range=f"bytes={start}-{start + length - 1}")["Body"].read()
+    return [json.loads(line) for line in gzip.decompress(body).splitlines() if line]
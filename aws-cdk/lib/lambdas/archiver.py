@@ -0,0 +1,156 @@
+import runtime  # first import, starts the init timer
+import metrics
+
+import logging
+import os
+import time
+import uuid
+from collections import Counter
+
+from boto3.dynamodb.conditions import Attr, Key
+
+import archive
+
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+# users per group, the answers of a group go into one object
+USERS_PER_OBJECT = int(os.environ.get('ARCHIVE_USERS_PER_OBJECT', 500))
+# the run stops before the Lambda timeout, the next run picks up the rest
+STOP_BEFORE_TIMEOUT_MS = 60000
+
+# created once per container and reused by warm invocations
+dynamodb = runtime.resource('dynamodb')
+s3_client = runtime.client('s3')
+
+
+def users(exercise_type):
+    """The uids with answers of the type, from their UserCount items."""
+    table = dynamodb.Table(os.environ['TABLE_USER_COUNT'])
+    scan = {'FilterExpression': Attr('etype').eq(exercise_type), 'ProjectionExpression': 'uid'}
+    while True:
+        response = table.scan(**scan)
+        for item in response.get('Items', []):
+            yield item['uid']
+        if 'LastEvaluatedKey' not in response:
+            return
+        scan['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+
+def archived_until(table, uid):
+    """solveTime of the newest archived answer of the user, 0 if nothing is archived."""
+    response = table.query(
+        KeyConditionExpression=Key('uid').eq(uid) & Key('id').between(archive.POINTER_PREFIX, archive.LAST_POINTER),
+        ProjectionExpression='newest',
+        ScanIndexForward=False,
+        Limit=1,
+    )
+    items = response.get('Items', [])
+    return int(items[0]['newest']) if items else 0
+
+
+def old_answers(table, uid, cutoff):
+    """Answered exercises of the user solved before the cutoff, newest first."""
+    query = {
+        'IndexName': table.name + 'LSI',
+        'KeyConditionExpression': Key('uid').eq(uid) & Key('solveTime').lt(cutoff),
+        # exercises generated before the open index carry a solveTime of 1 to 100 while unanswered
+        'FilterExpression': Attr('answered').eq(True),
+        'ScanIndexForward': False,
+        # an answer written just before the run is not missed
+        'ConsistentRead': True,
+    }
+    items = []
+    while True:
+        response = table.query(**query)
+        items.extend(response.get('Items', []))
+        if 'LastEvaluatedKey' not in response:
+            return items
+        query['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+
+def archive_group(table, key, run, group, counts):
+    """Writes the answers of a group of users to one object, then their pointers, then deletes them from the table."""
+    body = bytearray()
+    pointers = []
+    deletes = []
+
+    for uid, items in group.items():
+        # left over by a run that stopped between its pointers and its deletes
+        until = archived_until(table, uid)
+        deletes.extend({'uid': uid, 'id': item['id']} for item in items)
+        records = [archive.record(item) for item in items if int(item['solveTime']) > until]
+        counts['leftover'] += len(items) - len(records)
+        if not records:
+            continue
+
+        member = archive.encode_member(records)
+        pointers.append({
+            'uid': uid,
+            'id': archive.pointer_id(records[0]['solveTime'], run),
+            'archiveKey': key,
+            'start': len(body),
+            'length': len(member),
+            'count': len(records),
+            'oldest': records[-1]['solveTime'],
+            'newest': records[0]['solveTime'],
+        })
+        body += member
+        counts['archived'] += len(records)
+
+    if body:
+        s3_client.put_object(Bucket=os.environ['ARCHIVE_BUCKET'], Key=key, Body=bytes(body),
+                             ContentType='application/x-ndjson')
+        counts['objects'] += 1
+        counts['bytes'] += len(body)
+
+    # the pointers before the deletes, an answer is always in the table or in the archive
+    with table.batch_writer() as batch:
+        for pointer in pointers:
+            batch.put_item(Item=pointer)
+    with table.batch_writer() as batch:
+        for key in deletes:
+            batch.delete_item(Key=key)
+
+    counts['deleted'] += len(deletes)
+
+
+# scheduled, archives the answers of EXERCISE_TYPE older than ARCHIVE_AFTER_DAYS;
+# UserCount is not touched, the totals keep counting the archived answers
+@metrics.instrument("archiver")
+def handler(event, context):
+    exercise_type = os.environ['EXERCISE_TYPE']
+    table = dynamodb.Table(os.environ['TABLE_NAME'])
+    cutoff = int(time.time()) - archive.after_days() * 86400
+    now = time.gmtime()
+    run = time.strftime('%Y%m%dT%H%M%S', now) + '-' + uuid.uuid4().hex[:6]
+    date = time.strftime('%Y-%m-%d', now)
+
+    counts = Counter()
+    group = {}
+    part = 0
+    finished = True
+
+    for uid in users(exercise_type):
+        if context is not None and context.get_remaining_time_in_millis() < STOP_BEFORE_TIMEOUT_MS:
+            finished = False
+            break
+        counts['users'] += 1
+        items = old_answers(table, uid, cutoff)
+        if items:
+            group[uid] = items
+        if len(group) >= USERS_PER_OBJECT:
+            archive_group(table, archive.object_key(exercise_type, date, run, part), run, group, counts)
+            group, part = {}, part + 1
+
+    if group:
+        archive_group(table, archive.object_key(exercise_type, date, run, part), run, group, counts)
+
+    metrics.record('ArchivedAnswers', counts['archived'])
+    metrics.record('ArchivedBytes', counts['bytes'])
+    logger.info(f'Archive run {run} of {exercise_type} before {cutoff}: {dict(counts)}, finished: {finished}')
+    return {'run': run, 'finished': finished,
+            **{name: counts[name] for name in ('users', 'archived', 'leftover', 'deleted', 'objects', 'bytes')}}
+
+
+runtime.report_init("archiver")
@@ -0,0 +1,178 @@
+"""
+Read-through cache of per-user responses, keyed by (uid, exercise type).
+
+Two tiers: an LRU in the process, which survives warm invocations of a container,
+and a shared tier selected by CACHE_URL ("redis://..." or "local", an in-process
+stand-in for runs where all handlers share one process). Writers do not reach the
+LRUs of other containers, so every (uid, type) has a version in the shared tier that
+the writers increment after they commit; a cached response is only served while the
+versions it was read at are current. Reading the versions is the only round trip
+of a hit and costs no DynamoDB capacity.
+
+Without CACHE_URL nothing is cached: there are no versions, and an LRU of its own
+would serve a container's response after an answer was graded.
+"""
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import metrics
+
+logger = logging.getLogger()
+
+CACHE_SIZE = int(os.environ.get("CACHE_SIZE", 1024))
+CACHE_TTL_SECONDS = float(os.environ.get("CACHE_TTL_SECONDS", 300))
+
+_shared = None
+_shared_url = None
+
+
+class LRU:
+    """Size bounded mapping with a TTL per entry, least recently used entries are evicted first."""
+
+    def __init__(self, maxsize=CACHE_SIZE, ttl=CACHE_TTL_SECONDS):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] < time.monotonic():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key, value):
+        with self.lock:
+            self.entries[key] = (time.monotonic() + self.ttl, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+
+
+class LocalTier:
+    """Stand-in for the shared tier, shared by all handlers of one process."""
+
+    def __init__(self):
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def get_many(self, keys):
+        now = time.monotonic()
+        with self.lock:
+            return [value if value is not None and expires > now else None
+                    for expires, value in (self.values.get(key, (0, None)) for key in keys)]
+
+    def set(self, key, value, ttl):
+        with self.lock:
+            self.values[key] = (time.monotonic() + ttl, value)
+
+    def incr_many(self, keys):
+        with self.lock:
+            for key in keys:
+                expires, value = self.values.get(key, (0, "0"))
+                self.values[key] = (float("inf"), str(int(value) + 1))
+
+
+class RedisTier:
+    """Shared tier on Redis or ElastiCache, the client is only imported when CACHE_URL points to one."""
+
+    def __init__(self, url):
+        import redis
+
+        self.client = redis.Redis.from_url(url, socket_timeout=0.2, socket_connect_timeout=0.2,
+                                           decode_responses=True)
+
+    def get_many(self, keys):
+        return self.client.mget(keys)
+
+    def set(self, key, value, ttl):
+        self.client.set(key, value, ex=max(int(ttl), 1))
+
+    def incr_many(self, keys):
+        pipeline = self.client.pipeline(transaction=False)
+        for key in keys:
+            pipeline.incr(key)
+        pipeline.execute()
+
+
+def shared_tier():
+    # read per call, so the handlers of a local run can switch it
+    global _shared, _shared_url
+    url = os.environ.get("CACHE_URL")
+    if url != _shared_url:
+        _shared_url = url
+        _shared = None if not url else LocalTier() if url == "local" else RedisTier(url)
+    return _shared
+
+
+def version_key(uid, exercise_type):
+    return f"v:{uid}:{exercise_type}"
+
+
+class Cache:
+    """Cached responses of one handler, e.g. Cache("profile")."""
+
+    def __init__(self, namespace, maxsize=CACHE_SIZE, ttl=CACHE_TTL_SECONDS):
+        self.namespace = namespace
+        self.ttl = ttl
+        self.lru = LRU(maxsize, ttl)
+
+    def fetch(self, uid, exercise_types, load):
+        """
+        The cached string for uid, valid while none of exercise_types got a new version, load() otherwise.
+
+        load() returns the string to cache, or None for a response that must not be cached.
+        """
+        shared = shared_tier()
+        if shared is None:
+            return load()
+
+        try:
+            versions = [v or "0" for v in shared.get_many([version_key(uid, t) for t in exercise_types])]
+            key = f"{self.namespace}:{uid}:{':'.join(exercise_types)}:{'.'.join(versions)}"
+
+            value = self.lru.get(key)
+            if value is None:
+                value = shared.get_many([key])[0]
+                if value is not None:
+                    self.lru.set(key, value)
+        except Exception as e:
+            logger.warning(f"Cache {self.namespace} unavailable, loading: {e}")
+            return load()
+
+        if value is not None:
+            metrics.record("CacheHit", 1)
+            return value
+
+        metrics.record("CacheMiss", 1)
+        value = load()
+        if value is not None:
+            # stored under the versions read before loading, a write in between makes it unreachable
+            self.lru.set(key, value)
+            try:
+                shared.set(key, value, self.ttl)
+            except Exception as e:
+                logger.warning(f"Cache {self.namespace} not written: {e}")
+        return value
+
+
+def invalidate(exercise_type, uids):
+    """New versions of the cached responses of uids, called by the writers after they committed."""
+    shared = shared_tier()
+    keys = [version_key(uid, exercise_type) for uid in dict.fromkeys(uids)]
+    if shared is None or not keys:
+        return
+
+    try:
+        shared.incr_many(keys)
+    except Exception as e:
+        # the responses cached before stay valid until their TTL
+        logger.error(f"Cache entries of {len(keys)} users not invalidated: {e}")
@@ -0,0 +1,171 @@
+"""
+Compact binary encoding of the exercises and answers in the Exercise tables.
+
+With EXERCISE_ENCODING=binary the writers store `exercise` and `answer` as Binary
+attributes instead of a nested map and a JSON string:
+
+    exercise: version, type code, the fields of the type's schema in order
+    answer:   version, tag (int, polynomial or JSON), the value
+
+Integers are zigzag varints, so the usual operands and coefficients take one
+byte each; a list is its length followed by its items. Exercises or answers
+that do not fit, e.g. floats or fields outside the schema, and answers that
+are not shorter in binary are stored in the map and JSON form. Every reader
+goes through decode_exercise() and decode_answer(), which accept both forms,
+so tables with items of both kinds keep working while
+scripts/migrate_exercise_encoding.py converts them.
+"""
+import json
+import os
+
+from boto3.dynamodb.types import Binary
+
+import exercise_types
+
+VERSION = 1
+ENCODING = os.environ.get("EXERCISE_ENCODING", "map")
+
+ANSWER_INT = 0
+ANSWER_POLYNOMIAL = 1
+ANSWER_JSON = 2
+
+
+def _is_int(value):
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def _write_int(out, n):
+    n = n * 2 if n >= 0 else -n * 2 - 1
+    while n >= 0x80:
+        out.append((n & 0x7F) | 0x80)
+        n >>= 7
+    out.append(n)
+
+
+def _read_int(data, pos):
+    result = shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        result |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return (result >> 1) ^ -(result & 1), pos
+        shift += 7
+
+
+def _write_list(out, values):
+    _write_int(out, len(values))
+    # small operands, the usual case, are one byte each
+    if all(-64 <= v < 64 for v in values):
+        out.extend(v * 2 if v >= 0 else -v * 2 - 1 for v in values)
+    else:
+        for v in values:
+            _write_int(out, v)
+
+
+def _read_list(data, pos):
+    length, pos = _read_int(data, pos)
+    chunk = data[pos:pos + length]
+    if all(b < 0x80 for b in chunk):
+        return [(b >> 1) ^ -(b & 1) for b in chunk], pos + length
+
+    values = []
+    for _ in range(length):
+        value, pos = _read_int(data, pos)
+        values.append(value)
+    return values, pos
+
+
+def _raw(value):
+    # the resource returns Binary, the client bytes
+    return value.value if isinstance(value, Binary) else value
+
+
+def encode_exercise(exercise):
+    """Binary form of an exercise, None when it does not fit the schema of its type."""
+    try:
+        exercise_type = exercise_types.by_kind(exercise.get("type"))
+    except KeyError:
+        return None
+    if exercise_type.code is None or set(exercise) != {"type", *exercise_type.schema}:
+        return None
+
+    out = bytearray([VERSION, exercise_type.code])
+    for field, field_type in exercise_type.schema.items():
+        value = exercise[field]
+        if field_type is int and _is_int(value):
+            _write_int(out, value)
+        elif field_type is list and all(_is_int(v) for v in value):
+            _write_list(out, value)
+        else:
+            return None
+    return bytes(out)
+
+
+def decode_exercise(value):
+    """The exercise of a stored `exercise` attribute, binary or map."""
+    value = _raw(value)
+    if not isinstance(value, (bytes, bytearray)):
+        return value
+
+    if value[0] != VERSION:
+        raise ValueError(f"Unknown exercise encoding version {value[0]}")
+    exercise_type = exercise_types.by_code(value[1])
+
+    exercise = {"type": exercise_type.kind}
+    pos = 2
+    for field, field_type in exercise_type.schema.items():
+        exercise[field], pos = (_read_int if field_type is int else _read_list)(value, pos)
+    return exercise
+
+
+def encode_answer(answer):
+    out = bytearray([VERSION])
+    if _is_int(answer):
+        out.append(ANSWER_INT)
+        _write_int(out, answer)
+    elif (isinstance(answer, dict) and set(answer) == {"power", "coeffs"} and _is_int(answer["power"])
+          and isinstance(answer["coeffs"], list) and all(_is_int(c) for c in answer["coeffs"])):
+        out.append(ANSWER_POLYNOMIAL)
+        _write_int(out, answer["power"])
+        _write_list(out, answer["coeffs"])
+    else:
+        out.append(ANSWER_JSON)
+        out.extend(json.dumps(answer).encode())
+    return bytes(out)
+
+
+def decode_answer(value):
+    """The submitted answer of a stored `answer` attribute, binary or JSON string."""
+    value = _raw(value)
+    if isinstance(value, str):
+        return json.loads(value)
+
+    if value[0] != VERSION:
+        raise ValueError(f"Unknown answer encoding version {value[0]}")
+    if value[1] == ANSWER_INT:
+        return _read_int(value, 2)[0]
+    if value[1] == ANSWER_POLYNOMIAL:
+        power, pos = _read_int(value, 2)
+        return {"power": power, "coeffs": _read_list(value, pos)[0]}
+    return json.loads(value[2:].decode())
+
+
+def stored_exercise(exercise, encoding=None):
+    """The `exercise` attribute as written with the configured encoding."""
+    if (encoding or ENCODING) == "binary":
+        encoded = encode_exercise(exercise)
+        if encoded is not None:
+            return Binary(encoded)
+    return exercise
+
+
+def answer_attribute(answer, encoding=None):
+    """The `answer` attribute in the low-level form of the DynamoDB client."""
+    text = json.dumps(answer)
+    if (encoding or ENCODING) == "binary":
+        encoded = encode_answer(answer)
+        # a small integer is as short as its JSON, which stays then
+        if len(encoded) < len(text):
+            return {"B": encoded}
+    return {"S": text}
@@ -0,0 +1,194 @@
+"""
+Registry of the exercise types.
+
+Every type declares the shape of its exercises, a batch generator, a batch solver
+how submitted answers are encoded before they are compared to the answer key, and
+how the generator parameters follow the skill level of a user (skill.py).
+The generic handlers only go through the registry: a new type is one register()
+call here plus its name in exerciseTypeList of sns-stack.ts, which deploys its
+table, queues and functions.
+
+numpy and polynomial.py are imported by the generate and solve functions that
+need them, the readers (get-profile, get-history, get-stats, get-exercise,
+post-solution) only use the names and schemas and start without them.
+"""
+import hashlib
+import json
+import os
+from math import prod
+
+
+class ExerciseType:
+
+    def __init__(self, name, kind, schema, generate, solve, encode=None, code=None, adapt=None):
+        # table suffix, UserCount etype and SNS message type, e.g. "derivatives"
+        self.name = name
+        # "type" inside the exercise, e.g. "derivative"
+        self.kind = kind
+        # exercise field -> Python type
+        self.schema = schema
+        # count, numpy Generator -> list of exercises
+        self.generate = generate
+        # list of exercises -> list of solutions
+        self.solve = solve
+        # list of submitted answers -> list of answers in the form the answer keys were made of
+        self.encode = encode or (lambda answers: answers)
+        # byte of the type in the binary encoding of codec.py, stored as a map without one
+        self.code = code
+        # skill level -> keyword arguments of generate, level 0 uses the defaults
+        self.adapt = adapt or (lambda level: {})
+
+    def validate(self, exercise):
+        return exercise.get("type") == self.kind and all(
+            isinstance(exercise.get(field), field_type) for field, field_type in self.schema.items()
+        )
+
+
+REGISTRY = {}
+
+
+def register(exercise_type):
+    REGISTRY[exercise_type.name] = exercise_type
+    return exercise_type
+
+
+def get(name):
+    if name not in REGISTRY:
+        raise KeyError(f"Unknown exercise type {name}")
+    return REGISTRY[name]
+
+
+def by_kind(kind):
+    for exercise_type in REGISTRY.values():
+        if exercise_type.kind == kind:
+            return exercise_type
+    raise KeyError(f"Unknown exercise type {kind}")
+
+
+def by_code(code):
+    for exercise_type in REGISTRY.values():
+        if exercise_type.code == code:
+            return exercise_type
+    raise KeyError(f"Unknown exercise type code {code}")
+
+
+def seed(uid, nonce):
+    # stable across processes (unlike hash()), logged so a user's exercises can be generated again
+    return int.from_bytes(hashlib.blake2b(f"{uid}:{nonce}".encode(), digest_size=8).digest(), "big")
+
+
+def seeded_rng(seed_value):
+    import numpy as np
+    return np.random.default_rng(seed_value)
+
+
+def difficulty(exercise_type):
+    # example DIFFICULTY: {"multiplication": {"max_product": 1000}}
+    return json.loads(os.environ.get("DIFFICULTY", "{}")).get(exercise_type, {})
+
+
+def enabled():
+    # the deployed types, EXERCISE_TYPES is set by the stacks; all registered types otherwise
+    names = json.loads(os.environ.get("EXERCISE_TYPES", "null")) or list(REGISTRY)
+    return [name for name in names if name in REGISTRY]
+
+
+def operand_rows(rng, count, min_operands=2, max_operands=10):
+    # one draw for the number of operands of every exercise, a mask marks the used columns
+    import numpy as np
+    lengths = rng.integers(min_operands, max_operands + 1, count)
+    return lengths, np.arange(max_operands)[None, :] < lengths[:, None]
+
+
+def operand_levels(level, max_operands=10, high=10):
+    # below level 0 fewer operands, above it larger ones
+    return {
+        "max_operands": max(2, max_operands + 2 * min(level, 0)),
+        "high": high * 2 ** max(level, 0),
+    }
+
+
+def to_lists(matrix, lengths):
+    return [row[:length] for row, length in zip(matrix.tolist(), lengths.tolist())]
+
+
+# example exercise: {"type":"addition", "addends":[2,3,4]}
+def generate_additions(count, rng=None, low=1, high=10, max_operands=10):
+    import numpy as np
+    rng = rng if rng is not None else np.random.default_rng()
+    lengths, used = operand_rows(rng, count, max_operands=max_operands)
+    addends = rng.integers(low, high + 1, used.shape)
+    return [{"type": "addition", "addends": row} for row in to_lists(addends, lengths)]
+
+
+def solve_additions(exercises):
+    return [sum(exercise["addends"]) for exercise in exercises]
+
+
+# example exercise: {"type":"multiplication", "multipliers":[2,3,4]}
+def generate_multiplications(count, rng=None, low=1, high=10, max_product=None, max_operands=10):
+    import numpy as np
+    rng = rng if rng is not None else np.random.default_rng()
+    max_product = max_product or difficulty("multiplication").get("max_product")
+    lengths, used = operand_rows(rng, count, max_operands=max_operands)
+
+    if not max_product:
+        multipliers = rng.integers(low, high + 1, used.shape)
+    else:
+        # column by column, each multiplier is drawn below what the remaining budget allows for it
+        # and the ones still to come (at least `low` each), so no exercise has to be drawn again
+        multipliers = np.ones(used.shape, dtype=np.int64)
+        budget = np.full(count, max_product, dtype=np.int64)
+        for column in range(used.shape[1]):
+            still_to_come = np.clip(lengths - column - 1, 0, None)
+            upper = np.minimum(high, budget // low ** still_to_come)
+            drawn = rng.integers(low, np.maximum(upper, low) + 1)
+            multipliers[:, column] = np.where(used[:, column], drawn, 1)
+            budget //= multipliers[:, column]
+
+        # the first multipliers got the largest budget, shuffled within the used columns of a row
+        order = np.argsort(np.where(used, rng.random(used.shape), np.inf), axis=1)
+        multipliers = np.take_along_axis(multipliers, order, axis=1)
+
+    return [{"type": "multiplication", "multipliers": row} for row in to_lists(multipliers, lengths)]
+
+
+def solve_multiplications(exercises):
+    return [prod(exercise["multipliers"]) for exercise in exercises]
+
+
+# example exercise: {"type":"derivative", "power": 2, "coeffs": [3, 1, 4]}
+def generate_derivatives(count, rng=None, **kwargs):
+    import polynomial
+    return polynomial.generate(count, rng, **kwargs)
+
+
+def solve_derivatives(exercises):
+    import polynomial
+    return polynomial.derivatives(exercises)
+
+
+def encode_polynomials(answers):
+    # the same polynomial can be sent with leading zeros or float coefficients,
+    # answers that are no polynomial at all are kept and never match a key
+    import polynomial
+    return [c if c is not None else a for a, c in zip(answers, polynomial.canonical(answers))]
+
+
+def derivative_levels(level):
+    # below level 0 lower powers, above it larger coefficients
+    return {
+        "max_power": max(2, 10 + 2 * min(level, 0)),
+        "high": 10 * 2 ** max(level, 0),
+    }
+
+
+register(ExerciseType("addition", "addition", {"addends": list}, generate_additions, solve_additions, code=1,
+                      adapt=operand_levels))
+# products grow fast, the multipliers grow by 5 per level and stay capped by max_product
+register(ExerciseType("multiplication", "multiplication", {"multipliers": list},
+                      generate_multiplications, solve_multiplications, code=2,
+                      adapt=lambda level: {**operand_levels(level), "high": 10 + 5 * max(level, 0)}))
+register(ExerciseType("derivatives", "derivative", {"power": int, "coeffs": list},
+                      generate_derivatives, solve_derivatives, encode_polynomials, code=3,
+                      adapt=derivative_levels))
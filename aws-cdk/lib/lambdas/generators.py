@@ -1,167 +1,189 @@
-import boto3
-import json
-import os
-import uuid
-import random
-
-
+import runtime  # first import, starts the init timer
+import metrics
 
-import boto3
 import json
 import os
-import uuid
-import random
 import logging
+import time
+
+import cache
+import codec
+import exercise_types
+import refill
+import skill
+from answer_keys import answer_key, solve_all
 
 # Set up logging
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
 # Initialize DynamoDB resource
-dynamodb = boto3.resource("dynamodb")
+dynamodb = runtime.resource("dynamodb")
+
+# most exercises one message may ask for per user, far above the high watermark of any pool
+MAX_COUNT = int(os.environ.get("GENERATOR_MAX_COUNT", 100))
 
 
-def handler(event, context, exercise_json):
+# example message: {"uid": "4f1c...", "type": "addition", "count": 10}
+#                  {"uids": ["4f1c...", "9a2e..."], "type": "addition", "count": 10}
+#                  {"uid": "4f1c...", "type": "addition", "count": 7, "level": 1, "topUp": true} from a watcher
+@metrics.instrument("generator")
+def handler(event, context):
+    # every record only gets the exercises it asked for, generated and written in bulk for the whole SQS batch
+    if not event.get("Records"):
+        logger.error("No records found in the event.")
+        return {"statusCode": 400, "body": "No records found in the event"}
+
+    exercise_type = exercise_types.get(os.environ["EXERCISE_TYPE"])
     table = dynamodb.Table(os.environ["TABLE_NAME"])
 
-    for record in event.get("Records", []):
-        try:
-            body = json.loads(record.get("body", "{}"))
-            message = json.loads(body.get("Message", "{}"))
-            user_id = message.get("uid")
-
-            if not user_id:
-                logger.error("User ID is missing in the message.")
-                continue
-
-            # Add exercise to DynamoDB
-            try:
-                table.put_item(
-                    Item={
-                        "uid": user_id,  # HASH key
-                        "id": str(uuid.uuid4()),  # RANGE key
-                        "exercise": exercise_json,
-                        "answered": False,
-                        "solveTime": random.randint(1, 100)  # Optional, based on your table schema
-                    }
-                )
-            except Exception as e:
-                logger.error(f"Error adding exercise to DynamoDB for user {user_id}: {e}")
-
-        except Exception as e:
-            logger.error(f"Error processing record: {e}")
+    top_ups = set()
+    exercises_by_user = build_exercises(event["Records"], exercise_type, top_ups)
+    written = write_exercises(table, unwritten(table, exercises_by_user))
+    cache.invalidate(exercise_type.name, exercises_by_user)
+
+    # the watchers may top these pools up again
+    if top_ups and os.environ.get("TABLE_USER_COUNT"):
+        refill.release(dynamodb.Table(os.environ["TABLE_USER_COUNT"]), exercise_type.name, top_ups)
 
     return {
         "statusCode": 200,
-        "body": json.dumps({"message": "Exercises processed successfully"})
+        "body": json.dumps({"message": f"{len(written)} {exercise_type.name} exercises processed successfully"})
     }
 
 
-# example exercise: {"type":"addition", "addends":[2,3,4]}
-def generate_random_addition_exercise():
-
-    exercise = {'type': 'addition', "addends": []}
-    number_addends = random.randint(2, 10)
-    for i in range(number_addends):
-        exercise['addends'].append(random.randint(1, 10))
-
-    return json.dumps(exercise)
-
-
-# example message: {"count": 10, "userId":1}
-def generate_addition_exercises(event, context):
-    try:
-        records = event.get('Records', [])
-        if not records:
-            logger.error("No records found in the event.")
-            return {"statusCode": 400, "body": "No records found in the event"}
-
-        for record in records:
-            try:
-                body = json.loads(record.get('body', '{}'))
-                inner_body = json.loads(body.get('Message', '{}'))
-                exercises = []
-                number_exercises = inner_body.get('count', 0)
+def build_exercises(records, exercise_type, top_ups=None):
+    """
+    user id -> [(exercise id, exercise)] of the records.
 
-                if number_exercises <= 0:
-                    logger.error(f"Invalid number of exercises {number_exercises} in the message.")
-                    continue
-
-                for i in range(number_exercises):
-                    exercise = generate_random_addition_exercise()
-                    try:
-                        handler(event, context, json.loads(exercise))
-                        exercises.append(exercise)
-                    except Exception as e:
-                        logger.error(f"Error processing exercise {i + 1} for user {body.get('uid')}: {e}")
-
-                logger.info(f"Successfully processed {number_exercises} addition exercises.")
-            except json.JSONDecodeError as e:
-                logger.error(f"Error decoding JSON from record: {e}")
-            except Exception as e:
-                logger.error(f"Unexpected error processing record: {e}")
-
-        return {"statusCode": 200, "body": "Addition exercises generated successfully"}
-
-    except Exception as e:
-        logger.error(f"Error in generate_addition_exercises: {e}")
-        return {"statusCode": 500, "body": "Internal server error"}
-
-# example exercise: {"type":"derivative", power: 2, coeffs: []}
-def generate_random_derivative_exercise():
-    exercise = {'type': 'derivative', "coeffs": []}
-
-    power = random.randint(2, 10)
-    exercise['power'] = power
-
-    for i in range(power + 1):
-        exercise["coeffs"].append(random.randint(1, 10))
-
-    return json.dumps(exercise)
-
-# example message: {"count": 10, "userId":1}
-def generate_derivative_exercises(event, context):
-    records = event['Records']
+    The exercises of a record are drawn from a generator seeded by (user, messageId) and their
+    ids are derived from it, so a redelivered message yields the same ids, see unwritten().
+    top_ups collects the users of the watchers' top-up messages.
+    """
+    requests = {}
 
     for record in records:
-        body = json.loads(record['body'])
-        inner_body = json.loads(body.get('Message', '{}'))
-        exercises = []
-        number_exercises = inner_body['count']
+        try:
+            body = json.loads(record.get("body", "{}"))
+            message = json.loads(body.get("Message", "{}"))
+        except (json.JSONDecodeError, TypeError, AttributeError) as e:
+            logger.error(f"Error decoding JSON from record: {e}")
+            continue
+
+        # a poison message would fail the whole batch on every redelivery, it is dropped alone
+        if not isinstance(message, dict):
+            logger.error("Message is not a JSON object.")
+            continue
+
+        # a roster import asks for the exercises of many users in one message
+        user_ids = message.get("uids") if "uids" in message else [message.get("uid")]
+        number_exercises = message.get("count", 0)
+        # a watcher pins the level it saw, a redelivery then generates at the same one
+        level = message.get("level")
+
+        if not isinstance(user_ids, list) or not user_ids or not all(isinstance(uid, str) and uid for uid in user_ids):
+            logger.error("User ID is missing in the message.")
+            continue
+
+        if not isinstance(number_exercises, int) or isinstance(number_exercises, bool) or not 0 < number_exercises <= MAX_COUNT:
+            logger.error(f"Invalid number of exercises {number_exercises} in the message.")
+            continue
+
+        if not isinstance(level, int) or isinstance(level, bool):
+            level = None
+
+        # "seed" in the message pins the exercises explicitly
+        nonce = message.get("seed", record.get("messageId"))
+        if not isinstance(nonce, (str, int)):
+            nonce = record.get("messageId")
+
+        for user_id in user_ids:
+            requests.setdefault((user_id, nonce), (number_exercises, level))
+            if top_ups is not None and message.get("topUp"):
+                top_ups.add(user_id)
+
+    # the skill levels of every user of the batch without a pinned one in one read
+    levels = skill.levels(exercise_type.name, {user_id for (user_id, _), (_, level) in requests.items() if level is None})
+
+    exercises_by_user = {}
+    for (user_id, nonce), (count, level) in requests.items():
+        level = levels[user_id] if level is None else level
+        exercises = generate_for(exercise_type, user_id, count, nonce, level)
+        exercises_by_user.setdefault(user_id, []).extend(
+            (skill.exercise_id(level, f"{user_id}:{nonce}:{i}"), exercise) for i, exercise in enumerate(exercises)
+        )
+    return exercises_by_user
+
+
+def generate_for(exercise_type, user_id, count, nonce, level=0):
+    # all operands of a user's exercises are drawn at once from a generator seeded per user
+    seed = exercise_types.seed(user_id, nonce)
+    logger.info(f"Generating {count} {exercise_type.name} exercises of level {level} for user {user_id} with seed {seed}")
+    return exercise_type.generate(count, exercise_types.seeded_rng(seed), **exercise_type.adapt(level))
+
+
+def unwritten(table, exercises_by_user):
+    """
+    exercises_by_user without the exercises an earlier delivery of the message wrote already.
+
+    Batch writes have no conditions and would overwrite them, answered ones included.
+    """
+    keys = [{"uid": user_id, "id": exercise_id}
+            for user_id, exercises in exercises_by_user.items() for exercise_id, _ in exercises]
+    existing = set()
+
+    for start in range(0, len(keys), runtime.MAX_BATCH_GET_KEYS):
+        request = {table.name: {"Keys": keys[start:start + runtime.MAX_BATCH_GET_KEYS], "ProjectionExpression": "uid, id"}}
+        while request:
+            response = dynamodb.batch_get_item(RequestItems=request)
+            existing.update((item["uid"], item["id"]) for item in response.get("Responses", {}).get(table.name, []))
+            request = response.get("UnprocessedKeys")
+
+    if existing:
+        logger.info(f"Skipping {len(existing)} exercises written by an earlier delivery")
+    return {
+        user_id: [(exercise_id, exercise) for exercise_id, exercise in exercises if (user_id, exercise_id) not in existing]
+        for user_id, exercises in exercises_by_user.items()
+    }
 
-        for i in range(number_exercises):
-            exercise = generate_random_derivative_exercise()
-            handler(event, context, json.loads(exercise))
 
-        print(exercises)
+def write_exercises(table, exercises_by_user):
+    # exercises_by_user: user id -> [(exercise id, exercise)], the id ends in the level, see skill.py
+    written = []
 
-    return {"statusCode": 200, "body": "Derivative exercises generated successfully"}
+    open_since = int(time.time() * 1000)
 
-# example exercise: {"type":"multiplication", "multipliers":[2,3,4]}
-def generate_random_multiplication_exercise():
+    # the solutions of the whole batch at once, derivatives are vectorized
+    solutions = iter(solve_all([exercise for exercises in exercises_by_user.values() for _, exercise in exercises]))
 
-    exercise = {'type': 'multiplication', "multipliers": []}
-    number_addends = random.randint(2, 10)
-    for i in range(number_addends):
-        exercise['multipliers'].append(random.randint(1, 10))
+    # batch_writer sends BatchWriteItem requests of 25 items and resends UnprocessedItems
+    with table.batch_writer() as batch:
+        for user_id, exercises in exercises_by_user.items():
+            for exercise_id, exercise in exercises:
+                item = {
+                    "uid": user_id,  # HASH key
+                    "id": exercise_id,  # RANGE key
+                    "exercise": codec.stored_exercise(exercise),
+                    "answerKey": answer_key(exercise_id, next(solutions)),
+                    "answered": False,
+                    "level": skill.exercise_level(exercise_id),
+                    "openSince": open_since  # sort key of the sparse open exercise index
+                }
+                batch.put_item(Item=item)
+                written.append({**item, "exercise": exercise})
 
-    return json.dumps(exercise)
+            logger.info(f"Queued {len(exercises)} exercises for user {user_id}")
 
-# example message: {"count": 10, "userId":1}
-def generate_multiplication_exercises(event, context):
-    # message: {"numberExercises": 10, "userId":1}
-    records = event['Records']
+    return written
 
-    for record in records:
-        body = json.loads(record['body'])
-        inner_body = json.loads(body.get('Message', '{}'))
-        exercises = []
-        number_exercises = inner_body['count']
 
-        for i in range(number_exercises):
-            exercise = generate_random_multiplication_exercise()
-            handler(event, context, json.loads(exercise))
+def refill_now(table, exercise_type, user_id, count):
+    # synchronous refill of an empty pool, used by get-exercise
+    level = skill.levels(exercise_type, [user_id])[user_id]
+    exercises = generate_for(exercise_types.get(exercise_type), user_id, count, time.time_ns(), level)
+    written = write_exercises(table, {user_id: [(skill.exercise_id(level), exercise) for exercise in exercises]})
+    cache.invalidate(exercise_type, [user_id])
+    return written
 
-        print(exercises)
 
-    return {"statusCode": 200, "body": "Multiplication exercises generated successfully"}
+runtime.report_init("generators")
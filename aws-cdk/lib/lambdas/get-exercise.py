@@ -1,20 +1,76 @@
+import runtime  # first import, starts the init timer
+import metrics
+
 import json
 import os
 import logging
 
-import boto3
-from boto3.dynamodb.conditions import Key, Attr
+from boto3.dynamodb.conditions import Key
 from decimal import Decimal
 
+import cache
+import codec
+
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
+dynamodb = runtime.resource('dynamodb')
+# the open exercise is served again until the user answers it
+exercise_cache = cache.Cache('exercise')
+# open exercises read from the index, the first one a consistent read still finds unanswered is served
+CANDIDATES = 3
+
 def convert_decimal(n):
     if isinstance(n, Decimal):
         return float(n)
 
+
+def confirmed(exercise_table, items):
+    # the first of the items that a consistent read of the table still finds unanswered
+    for item in items:
+        stored = exercise_table.get_item(
+            Key={'uid': item['uid'], 'id': item['id']},
+            ProjectionExpression='uid, id, exercise, answered',
+            ConsistentRead=True
+        ).get('Item')
+        if stored and not stored.get('answered'):
+            return [stored]
+    return []
+
+
+def open_exercise(exercise_table, uid):
+    # the sparse index only holds unanswered exercises, but it is eventually consistent: right after a
+    # grade it may still list the exercise just answered, which would be served again and its next answer
+    # rejected. A few candidates are read and the first one is confirmed against the table, which costs
+    # one consistent GetItem per call as long as the index is current
+    response = exercise_table.query(
+        IndexName=exercise_table.name + 'OpenGSI',
+        KeyConditionExpression=Key('uid').eq(uid),
+        # the answer key stays on the server
+        ProjectionExpression='uid, id, exercise, answered',
+        Limit=CANDIDATES
+    )
+
+    items = confirmed(exercise_table, response.get('Items', []))
+
+    if len(items) == 0 and os.environ.get('EXERCISE_TYPE'):
+        # empty pool: generate inline instead of answering 404 until the asynchronous refill arrives,
+        # the generators are only imported when this rare path is taken
+        import generators
+        import refill
+
+        exercise_type = os.environ['EXERCISE_TYPE']
+        logger.info(f'Open pool of user {uid} is empty, refilling {exercise_type} synchronously')
+        written = generators.refill_now(exercise_table, exercise_type, uid, refill.policy(exercise_type)['high'])
+        items = [{k: item[k] for k in ('uid', 'id', 'exercise', 'answered')} for item in written]
+
+    if not items:
+        return None
+    return json.dumps({**items[0], 'exercise': codec.decode_exercise(items[0]['exercise'])}, default=convert_decimal)
+
+
+@metrics.instrument("get-exercise")
 def handler(event, context):
-    dynamodb = boto3.resource('dynamodb')
     table_name = os.environ.get('TABLE_NAME')
 
     if not table_name:
@@ -43,17 +99,10 @@ def handler(event, context):
                 'body': json.dumps({'error': 'Unauthorized or user ID not found'})
             }
 
-        response = exercise_table.query(
-            KeyConditionExpression=Key('uid').eq(uid),
-            FilterExpression=Attr('answered').exists() & Attr('answered').eq(False),
-            ConsistentRead=True
-        )
+        body = exercise_cache.fetch(uid, [os.environ.get('EXERCISE_TYPE', table_name)],
+                                    lambda: open_exercise(exercise_table, uid))
 
-
-        items = response.get('Items', [])
-        
-
-        if len(items) == 0:
+        if body is None:
             logger.error('Items not found')
             return {
                 'statusCode': 404,
@@ -73,7 +122,7 @@ def handler(event, context):
                 'Access-Control-Allow-Methods': 'OPTIONS,GET',
                 'Access-Control-Allow-Headers': 'Content-Type,Authorization',
             },
-            'body': json.dumps(items[0], default=convert_decimal)
+            'body': body
         }
 
     except KeyError as e:
@@ -96,3 +145,6 @@ def handler(event, context):
             },
             'body': json.dumps({'error': str(e)})
         }
+
+
+runtime.report_init("get-exercise")
@@ -0,0 +1,214 @@
+import runtime  # first import, starts the init timer
+import metrics
+
+import base64
+import json
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from boto3.dynamodb.types import TypeDeserializer
+from decimal import Decimal
+
+import archive
+import codec
+import exercise_types
+
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+EXERCISE_TYPES = exercise_types.enabled()
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+# FANOUT_WORKERS=1 queries the exercise types one after another
+FANOUT_WORKERS = int(os.environ.get('FANOUT_WORKERS', len(EXERCISE_TYPES)))
+
+HEADERS = {
+    'Access-Control-Allow-Origin': '*',
+    'Access-Control-Allow-Methods': 'OPTIONS,GET',
+    'Access-Control-Allow-Headers': 'Content-Type,Authorization',
+}
+
+# created once per container, clients are thread safe (resources are not)
+dynamodb = runtime.client('dynamodb')
+s3_client = runtime.client('s3')
+deserializer = TypeDeserializer()
+executor = ThreadPoolExecutor(max_workers=FANOUT_WORKERS)
+
+
+def convert_decimal(n):
+    if isinstance(n, Decimal):
+        return float(n)
+
+
+def encode_cursor(position):
+    # a LastEvaluatedKey of the solveTime index, or {"archive": pointer id, "offset": n} in the archive
+    if not position:
+        return None
+    return base64.urlsafe_b64encode(json.dumps(position).encode()).decode()
+
+
+def decode_cursor(cursor, uid):
+    """The position of a cursor of encode_cursor, ValueError for anything else the client sends."""
+    position = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    if not isinstance(position, dict):
+        raise ValueError('Malformed cursor')
+
+    if 'archive' in position:
+        pointer, offset = position['archive'], position.get('offset')
+        if (not isinstance(pointer, str) or not pointer.startswith(archive.POINTER_PREFIX)
+                or not isinstance(offset, int) or isinstance(offset, bool) or offset < 0):
+            raise ValueError('Malformed cursor')
+        return {'archive': pointer, 'offset': offset}
+
+    exercise_id, solve_time = position.get('id'), position.get('solveTime')
+    if (not isinstance(exercise_id, dict) or not isinstance(exercise_id.get('S'), str)
+            or not isinstance(solve_time, dict) or not str(solve_time.get('N')).isdigit()):
+        raise ValueError('Malformed cursor')
+    # a cursor can only continue the caller's own history
+    return {'uid': {'S': uid}, 'id': {'S': exercise_id['S']}, 'solveTime': {'N': solve_time['N']}}
+
+
+def decode_item(item):
+    item = {k: deserializer.deserialize(v) for k, v in item.items()}
+    # binary or map, the client always gets the exercise as object and the answer as JSON string
+    item['exercise'] = codec.decode_exercise(item['exercise'])
+    if 'answer' in item:
+        item['answer'] = json.dumps(codec.decode_answer(item['answer']), default=convert_decimal)
+    return item
+
+
+def archived_item(record):
+    # the form of decode_item, the answer as JSON string
+    return {**record, 'answer': json.dumps(record['answer'])}
+
+
+def archive_page(uid, exercise_type, limit, start=None, offset=0):
+    """Up to `limit` archived answers from the pointer `start` on, newest first, and the position after them."""
+    if not os.environ.get('ARCHIVE_BUCKET'):
+        return [], None
+
+    # every pointer holds at least one answer, limit + 1 of them cover the page and the next position
+    response = dynamodb.query(
+        TableName='Exercise' + exercise_type,
+        KeyConditionExpression='uid = :uid AND id BETWEEN :first AND :start',
+        ExpressionAttributeValues={
+            ':uid': {'S': uid},
+            ':first': {'S': archive.POINTER_PREFIX},
+            ':start': {'S': start or archive.LAST_POINTER},
+        },
+        ScanIndexForward=False,
+        Limit=limit + 1,
+    )
+
+    items = []
+    for pointer in response.get('Items', []):
+        pointer = {k: deserializer.deserialize(v) for k, v in pointer.items()}
+        if len(items) == limit:
+            return items, {'archive': pointer['id'], 'offset': 0}
+
+        records = archive.read_member(s3_client, os.environ['ARCHIVE_BUCKET'], pointer['archiveKey'],
+                                      int(pointer['start']), int(pointer['length']))
+        taken = records[offset:offset + limit - len(items)]
+        items.extend(archived_item(record) for record in taken)
+        if offset + len(taken) < len(records):
+            return items, {'archive': pointer['id'], 'offset': offset + len(taken)}
+        offset = 0
+
+    return items, None
+
+
+def query_page(uid, exercise_type, limit, cursor=None):
+    position = decode_cursor(cursor, uid) if cursor else None
+    if position and 'archive' in position:
+        items, position = archive_page(uid, exercise_type, limit, position['archive'], position['offset'])
+        return {'items': items, 'cursor': encode_cursor(position)}
+
+    # the solveTime index, newest first; exercises generated before the open index carry a
+    # solveTime while unanswered, the filter keeps them out
+    query = {
+        'TableName': 'Exercise' + exercise_type,
+        'IndexName': 'Exercise' + exercise_type + 'LSI',
+        'KeyConditionExpression': 'uid = :uid',
+        'FilterExpression': 'answered = :true',
+        'ExpressionAttributeValues': {':uid': {'S': uid}, ':true': {'BOOL': True}},
+        'ProjectionExpression': 'id, exercise, answer, correctness, solveTime',
+        'ScanIndexForward': False,
+    }
+    if position:
+        query['ExclusiveStartKey'] = position
+
+    # Limit counts the items read before the filter, a page is read until it is full or the index ends
+    items = []
+    while True:
+        response = dynamodb.query(**query, Limit=limit - len(items))
+        items.extend(decode_item(item) for item in response.get('Items', []))
+        position = response.get('LastEvaluatedKey')
+        if not position or len(items) >= limit:
+            break
+        query['ExclusiveStartKey'] = position
+
+    # the index is exhausted, older answers continue from the archive
+    if not position:
+        archived, position = archive_page(uid, exercise_type, limit - len(items))
+        items.extend(archived)
+
+    return {'items': items, 'cursor': encode_cursor(position)}
+
+
+# example: GET /profile/history/addition?limit=20&cursor=eyJ1aWQiOi...
+#          GET /profile/history?limit=20 returns the first page of every type
+@metrics.instrument("get-history")
+def handler(event, context):
+    uid = event.get('requestContext', {}).get('authorizer', {}).get('claims', {}).get('sub')
+    if not uid:
+        return {
+            'statusCode': 401,
+            'headers': HEADERS,
+            'body': json.dumps({'error': 'Unauthorized or user ID not found'})
+        }
+
+    exercise_type = (event.get('pathParameters') or {}).get('type')
+    if exercise_type is not None and exercise_type not in EXERCISE_TYPES:
+        return {
+            'statusCode': 404,
+            'headers': HEADERS,
+            'body': json.dumps({'error': f'Unknown exercise type {exercise_type}'})
+        }
+
+    params = event.get('queryStringParameters') or {}
+
+    try:
+        limit = min(max(int(params.get('limit', DEFAULT_PAGE_SIZE)), 1), MAX_PAGE_SIZE)
+
+        if exercise_type:
+            body = query_page(uid, exercise_type, limit, params.get('cursor'))
+        else:
+            # one query per type at the same time, the request costs about the slowest of them
+            mapper = executor.map if FANOUT_WORKERS > 1 else map
+            pages = mapper(lambda t: query_page(uid, t, limit), EXERCISE_TYPES)
+            body = dict(zip(EXERCISE_TYPES, pages))
+
+        return {
+            'statusCode': 200,
+            'headers': HEADERS,
+            'body': json.dumps(body, default=convert_decimal)
+        }
+
+    except (ValueError, KeyError) as e:
+        return {
+            'statusCode': 400,
+            'headers': HEADERS,
+            'body': json.dumps({'error': f'Invalid request: {str(e)}'})
+        }
+    except Exception as e:
+        logger.error(f'Error reading history of user {uid}: {e}')
+        return {
+            'statusCode': 500,
+            'headers': HEADERS,
+            'body': json.dumps({'error': str(e)})
+        }
+
+
+runtime.report_init("get-history")
@@ -1,52 +1,46 @@
+import runtime  # first import, starts the init timer
+import metrics
+
 import json
-import boto3
-import boto3.dynamodb
-from boto3.dynamodb.conditions import Key, Attr
+import os
+from boto3.dynamodb.conditions import Key
 from decimal import Decimal
 
+import cache
+import exercise_types
+import skill
+
 def convert_decimal(n):
     if isinstance(n, Decimal):
         return float(n)
 
-def handler(event, context):
+# created once per container and reused by warm invocations
+dynamodb = runtime.resource('dynamodb')
+# valid until an answer of any exercise type of the user is graded
+profile_cache = cache.Cache('profile')
 
-    dynamodb = boto3.resource('dynamodb')
-
-    uid = event.get('requestContext', {}).get('authorizer', {}).get('claims', {}).get('sub')
-    if not uid:
-        return {
-            'statusCode': 401,
-            'headers': {
-                'Access-Control-Allow-Origin': '*',
-                'Access-Control-Allow-Methods': 'OPTIONS,GET',
-                'Access-Control-Allow-Headers': 'Content-Type,Authorization',
-            },
-            'body': json.dumps({'error': 'Unauthorized or user ID not found'})
-        }
-    
-    message = {}
 
-    for exercise_type in ['addition', 'derivatives', 'multiplication']:
+def profile(uid):
+    # correctCount/falseCount are maintained by the evaluators, one query returns every exercise type
+    # answered exercises are served page by page by get-history
+    user_count_table = dynamodb.Table(os.environ['TABLE_USER_COUNT'])
+    response = user_count_table.query(KeyConditionExpression=Key('uid').eq(uid))
+    counts = {item['etype']: item for item in response.get('Items', [])}
 
-        exercise_table = dynamodb.Table('Exercise' + exercise_type)
+    message = {}
 
-        response_answered_exercises = exercise_table.query(
-            KeyConditionExpression=Key('uid').eq(uid),
-            FilterExpression=Attr('answered').exists() & Attr('answered').eq(True)
-        )
-        number_answered_exercises = len(response_answered_exercises.get('Items', []))
+    for exercise_type in exercise_types.enabled():
 
-        response_correct_answers = exercise_table.query(
-            KeyConditionExpression=Key('uid').eq(uid),
-            FilterExpression=Attr('answered').exists() & Attr('answered').eq(True) & Attr('correctness').exists() & Attr('correctness').eq(True)
-        )
-        number_correct_answers = len(response_correct_answers.get('Items', []))
+        count = counts.get(exercise_type, {})
+        number_correct_answers = int(count.get('correctCount', 0))
+        number_answered_exercises = number_correct_answers + int(count.get('falseCount', 0))
 
         ratio =  float(number_correct_answers) / float(number_answered_exercises) if number_answered_exercises > 0 else 0
 
+        message[exercise_type] = {'ratio': ratio, 'answered': number_answered_exercises}
 
-
-        message[exercise_type] = {'ratio': ratio, 'exercises': response_answered_exercises.get('Items', [])}
+        if 'skill' in count:
+            message[exercise_type]['level'] = skill.level(count['skill'])
 
         if number_answered_exercises > 0:
             grade = (
@@ -58,6 +52,26 @@ def handler(event, context):
             )
             message[exercise_type]['grade'] = grade
 
+    return message
+
+
+@metrics.instrument("get-profile")
+def handler(event, context):
+
+    uid = event.get('requestContext', {}).get('authorizer', {}).get('claims', {}).get('sub')
+    if not uid:
+        return {
+            'statusCode': 401,
+            'headers': {
+                'Access-Control-Allow-Origin': '*',
+                'Access-Control-Allow-Methods': 'OPTIONS,GET',
+                'Access-Control-Allow-Headers': 'Content-Type,Authorization',
+            },
+            'body': json.dumps({'error': 'Unauthorized or user ID not found'})
+        }
+    
+    body = profile_cache.fetch(uid, exercise_types.enabled(), lambda: json.dumps(profile(uid), default=convert_decimal))
+
     return {
         'statusCode': 200,
         'headers': {
@@ -65,8 +79,9 @@ def handler(event, context):
             'Access-Control-Allow-Methods': 'OPTIONS,GET',
             'Access-Control-Allow-Headers': 'Content-Type,Authorization',
         },
-        'body': json.dumps(message, default=convert_decimal)
+        'body': body
     }
         
 
 
+runtime.report_init("get-profile")
@@ -0,0 +1,83 @@
+import runtime  # first import, starts the init timer
+import metrics
+
+import json
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from boto3.dynamodb.types import TypeDeserializer
+
+import exercise_types
+import stats
+
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+EXERCISE_TYPES = exercise_types.enabled()
+
+HEADERS = {
+    'Access-Control-Allow-Origin': '*',
+    'Access-Control-Allow-Methods': 'OPTIONS,GET',
+    'Access-Control-Allow-Headers': 'Content-Type,Authorization',
+}
+
+# created once per container, clients are thread safe (resources are not)
+dynamodb = runtime.client('dynamodb')
+deserializer = TypeDeserializer()
+executor = ThreadPoolExecutor(max_workers=2)
+
+
+def query_shards(pk):
+    # the shards of a view are one partition, a single Query returns all of them
+    response = dynamodb.query(
+        TableName=os.environ['TABLE_STATS'],
+        KeyConditionExpression='pk = :pk',
+        ExpressionAttributeValues={':pk': {'S': pk}},
+    )
+    return [{k: deserializer.deserialize(v) for k, v in item.items()} for item in response.get('Items', [])]
+
+
+# example: GET /stats/addition
+@metrics.instrument("get-stats")
+def handler(event, context):
+    uid = event.get('requestContext', {}).get('authorizer', {}).get('claims', {}).get('sub')
+    if not uid:
+        return {
+            'statusCode': 401,
+            'headers': HEADERS,
+            'body': json.dumps({'error': 'Unauthorized or user ID not found'})
+        }
+
+    exercise_type = (event.get('pathParameters') or {}).get('type')
+    if exercise_type not in EXERCISE_TYPES:
+        return {
+            'statusCode': 404,
+            'headers': HEADERS,
+            'body': json.dumps({'error': f'Unknown exercise type {exercise_type}'})
+        }
+
+    try:
+        totals, leaderboard = executor.map(
+            query_shards, [stats.totals_pk(exercise_type), stats.leaderboard_pk(exercise_type)])
+
+        return {
+            'statusCode': 200,
+            'headers': HEADERS,
+            'body': json.dumps({
+                'type': exercise_type,
+                **stats.merge_totals(totals),
+                'leaderboard': stats.merge_leaderboard(leaderboard),
+            })
+        }
+
+    except Exception as e:
+        logger.error(f'Error reading stats of {exercise_type}: {e}')
+        return {
+            'statusCode': 500,
+            'headers': HEADERS,
+            'body': json.dumps({'error': str(e)})
+        }
+
+
+runtime.report_init("get-stats")
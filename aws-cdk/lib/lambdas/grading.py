@@ -0,0 +1,297 @@
+"""
+Grading of submissions against the stored answer keys, shared by the evaluators,
+which grade SQS batches, and post-solution, which grades inline when GRADING_MODE
+is inline.
+
+Every call commits the results with as few conditional transactions as possible,
+an exercise is only ever graded once.
+"""
+import logging
+import os
+import time
+from itertools import groupby
+
+from boto3.dynamodb.types import TypeDeserializer
+from botocore.exceptions import ClientError
+
+import cache
+import codec
+import runtime
+import skill
+from answer_keys import answer_key, canonical_answers, solve_all
+
+logger = logging.getLogger()
+
+dynamodb = runtime.client("dynamodb")
+deserializer = TypeDeserializer()
+
+# a chunk is retried when some of its items cancelled the transaction, e.g. a wrong answer
+MAX_ROUNDS = 3
+# raised by the canonical form of an answer that cannot be keyed, e.g. NaN or a huge float
+MALFORMED_ANSWER = (TypeError, ValueError, ArithmeticError)
+
+
+def grade_batch(exercise_type, submissions, read_first=True):
+    """
+    Grades submissions with as few transactions as possible.
+
+    read_first reads the stored exercises before the transaction, which pays off for
+    batches; a single submission is cheaper graded optimistically.
+    Returns the outcome per messageId: correct, incorrect, answered (already), missing,
+    dropped (an answer that cannot be graded) or failed.
+    """
+    # batch size and duration are in the EMF metrics, the per batch and per submission lines only when debugging
+    logger.debug(f"Evaluator-{exercise_type} grading {len(submissions)} submissions")
+
+    outcomes = {}
+    unique = []
+    seen = set()
+
+    for submission, key in keyed(exercise_type, submissions, outcomes):
+        # the same exercise cannot appear twice in one transaction, a repeated submission is a duplicate
+        if (submission["uid"], submission["eid"]) in seen:
+            outcomes[submission["messageId"]] = "answered"
+            continue
+        seen.add((submission["uid"], submission["eid"]))
+        unique.append({**submission, "key": key})
+
+    # answered exercises are skipped after a cheap read, without opening a transaction
+    stored = prefetch(unique) if read_first else {}
+    pending = []
+    legacy = []
+
+    for submission in unique:
+        exercise = stored.get((submission["uid"], submission["eid"]))
+
+        if exercise is None:
+            # not read: optimistic, most answers match the stored key and the condition grades them as correct
+            pending.append({**submission, "expected": submission["key"], "correct": True})
+        elif "exercise" not in exercise:
+            # e.g. an archive pointer (archive.py) in the user's partition, not an exercise
+            logger.info(f"Exercise {submission['eid']} of user {submission['uid']} not found")
+            outcomes[submission["messageId"]] = "missing"
+        elif exercise.get("answered"):
+            logger.info(f"Exercise {submission['eid']} of user {submission['uid']} is already answered, skipped")
+            outcomes[submission["messageId"]] = "answered"
+        elif exercise.get("answerKey"):
+            pending.append({**submission, "expected": None, "correct": exercise["answerKey"] == submission["key"]})
+        else:
+            legacy.append((submission, exercise["exercise"]))
+
+    pending.extend(grade_legacy(legacy))
+
+    for round_number in range(MAX_ROUNDS):
+        if not pending:
+            break
+
+        retry = []
+        for chunk in pack(pending):
+            retry.extend(commit(exercise_type, chunk, outcomes))
+        pending = retry
+
+    for submission in pending:
+        outcomes[submission["messageId"]] = "failed"
+
+    return outcomes
+
+
+def keyed(exercise_type, submissions, outcomes):
+    """(submission, answer key) of the submissions, the ones whose answer cannot be keyed are dropped."""
+    try:
+        answers = canonical_answers(exercise_type, [submission["answer"] for submission in submissions])
+        return [(submission, answer_key(submission["eid"], answer)) for submission, answer in zip(submissions, answers)]
+    except MALFORMED_ANSWER:
+        pass
+
+    # one malformed answer must not fail the whole batch on every redelivery, the batch is keyed one by one
+    result = []
+    for submission in submissions:
+        try:
+            answer = canonical_answers(exercise_type, [submission["answer"]])[0]
+            result.append((submission, answer_key(submission["eid"], answer)))
+        except MALFORMED_ANSWER as e:
+            logger.warning(f"Evaluator {exercise_type} dropping submission {submission['messageId']}: {e}")
+            outcomes[submission["messageId"]] = "dropped"
+    return result
+
+
+def prefetch(submissions):
+    """Stored state of the exercises of a batch by (uid, eid), an eventually consistent BatchGetItem."""
+    table_name = os.environ["TABLE_EXERCISE"]
+    keys = [{"uid": {"S": submission["uid"]}, "id": {"S": submission["eid"]}} for submission in submissions]
+    stored = {}
+
+    for i in range(0, len(keys), runtime.MAX_BATCH_GET_KEYS):
+        request = {table_name: {
+            "Keys": keys[i:i + runtime.MAX_BATCH_GET_KEYS],
+            "ProjectionExpression": "#uid, #id, answered, answerKey, exercise",
+            "ExpressionAttributeNames": {"#uid": "uid", "#id": "id"},
+        }}
+
+        # keys still unprocessed after the last round are graded optimistically, the transaction decides
+        for round_number in range(MAX_ROUNDS):
+            try:
+                response = dynamodb.batch_get_item(RequestItems=request)
+            except ClientError as e:
+                logger.warning(f"Evaluator prefetch failed, grading without it: {e}")
+                break
+
+            for item in response.get("Responses", {}).get(table_name, []):
+                exercise = {k: deserializer.deserialize(v) for k, v in item.items()}
+                stored[(exercise["uid"], exercise["id"])] = exercise
+
+            request = response.get("UnprocessedKeys")
+            if not request:
+                break
+
+    return stored
+
+
+def grade_legacy(legacy):
+    # exercises generated before answer keys existed are graded from the stored operands, all in one call
+    solutions = solve_all([codec.decode_exercise(exercise) for submission, exercise in legacy])
+    return [
+        {**submission, "expected": None, "correct": answer_key(submission["eid"], solution) == submission["key"]}
+        for (submission, exercise), solution in zip(legacy, solutions)
+    ]
+
+
+def pack(submissions):
+    # one UserCount item per user and chunk, so a user's submissions are kept together
+    chunks, chunk, users = [], [], set()
+
+    for uid, user_submissions in groupby(sorted(submissions, key=lambda s: s["uid"]), key=lambda s: s["uid"]):
+        for submission in user_submissions:
+            if len(chunk) + len(users) + (uid not in users) + 1 > runtime.MAX_TRANSACTION_ITEMS:
+                chunks.append(chunk)
+                chunk, users = [], set()
+            chunk.append(submission)
+            users.add(uid)
+
+    if chunk:
+        chunks.append(chunk)
+    return chunks
+
+
+def commit(exercise_type, chunk, outcomes):
+    """Writes one chunk in a single transaction, returns the submissions that have to be retried."""
+    now = str(int(time.time()))
+    transact_items = []
+    deltas = {}
+
+    for submission in chunk:
+        values = {
+            ":true": {"BOOL": True},
+            ":false": {"BOOL": False},
+            ":correct": {"BOOL": submission["correct"]},
+            ":answer": codec.answer_attribute(submission["answer"]),
+            ":time": {"N": now},
+        }
+        condition = "attribute_exists(exercise) AND (attribute_not_exists(answered) OR answered = :false)"
+        if submission["expected"] is not None:
+            condition += " AND answerKey = :key"
+            values[":key"] = {"S": submission["expected"]}
+
+        # update exercise 'answered' to True, FAIL if answered already is True
+        transact_items.append({
+            "Update": {
+                "TableName": os.environ["TABLE_EXERCISE"],
+                "Key": {
+                    "uid": {"S": submission["uid"]},
+                    "id": {"S": submission["eid"]},
+                },
+                # removing openSince drops the exercise from the sparse open exercise index
+                "UpdateExpression": "SET answered = :true, answer=:answer, correctness=:correct, solveTime=:time REMOVE openSince",
+                "ConditionExpression": condition,
+                "ExpressionAttributeValues": values,
+                # a failed check returns the stored exercise, no extra read needed to grade it
+                "ReturnValuesOnConditionCheckFailure": "ALL_OLD",
+            }
+        })
+
+        correct, wrong, rated_correct, rated_wrong = deltas.get(submission["uid"], (0, 0, 0, 0))
+        gain, loss = skill.rated(submission["correct"], skill.exercise_level(submission["eid"]))
+        deltas[submission["uid"]] = (correct + submission["correct"], wrong + (not submission["correct"]),
+                                     rated_correct + gain, rated_wrong + loss)
+
+    # insert / update UserCount, one combined increment per user
+    for uid, (correct, wrong, rated_correct, rated_wrong) in deltas.items():
+        transact_items.append({
+            "Update": {
+                "TableName": os.environ["TABLE_USER_COUNT"],
+                "Key": {
+                    "uid": {"S": uid},
+                    "etype": {"S": exercise_type},
+                },
+                # the skill rating moves by a constant per answer, not beyond the level caps, see skill.py
+                "UpdateExpression": (
+                    "SET correctCount = if_not_exists(correctCount, :zero) + :inc, "
+                    "falseCount = if_not_exists(falseCount, :zero) + :dec, "
+                    "skill = if_not_exists(skill, :initial) + :skill"
+                ),
+                "ExpressionAttributeValues": {
+                    ":zero": {"N": "0"},
+                    ":inc": {"N": str(correct)},
+                    ":dec": {"N": str(wrong)},
+                    ":initial": {"N": str(skill.INITIAL)},
+                    ":skill": {"N": str(skill.delta(rated_correct, rated_wrong))},
+                },
+            }
+        })
+
+    try:
+        dynamodb.transact_write_items(TransactItems=transact_items)
+    except ClientError as e:
+        if e.response.get("Error", {}).get("Code") == "TransactionCanceledException":
+            return isolate(chunk, e.response.get("CancellationReasons", []), outcomes)
+
+        logger.error(f"Evaluator {exercise_type} Error: {e}")
+        for submission in chunk:
+            outcomes[submission["messageId"]] = "failed"
+        return []
+
+    for submission in chunk:
+        outcomes[submission["messageId"]] = "correct" if submission["correct"] else "incorrect"
+        logger.debug(f"Evaluator-{exercise_type} uid={submission['uid']} eid={submission['eid']} correct={submission['correct']}")
+
+    # the cached open exercise and profile of these users are outdated now
+    cache.invalidate(exercise_type, deltas)
+
+    return []
+
+
+def isolate(chunk, reasons, outcomes):
+    """Resolves the items that cancelled a transaction and returns the submissions of the chunk to retry."""
+    if not reasons:
+        return list(chunk)
+
+    retry = []
+    legacy = []
+
+    # reasons are in the order of the transaction items, the exercises come first
+    for submission, reason in zip(chunk, reasons):
+        if reason.get("Code") != "ConditionalCheckFailed":
+            # cancelled because of another item (Code None) or a conflict, retried as is
+            retry.append(submission)
+            continue
+
+        item = reason.get("Item")
+        # an item without exercise is an archive pointer, not an exercise
+        if not item or "exercise" not in item:
+            logger.info(f"Exercise {submission['eid']} of user {submission['uid']} not found")
+            outcomes[submission["messageId"]] = "missing"
+            continue
+
+        exercise = {k: deserializer.deserialize(v) for k, v in item.items()}
+        if exercise.get("answered"):
+            logger.info(f"Exercise {submission['eid']} of user {submission['uid']} is already answered")
+            outcomes[submission["messageId"]] = "answered"
+            continue
+
+        if exercise.get("answerKey"):
+            retry.append({**submission, "expected": None, "correct": exercise["answerKey"] == submission["key"]})
+        else:
+            legacy.append((submission, exercise["exercise"]))
+
+    retry.extend(grade_legacy(legacy))
+    return retry
@@ -0,0 +1,110 @@
+"""
+Polynomials as rows of a NumPy matrix, shared by the generators and the evaluators.
+
+Coefficients are stored highest power first, like in the exercises and answers:
+{"power": 3, "coeffs": [c3, c2, c1, c0]}. The rows of a matrix are right aligned,
+padded with leading zeros, so every column holds one power for all rows. The
+canonical form has no leading zeros, the zero polynomial is {"power": 0, "coeffs": [0]}.
+"""
+from itertools import chain
+
+import numpy as np
+
+
+def to_matrix(coefficient_lists):
+    # one flat array of all coefficients, scattered into the right aligned rows without a Python loop per row
+    lengths = np.fromiter(map(len, coefficient_lists), dtype=np.intp, count=len(coefficient_lists))
+    width = max(int(lengths.max(initial=0)), 1)
+    flat = np.fromiter(chain.from_iterable(coefficient_lists), dtype=float, count=int(lengths.sum()))
+
+    rows = np.repeat(np.arange(len(coefficient_lists)), lengths)
+    offsets = np.arange(flat.size) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+    matrix = np.zeros((len(coefficient_lists), width))
+    matrix[rows, offsets + np.repeat(width - lengths, lengths)] = flat
+    return matrix
+
+
+def to_polynomials(matrix):
+    """Canonical {"power", "coeffs"} of every row."""
+    nonzero = matrix != 0
+    # first nonzero column of a row, the last column for the zero polynomial
+    first = np.where(nonzero.any(axis=1), nonzero.argmax(axis=1), matrix.shape[1] - 1)
+
+    # integer coefficients, the usual case, are returned as ints
+    if np.array_equal(matrix, np.round(matrix)):
+        matrix = matrix.astype(np.int64)
+
+    return [
+        {"power": len(row) - start - 1, "coeffs": row[start:]}
+        for row, start in zip(matrix.tolist(), first.tolist())
+    ]
+
+
+def differentiate(matrix, order=1):
+    """Derivative of every row, order is one number or one per row. The width stays the same."""
+    width = matrix.shape[1]
+    powers = np.arange(width - 1, -1, -1)
+    orders = np.broadcast_to(np.asarray(order, dtype=int), (matrix.shape[0],))
+    result = np.zeros_like(matrix)
+
+    for k in np.unique(orders).tolist():
+        rows = orders == k
+        if k >= width:
+            continue
+
+        # falling factorial p * (p - 1) * ... * (p - k + 1), zero for the powers below k
+        factors = np.ones(width)
+        for i in range(k):
+            factors *= np.clip(powers - i, 0, None)
+
+        # the term of power p moves to power p - k, k columns to the right
+        result[rows, k:] = (matrix[rows] * factors)[:, :width - k]
+
+    return result
+
+
+def parse(answers):
+    """Matrix of submitted answers and a mask of the ones that are polynomials at all."""
+    coefficient_lists = [answer.get("coeffs") if isinstance(answer, dict) else None for answer in answers]
+    valid = np.array([isinstance(coeffs, list) for coeffs in coefficient_lists], dtype=bool)
+    coefficient_lists = [coeffs if ok else [] for coeffs, ok in zip(coefficient_lists, valid.tolist())]
+
+    # only when every coefficient is an int or float the batch takes the vectorised path,
+    # np.fromiter would also turn "3" and True into numbers
+    if set(map(type, chain.from_iterable(coefficient_lists))) <= {int, float}:
+        return to_matrix(coefficient_lists), valid
+
+    # some answer holds something else than numbers, only then each one is checked
+    for i, coeffs in enumerate(coefficient_lists):
+        if not all(isinstance(c, (int, float)) and not isinstance(c, bool) for c in coeffs):
+            coefficient_lists[i], valid[i] = [], False
+    return to_matrix(coefficient_lists), valid
+
+
+def derivatives(exercises):
+    """Canonical solutions of derivative exercises, {"coeffs", "order" (default 1)}."""
+    matrix = to_matrix([exercise["coeffs"] for exercise in exercises])
+    return to_polynomials(differentiate(matrix, [exercise.get("order", 1) for exercise in exercises]))
+
+
+def canonical(answers):
+    """Canonical form of submitted answers, None for the ones that are no polynomial."""
+    matrix, valid = parse(answers)
+    return [polynomial if ok else None for polynomial, ok in zip(to_polynomials(matrix), valid.tolist())]
+
+
+def generate(count, rng=None, min_power=2, max_power=10, low=1, high=10):
+    """Random derivative exercises, coefficients in [low, high] and a positive leading one."""
+    rng = rng if rng is not None else np.random.default_rng()
+    powers = rng.integers(min_power, max_power + 1, count)
+    matrix = rng.integers(low, high + 1, (count, max_power + 1))
+
+    rows = np.arange(count)
+    leading = max_power - powers
+    # the leading coefficient defines the power and must not be zero
+    matrix[rows, leading] = rng.integers(max(low, 1), high + 1, count)
+
+    return [
+        {"type": "derivative", "power": power, "coeffs": row[max_power - power:]}
+        for power, row in zip(powers.tolist(), matrix.tolist())
+    ]
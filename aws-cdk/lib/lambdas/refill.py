@@ -0,0 +1,120 @@
+import json
+import os
+import time
+
+from boto3.dynamodb.conditions import Key
+from botocore.exceptions import ClientError
+
+import skill
+
+# refill an open pool that dropped below `low` up to `high`, plus one exercise per answer given in the
+# last `window` seconds (at most `lookahead`) so that fast solvers do not run dry while generation catches up
+DEFAULT_POLICY = {"low": 5, "high": 10, "window": 600, "lookahead": 10}
+# a top-up in flight is marked in the user's UserCount item until the generator wrote it; the mark
+# expires in case its message is lost, after the visibility timeout of the generate queues
+PENDING_SECONDS = int(os.environ.get("REFILL_PENDING_SECONDS", 300))
+
+
+# example REFILL_POLICY: {"addition": {"low": 5, "high": 10}, "derivatives": {"low": 3, "high": 8}}
+def policy(exercise_type):
+    policies = json.loads(os.environ.get("REFILL_POLICY", "{}"))
+    return {**DEFAULT_POLICY, **policies.get(exercise_type, {})}
+
+
+def open_count(table, uid):
+    # the sparse index only holds open exercises
+    response = table.query(
+        IndexName=table.name + 'OpenGSI',
+        KeyConditionExpression=Key('uid').eq(uid),
+        Select='COUNT'
+    )
+    return response['Count']
+
+
+def recent_solves(table, uid, window):
+    # answered exercises are the only items on the solveTime index
+    response = table.query(
+        IndexName=table.name + 'LSI',
+        KeyConditionExpression=Key('uid').eq(uid) & Key('solveTime').gte(int(time.time()) - window),
+        Select='COUNT'
+    )
+    return response['Count']
+
+
+def refill_amount(exercise_policy, open_exercises, recent=0):
+    if open_exercises >= exercise_policy["low"]:
+        return 0
+    return exercise_policy["high"] - open_exercises + min(recent, exercise_policy["lookahead"])
+
+
+def claim(user_count_table, exercise_type, uid):
+    """
+    Marks a top-up of the user as in flight and returns the user's level, None if one is in flight already.
+
+    Only an existing UserCount item is marked, the mark alone would show up as an exercise type of the
+    user in get-profile and the archiver. A user without one is topped up unmarked at level 0.
+    """
+    now = int(time.time())
+    try:
+        response = user_count_table.update_item(
+            Key={"uid": uid, "etype": exercise_type},
+            UpdateExpression="SET refillPending = :until",
+            ConditionExpression="attribute_exists(uid) AND (attribute_not_exists(refillPending) OR refillPending < :now)",
+            ExpressionAttributeValues={":until": now + PENDING_SECONDS, ":now": now},
+            ReturnValues="ALL_NEW",
+            ReturnValuesOnConditionCheckFailure="ALL_OLD",
+        )
+        return skill.level(response["Attributes"].get("skill"))
+    except ClientError as e:
+        if e.response.get("Error", {}).get("Code") != "ConditionalCheckFailedException":
+            raise
+        if "Item" not in e.response:
+            return skill.level(None)
+        return None
+
+
+def release(user_count_table, exercise_type, uids):
+    """Clears the in flight marks of the users, once their top-ups are written or were not published."""
+    for uid in uids:
+        try:
+            user_count_table.update_item(
+                Key={"uid": uid, "etype": exercise_type},
+                UpdateExpression="REMOVE refillPending",
+                # without the condition a user without UserCount item would get an empty one
+                ConditionExpression="attribute_exists(refillPending)",
+            )
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") != "ConditionalCheckFailedException":
+                raise
+
+
+def plan(table, exercise_type, uids, user_count_table=None, claimed=None):
+    """
+    Returns (uid, count, level) top-ups for the users below the low watermark, most active users first.
+
+    With user_count_table, users whose last top-up is still in flight are skipped: the stream
+    batches that arrive before the generator's writes still count the pool below the watermark.
+    The level is the user's skill level read with the claim, None without user_count_table.
+    claimed collects the users marked in flight as they are, to be released if the top-up fails.
+    """
+    exercise_policy = policy(exercise_type)
+    top_ups = []
+
+    for uid in uids:
+        open_exercises = open_count(table, uid)
+        if open_exercises >= exercise_policy["low"]:
+            continue
+
+        level = None
+        if user_count_table is not None:
+            level = claim(user_count_table, exercise_type, uid)
+            if level is None:
+                continue
+            if claimed is not None:
+                claimed.append(uid)
+
+        recent = recent_solves(table, uid, exercise_policy["window"])
+        top_ups.append((recent, uid, refill_amount(exercise_policy, open_exercises, recent), level))
+
+    top_ups.sort(key=lambda top_up: top_up[0], reverse=True)
+    return [(uid, count, level) for recent, uid, count, level in top_ups]
@@ -0,0 +1,96 @@
+"""
+Skill estimate per user and exercise type, an Elo-style rating kept as `skill`
+in the UserCount item next to correctCount and falseCount.
+
+The generators aim every exercise at the user's current level, i.e. at the
+success rate TARGET. With the expected score fixed the Elo update no longer
+depends on the stored rating: a correct answer adds K * (1 - TARGET), a wrong
+one subtracts K * TARGET. It is one more term of the UserCount update in the
+grading transaction, O(1) per answer and without reading the rating first.
+A user above their level gains until the exercises get harder, one below it
+loses until they get easier.
+
+At MAX_LEVEL the exercises cannot get harder and the expected score no longer
+holds, so an exercise generated there adds nothing when answered correctly, and
+one generated at MIN_LEVEL takes nothing when answered wrong; otherwise the
+rating of a strong user would grow past the cap without bound. The level is
+part of the exercise id (`exercise_id`), the grading transaction reads it from
+the submission instead of from the stored exercise.
+
+The generators read the ratings of all users of a batch with one BatchGetItem
+and pass the level to the generate function of the type (`adapt` in
+exercise_types.py). Level 0 is the initial rating and the former uniform
+operands.
+"""
+import hashlib
+import os
+import uuid
+
+import runtime
+
+INITIAL = 1000
+K = 40
+TARGET = 0.75
+POINTS_PER_LEVEL = 100
+MIN_LEVEL = -4
+MAX_LEVEL = 4
+
+# between the random part of an exercise id and the level it was generated at
+LEVEL_SEPARATOR = "~"
+
+
+def delta(correct, wrong):
+    """Rating change of a user after `correct` right and `wrong` wrong answers."""
+    return round(K * ((1 - TARGET) * correct - TARGET * wrong))
+
+
+def rated(correct, level):
+    """(correct, wrong) an answer counts in delta, nothing beyond MAX_LEVEL or MIN_LEVEL."""
+    if correct:
+        return (0, 0) if level is not None and level >= MAX_LEVEL else (1, 0)
+    return (0, 0) if level is not None and level <= MIN_LEVEL else (0, 1)
+
+
+def exercise_id(level, key=None):
+    # a key derives the id, e.g. from the message and position the exercise was generated for
+    base = uuid.uuid4() if key is None else uuid.UUID(bytes=hashlib.blake2b(key.encode(), digest_size=16).digest())
+    return f"{base}{LEVEL_SEPARATOR}{level}"
+
+
+def exercise_level(exercise_id):
+    """Level an exercise was generated at, None for ids without one."""
+    _, separator, level = exercise_id.rpartition(LEVEL_SEPARATOR)
+    try:
+        return int(level) if separator else None
+    except ValueError:
+        return None
+
+
+def level(rating):
+    if rating is None:
+        return 0
+    return max(MIN_LEVEL, min(MAX_LEVEL, round((float(rating) - INITIAL) / POINTS_PER_LEVEL)))
+
+
+def levels(exercise_type, uids):
+    """uid -> level of the users in TABLE_USER_COUNT, level 0 for unknown users or without the table."""
+    uids = list(uids)
+    table_name = os.environ.get("TABLE_USER_COUNT")
+    if not table_name or not uids:
+        return {uid: 0 for uid in uids}
+
+    dynamodb = runtime.client("dynamodb")
+    ratings = {}
+    for start in range(0, len(uids), runtime.MAX_BATCH_GET_KEYS):
+        request = {table_name: {
+            "Keys": [{"uid": {"S": uid}, "etype": {"S": exercise_type}} for uid in uids[start:start + runtime.MAX_BATCH_GET_KEYS]],
+            "ProjectionExpression": "uid, skill",
+        }}
+        while request:
+            response = dynamodb.batch_get_item(RequestItems=request)
+            for item in response.get("Responses", {}).get(table_name, []):
+                if "skill" in item:
+                    ratings[item["uid"]["S"]] = item["skill"]["N"]
+            request = response.get("UnprocessedKeys")
+
+    return {uid: level(ratings.get(uid)) for uid in uids}
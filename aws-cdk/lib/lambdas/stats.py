@@ -0,0 +1,110 @@
+"""
+Pre-aggregated cross-user views of the answered exercises, kept in the Stats table.
+
+The aggregator folds the answered-exercise MODIFY records of an Exercise<type>
+stream into these items (pk, sk):
+
+    <type>#user#<uid>   state      answered, correct, lastSolveTime and lastSequence of one user
+    <type>#totals       shard#<n>  answered and correct of all users, a<bucket>: users per
+                                   accuracy bucket, t<bucket>: answers per solve-time bucket
+    <type>#leaderboard  shard#<n>  the top entries of the users hashed to the shard
+
+Counters are added to a random shard and every user is hashed to one leaderboard
+shard, so no single item takes all writes of a type. A view is one Query of its
+partition, the shards are merged when it is read.
+
+The user states of a batch and the totals they add are written in one
+transaction, guarded by the lastSequence read before; a retried batch skips
+the users it folded already. lastSequence is a zero padded string, stream
+sequence numbers have more digits than a DynamoDB number keeps. Leaderboard
+entries are absolute and are written again on a retry.
+"""
+import hashlib
+import os
+from bisect import bisect_left
+
+TOTALS_SHARDS = int(os.environ.get("STATS_SHARDS", 8))
+LEADERBOARD_SHARDS = int(os.environ.get("LEADERBOARD_SHARDS", 4))
+LEADERBOARD_SIZE = int(os.environ.get("LEADERBOARD_SIZE", 10))
+
+ACCURACY_BUCKETS = 10
+# upper bounds in seconds of the solve-time buckets, the last bucket is everything above
+SOLVE_TIME_BOUNDS = [2, 5, 10, 20, 30, 60, 120, 300, 600]
+# the time between two answers of a user counts as solve time within a session only
+SESSION_GAP_SECONDS = 1800
+
+
+def user_key(exercise_type, uid):
+    return {"pk": f"{exercise_type}#user#{uid}", "sk": "state"}
+
+
+def totals_pk(exercise_type):
+    return f"{exercise_type}#totals"
+
+
+def leaderboard_pk(exercise_type):
+    return f"{exercise_type}#leaderboard"
+
+
+def shard_sk(shard):
+    return f"shard#{shard}"
+
+
+def accuracy_bucket(correct, answered):
+    return min(int(correct * ACCURACY_BUCKETS / answered), ACCURACY_BUCKETS - 1) if answered else None
+
+
+def solve_time_bucket(seconds):
+    return bisect_left(SOLVE_TIME_BOUNDS, seconds)
+
+
+def leaderboard_shard(uid):
+    # stable across processes, a user always lands in the same shard
+    return int.from_bytes(hashlib.blake2b(uid.encode(), digest_size=2).digest(), "big") % LEADERBOARD_SHARDS
+
+
+def rank(entry):
+    # counts only grow, so an entry never ranks worse than when it was written
+    return -int(entry["correct"]), -int(entry["answered"]), entry["uid"]
+
+
+def top(entries, size=LEADERBOARD_SIZE):
+    return sorted(entries, key=rank)[:size]
+
+
+def percentile(histogram, p):
+    """Upper bound in seconds of the bucket holding the p-th percentile, None for the last bucket."""
+    total = sum(histogram)
+    if not total:
+        return None
+
+    seen = 0
+    for bucket, count in enumerate(histogram):
+        seen += count
+        if seen >= total * p / 100:
+            return SOLVE_TIME_BOUNDS[bucket] if bucket < len(SOLVE_TIME_BOUNDS) else None
+
+
+def merge_totals(items):
+    answered = sum(int(item.get("answered", 0)) for item in items)
+    correct = sum(int(item.get("correct", 0)) for item in items)
+    accuracy = [sum(int(item.get(f"a{b}", 0)) for item in items) for b in range(ACCURACY_BUCKETS)]
+    solve_times = [sum(int(item.get(f"t{b}", 0)) for item in items) for b in range(len(SOLVE_TIME_BOUNDS) + 1)]
+
+    return {
+        "answered": answered,
+        "correct": correct,
+        "accuracy": correct / answered if answered else 0,
+        # users per 10% of accuracy, lowest first
+        "accuracyHistogram": accuracy,
+        "solveTime": {
+            "bounds": SOLVE_TIME_BOUNDS,
+            "histogram": solve_times,
+            **{f"p{p}": percentile(solve_times, p) for p in (50, 90, 99)},
+        },
+    }
+
+
+def merge_leaderboard(items, size=LEADERBOARD_SIZE):
+    entries = [entry for item in items for entry in item.get("entries", [])]
+    return [{"uid": e["uid"], "correct": int(e["correct"]), "answered": int(e["answered"])} for e in top(entries, size)]
@@ -1,60 +1,71 @@
+import runtime  # first import, starts the init timer
+import metrics
+
 import json
 import os
-import boto3
 import logging
 
-from boto3.dynamodb.conditions import Key, Attr
+import refill
+from publisher import Publisher
 
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
+dynamodb = runtime.resource('dynamodb')
+sns_client = runtime.client('sns')
 
-def handler(event, context):
 
-    dynamodb = boto3.resource('dynamodb')
-    sns_client = boto3.client('sns')
+@metrics.instrument("watcher")
+def handler(event, context):
 
     table_name = os.environ['TABLE_NAME']
     exercise_type = os.environ['EXERCISE_TYPE']
     topic_arn = os.environ['SNS_TOPIC_ARN']
 
     table = dynamodb.Table(table_name)
+    user_count_table = dynamodb.Table(os.environ['TABLE_USER_COUNT']) if os.environ.get('TABLE_USER_COUNT') else None
 
+    # users marked with a top-up in flight, those without a published message are released at the end
+    claimed = []
+    published = set()
     try:
-        for record in event['Records']:
-
-            if record['eventName'] != 'MODIFY':
-                continue
-
-            uid = record["dynamodb"]["Keys"]["uid"]["S"]
-
-            response = table.query(
-                KeyConditionExpression=Key('uid').eq(uid),
-                FilterExpression=Attr('answered').exists() & Attr('answered').eq(False)
-            )
-
-            exercise_count = len(response.get('Items'))
-            logger.info(f"Exercise count for user {uid}: {exercise_count}")
-
-            if exercise_count and exercise_count < 5:
-                logger.debug(f"Generating one more exercise of type {exercise_type} for user {uid}")
-
-                message = {
-                    'uid': uid,
-                    'type': exercise_type,
-                    'count': 1
-                }
-
-                sns_client.publish(
-                    TopicArn=topic_arn,
-                    Message=json.dumps(message),
-                    MessageAttributes={
-                        "type": {"DataType": "String", "StringValue": exercise_type},
-                    }
-                )
+        # a stream batch often holds several answers of the same user, each user is counted once
+        uids = list(dict.fromkeys(
+            record["dynamodb"]["Keys"]["uid"]["S"] for record in event['Records'] if record['eventName'] == 'MODIFY'
+        ))
+
+        publisher = Publisher(sns_client)
+        # users below the low watermark of the refill policy without a top-up in flight, the most active ones first
+        for uid, count, level in refill.plan(table, exercise_type, uids, user_count_table, claimed):
+            logger.info(f"Generating {count} more exercises of type {exercise_type} for user {uid}")
+
+            message = {
+                'uid': uid,
+                'type': exercise_type,
+                'count': count,
+                # the generator clears the in flight mark of the user
+                'topUp': True
+            }
+            # a redelivered message is generated at the same level, with the same exercise ids
+            if level is not None:
+                message['level'] = level
+            publisher.add(topic_arn, message, type=exercise_type)
+
+        # one top-up message per user, up to 10 per call
+        not_published = set()
+        for failed in publisher.flush():
+            logger.error(f"Could not publish top-up message {failed['Message']}")
+            not_published.add(json.loads(failed['Message'])['uid'])
+        published = set(claimed) - not_published
 
     except Exception as e:
         logger.error("Error while processing dynamodb stream: {} ".format(e))
 
+    finally:
+        # otherwise these users get no top-up until their marks expire
+        unpublished = [uid for uid in claimed if uid not in published]
+        if unpublished:
+            refill.release(user_count_table, exercise_type, unpublished)
 
 
+runtime.report_init("watcher")
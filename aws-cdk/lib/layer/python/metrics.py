@@ -0,0 +1,177 @@
+"""
+Per-invocation metrics of the Python Lambdas in the CloudWatch embedded metric format.
+
+Wrap a handler with @instrument(name) and create clients through runtime, which
+watches them: every AWS call of an invocation is timed and the consumed capacity
+of DynamoDB calls is added up. When the invocation ends its metrics are printed
+as EMF documents, CloudWatch extracts them from the log, no API call needed.
+
+METRICS=off disables everything: instrument() returns the handler unchanged and
+no client hooks are registered.
+"""
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+from functools import wraps
+
+ENABLED = os.environ.get("METRICS", "on").lower() not in ("off", "false", "0")
+NAMESPACE = os.environ.get("METRICS_NAMESPACE", "ElearningPlatform")
+
+UNITS = {
+    "Duration": "Milliseconds",
+    "ColdStart": "Count",
+    "BatchSize": "Count",
+    "MessageAge": "Milliseconds",
+    "AwsCallTime": "Milliseconds",
+    "CallTime": "Milliseconds",
+    "ConsumedCapacity": "Count",
+    "CacheHit": "Count",
+    "CacheMiss": "Count",
+    "AuthTime": "Milliseconds",
+    "ArchivedAnswers": "Count",
+    "ArchivedBytes": "Bytes",
+}
+# DynamoDB operations that report their consumed capacity when asked to
+CAPACITY_OPERATIONS = {
+    "GetItem", "PutItem", "UpdateItem", "DeleteItem", "Query", "Scan",
+    "BatchGetItem", "BatchWriteItem", "TransactGetItems", "TransactWriteItems",
+}
+# EMF accepts at most 100 values per metric and document
+MAX_VALUES = 100
+
+_cold_start = True
+_current = None
+_lock = threading.Lock()
+
+
+class Invocation:
+    """Metric values of one invocation, per handler and per AWS operation."""
+
+    def __init__(self, function_name):
+        self.function_name = function_name
+        self.values = defaultdict(list)
+        self.operations = defaultdict(lambda: defaultdict(list))
+
+    def add(self, name, value, operation=None):
+        # get-history calls AWS from a thread pool
+        with _lock:
+            if operation:
+                self.operations[operation][name].append(value)
+            else:
+                self.values[name].append(value)
+
+    def emit(self):
+        call_times = [t for metrics in self.operations.values() for t in metrics.get("CallTime", [])]
+        if call_times:
+            self.values["AwsCallTime"].append(sum(call_times))
+
+        print(json.dumps(document({"Function": self.function_name}, self.values)))
+        for operation, values in sorted(self.operations.items()):
+            print(json.dumps(document({"Function": self.function_name, "Operation": operation}, values)))
+
+
+def document(dimensions, values):
+    return {
+        "_aws": {
+            "Timestamp": int(time.time() * 1000),
+            "CloudWatchMetrics": [{
+                "Namespace": NAMESPACE,
+                "Dimensions": [list(dimensions)],
+                "Metrics": [{"Name": name, "Unit": UNITS.get(name, "None")} for name in values],
+            }],
+        },
+        **dimensions,
+        **{name: v[0] if len(v) == 1 else v[:MAX_VALUES] for name, v in values.items()},
+    }
+
+
+def record(name, value, operation=None):
+    """Adds a value to the current invocation, a no-op outside of an instrumented handler."""
+    invocation = _current
+    if invocation is not None:
+        invocation.add(name, value, operation)
+
+
+def instrument(function_name):
+    # the deployed name tells apart the functions of the exercise types that share a handler
+    function_name = os.environ.get("AWS_LAMBDA_FUNCTION_NAME", function_name)
+
+    def decorator(handler):
+        if not ENABLED:
+            return handler
+
+        @wraps(handler)
+        def wrapper(event, context):
+            global _cold_start, _current
+            invocation = _current = Invocation(function_name)
+            invocation.add("ColdStart", int(_cold_start))
+            _cold_start = False
+
+            # SQS and DynamoDB stream batches
+            if isinstance(event, dict) and isinstance(event.get("Records"), list):
+                invocation.add("BatchSize", len(event["Records"]))
+
+            start = time.perf_counter()
+            try:
+                return handler(event, context)
+            finally:
+                invocation.add("Duration", (time.perf_counter() - start) * 1000)
+                _current = None
+                invocation.emit()
+
+        return wrapper
+
+    return decorator
+
+
+def watch(client):
+    """Registers the timing and capacity hooks on a boto3 client."""
+    if ENABLED:
+        events = client.meta.events
+        events.register("before-parameter-build.dynamodb", _request_capacity)
+        events.register("before-call", _start_call)
+        events.register("after-call", _end_call)
+        # fired with exception and context only, e.g. on a timeout or a closed connection
+        events.register("after-call-error", _end_error)
+    return client
+
+
+def _request_capacity(params, model, **kwargs):
+    if _current is not None and model.name in CAPACITY_OPERATIONS:
+        params.setdefault("ReturnConsumedCapacity", "TOTAL")
+
+
+def _start_call(model, context, **kwargs):
+    if _current is not None:
+        context["metrics_started"] = time.perf_counter()
+        context["metrics_operation"] = f"{model.service_model.service_name}.{model.name}"
+
+
+def _end_call(context, parsed=None, **kwargs):
+    invocation, operation = _stop(context)
+    if invocation is None:
+        return
+
+    capacity = (parsed or {}).get("ConsumedCapacity")
+    if capacity:
+        capacity = capacity if isinstance(capacity, list) else [capacity]
+        invocation.add("ConsumedCapacity", sum(c.get("CapacityUnits", 0) for c in capacity), operation)
+
+
+def _end_error(exception=None, context=None, **kwargs):
+    # a hook that raised here would replace the error of the call
+    _stop(context or {})
+
+
+def _stop(context):
+    """Records the time of the call, returns (invocation, operation), (None, None) outside of an instrumented handler."""
+    started = context.pop("metrics_started", None)
+    invocation = _current
+    if started is None or invocation is None:
+        return None, None
+
+    operation = context.get("metrics_operation")
+    invocation.add("CallTime", (time.perf_counter() - started) * 1000, operation)
+    return invocation, operation
@@ -0,0 +1,78 @@
+"""
+Batched SNS publishing, shared by the Lambdas that send several messages per invocation.
+
+Messages are buffered per topic and sent with PublishBatch, 10 per call. Entries
+that failed on the SNS side are sent again, entries rejected as the sender's
+fault are not. Message attributes, e.g. the "type" the SQS subscriptions filter
+on, are passed as strings:
+
+    publisher = Publisher(runtime.client("sns"))
+    publisher.add(topic_arn, {"uid": uid, "type": "addition", "count": 10}, type="addition")
+    failed = publisher.flush()
+"""
+import json
+import logging
+import time
+from collections import defaultdict
+
+logger = logging.getLogger()
+
+# SNS limit of entries in one PublishBatch call
+MAX_BATCH_ENTRIES = 10
+MAX_ATTEMPTS = 3
+BACKOFF_SECONDS = 0.05
+
+
+class Publisher:
+
+    def __init__(self, sns_client, max_attempts=MAX_ATTEMPTS):
+        self.sns_client = sns_client
+        self.max_attempts = max_attempts
+        self.buffers = defaultdict(list)
+
+    def add(self, topic_arn, message, **attributes):
+        entry = {"Message": message if isinstance(message, str) else json.dumps(message)}
+        if attributes:
+            entry["MessageAttributes"] = {
+                name: {"DataType": "String", "StringValue": str(value)} for name, value in attributes.items()
+            }
+        self.buffers[topic_arn].append(entry)
+
+    def flush(self):
+        """Publishes all buffered messages, returns the entries that could not be published."""
+        failed = []
+        for topic_arn, entries in self.buffers.items():
+            for i in range(0, len(entries), MAX_BATCH_ENTRIES):
+                failed.extend(self._publish(topic_arn, entries[i:i + MAX_BATCH_ENTRIES]))
+        self.buffers.clear()
+        return failed
+
+    def _publish(self, topic_arn, entries):
+        pending = dict(enumerate(entries))
+        rejected = []
+
+        for attempt in range(self.max_attempts):
+            if attempt:
+                time.sleep(BACKOFF_SECONDS * 2 ** (attempt - 1))
+
+            response = self.sns_client.publish_batch(
+                TopicArn=topic_arn,
+                PublishBatchRequestEntries=[{"Id": str(i), **entry} for i, entry in pending.items()],
+            )
+
+            retry = {}
+            for failure in response.get("Failed", []):
+                i = int(failure["Id"])
+                if failure.get("SenderFault"):
+                    # a malformed entry fails again, it is not retried
+                    logger.error(f"Message rejected by SNS: {failure.get('Code')} {failure.get('Message')}")
+                    rejected.append(pending[i])
+                else:
+                    retry[i] = pending[i]
+
+            pending = retry
+            if not pending:
+                return rejected
+
+        logger.error(f"{len(pending)} messages not published to {topic_arn} after {self.max_attempts} attempts")
+        return rejected + list(pending.values())
@@ -0,0 +1,68 @@
+"""
+Shared runtime of the Python Lambdas, deployed as the SharedRuntimeLayer.
+
+Clients are created once per container and reused by warm invocations. Import
+it first in a handler module and call report_init() at the end of the module
+to log how long the cold init took against IMPORT_BUDGET_MS. Clients are
+watched by metrics, so their calls show up in the metrics of an invocation.
+"""
+import logging
+import os
+import time
+
+INIT_STARTED = time.perf_counter()
+
+import boto3
+from botocore.config import Config
+
+import metrics
+
+logger = logging.getLogger()
+
+# keep-alive keeps the pooled connections of a frozen container usable for the next invocation
+CONFIG = Config(
+    max_pool_connections=int(os.environ.get("MAX_POOL_CONNECTIONS", 10)),
+    tcp_keepalive=True,
+    connect_timeout=2,
+    read_timeout=5,
+    retries={"max_attempts": 3, "mode": "standard"},
+)
+
+IMPORT_BUDGET_MS = float(os.environ.get("IMPORT_BUDGET_MS", 300))
+
+# DynamoDB limits of one TransactWriteItems and one BatchGetItem call
+MAX_TRANSACTION_ITEMS = 100
+MAX_BATCH_GET_KEYS = 100
+
+_clients = {}
+_resources = {}
+_init_reported = False
+
+
+def client(service_name):
+    if service_name not in _clients:
+        _clients[service_name] = metrics.watch(boto3.client(service_name, config=CONFIG))
+    return _clients[service_name]
+
+
+def resource(service_name):
+    if service_name not in _resources:
+        _resources[service_name] = boto3.resource(service_name, config=CONFIG)
+        metrics.watch(_resources[service_name].meta.client)
+    return _resources[service_name]
+
+
+def report_init(name):
+    # time since the first import of the runtime, i.e. the cold init of the handler module;
+    # modules imported later on (lazily) are not part of the init and not reported
+    global _init_reported
+    if _init_reported:
+        return None
+    _init_reported = True
+
+    elapsed = (time.perf_counter() - INIT_STARTED) * 1000
+    if elapsed > IMPORT_BUDGET_MS:
+        logger.warning(f"Init of {name} took {elapsed:.0f} ms, budget is {IMPORT_BUDGET_MS:.0f} ms")
+    else:
+        logger.info(f"Init of {name} took {elapsed:.0f} ms")
+    return elapsed
@@ -1,4 +1,4 @@
-import { Stack, StackProps } from 'aws-cdk-lib';
+import { Duration, Stack, StackProps } from 'aws-cdk-lib';
 import * as s3 from 'aws-cdk-lib/aws-s3';
 import { Construct } from 'constructs';
 
@@ -19,5 +19,12 @@ export class S3Stack extends Stack {
             allowedOrigins: ['*'],
             allowedHeaders: ['*'],
         });
+
+        // answers archived by lambdas/archiver.py, read back in ranged GETs by the history,
+        // which Infrequent Access serves as fast as Standard
+        this.bucket.addLifecycleRule({
+            prefix: 'archive/',
+            transitions: [{storageClass: s3.StorageClass.INFREQUENT_ACCESS, transitionAfter: Duration.days(30)}],
+        });
     }
 }
@@ -3,6 +3,7 @@ import * as sns from "aws-cdk-lib/aws-sns";
 import {Construct} from "constructs";
 
 export class AmazonSnsStack extends Stack {
+    // every type is registered with its kernels in lambdas/exercise_types.py
     public readonly exerciseTypeList = ["addition", "multiplication", "derivatives"];
     public readonly exerciseGenerateTopic: sns.Topic;
     public readonly exerciseEvaluateTopic: sns.Topic;
@@ -0,0 +1,99 @@
+"""
+Puts the unanswered exercises written before the sparse open exercise index into it.
+
+The OpenGSI of the Exercise tables only holds items with `openSince`, which the
+generators set since the index exists. Older unanswered exercises have none and
+get-exercise does not see them. This sets `openSince` to 0 on them, so they are
+served first, and removes the random `solveTime` they were generated with, which
+put them on the solveTime index of the answered exercises. Every item is updated
+conditioned on the exercise still being unanswered and not indexed yet: it is safe
+while the handlers keep writing, and a run that was cut short can simply be
+started again.
+
+Run it right after the deploy that added the index, not before: the graders of
+that deploy remove `openSince` when they grade, the ones before did not and would
+leave answered exercises in the index. Until it is done, a user whose pool is
+only old exercises gets a synchronous refill from get-exercise.
+
+    python scripts/backfill_open_index.py --dry-run
+    python scripts/backfill_open_index.py --segments 4 --endpoint-url http://localhost:4566
+"""
+import argparse
+import os
+import sys
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+import boto3
+from botocore.exceptions import ClientError
+
+LAMBDA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "lib", "lambdas")
+sys.path.insert(0, LAMBDA_DIR)
+
+import exercise_types  # noqa: E402
+
+# sorts before every openSince the generators write, the old exercises are served first
+LEGACY_OPEN_SINCE = 0
+
+
+def backfill_segment(client, table_name, segment, segments, dry_run):
+    counts = Counter()
+    scan = {
+        "TableName": table_name,
+        "ProjectionExpression": "uid, id",
+        "FilterExpression": "answered = :false AND attribute_not_exists(openSince)",
+        "ExpressionAttributeValues": {":false": {"BOOL": False}},
+        "Segment": segment,
+        "TotalSegments": segments,
+    }
+
+    while True:
+        response = client.scan(**scan)
+        counts["scanned"] += response.get("ScannedCount", 0)
+        for item in response.get("Items", []):
+            if dry_run:
+                counts["to index"] += 1
+                continue
+
+            try:
+                client.update_item(
+                    TableName=table_name,
+                    Key={"uid": item["uid"], "id": item["id"]},
+                    UpdateExpression="SET openSince = :since REMOVE solveTime",
+                    ConditionExpression="answered = :false AND attribute_not_exists(openSince)",
+                    ExpressionAttributeValues={":false": {"BOOL": False}, ":since": {"N": str(LEGACY_OPEN_SINCE)}},
+                )
+                counts["indexed"] += 1
+            except ClientError as e:
+                if e.response.get("Error", {}).get("Code") != "ConditionalCheckFailedException":
+                    raise
+                # graded in the meantime
+                counts["answered meanwhile"] += 1
+
+        if "LastEvaluatedKey" not in response:
+            return counts
+        scan["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tables", nargs="*", help="default: every Exercise<type> table of exercise_types")
+    parser.add_argument("--segments", type=int, default=4, help="parallel scan segments per table")
+    parser.add_argument("--endpoint-url", help="e.g. http://localhost:4566 for LocalStack")
+    parser.add_argument("--dry-run", action="store_true", help="count the exercises to index, write nothing")
+    args = parser.parse_args()
+
+    client = boto3.client("dynamodb", endpoint_url=args.endpoint_url)
+    tables = args.tables or ["Exercise" + name for name in exercise_types.REGISTRY]
+
+    for table_name in tables:
+        with ThreadPoolExecutor(max_workers=args.segments) as executor:
+            results = executor.map(
+                lambda segment: backfill_segment(client, table_name, segment, args.segments, args.dry_run),
+                range(args.segments))
+            counts = sum(results, Counter())
+        print(f"{table_name}: " + ", ".join(f"{count} {name}" for name, count in sorted(counts.items())))
+
+
+if __name__ == "__main__":
+    main()
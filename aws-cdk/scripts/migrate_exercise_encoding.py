@@ -0,0 +1,142 @@
+"""
+Converts the exercises and answers of the Exercise tables between the map and the
+binary encoding of lib/lambdas/codec.py.
+
+Every item is updated on its own, conditioned on the attribute still being in the
+old form, so it is safe while the handlers keep writing, and a run that was cut
+short can simply be started again. The readers accept both forms in the meantime.
+Items that cannot be converted, e.g. NaN answers of the old float math, are left
+as they are and listed at the end.
+
+    python scripts/migrate_exercise_encoding.py --dry-run
+    python scripts/migrate_exercise_encoding.py --to binary --segments 4
+    python scripts/migrate_exercise_encoding.py --to map --endpoint-url http://localhost:4566
+"""
+import argparse
+import os
+import sys
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+import boto3
+from boto3.dynamodb.types import TypeDeserializer, TypeSerializer
+from botocore.exceptions import ClientError
+
+LAMBDA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "lib", "lambdas")
+sys.path.insert(0, LAMBDA_DIR)
+
+import codec  # noqa: E402
+from answer_keys import normalize  # noqa: E402
+
+deserializer = TypeDeserializer()
+serializer = TypeSerializer()
+# the DynamoDB attribute type of each form
+STORED_TYPE = {"binary": "B", "map": "M"}
+ANSWER_TYPE = {"binary": "B", "map": "S"}
+
+
+def convert(item, target):
+    """SET clauses, values and the condition of one item, None if it is in the target form already."""
+    sets, values, conditions = [], {}, []
+
+    exercise = item.get("exercise")
+    if exercise and next(iter(exercise)) != STORED_TYPE[target]:
+        # Decimals of a read map back to ints, so the operands fit the binary encoding
+        decoded = normalize(codec.decode_exercise(deserializer.deserialize(exercise)))
+        stored = codec.stored_exercise(decoded, target)
+        # exercises that do not fit the binary encoding stay maps
+        if target == "map" or not isinstance(stored, dict):
+            sets.append("exercise = :exercise")
+            values[":exercise"] = {"B": stored.value} if target == "binary" else serializer.serialize(decoded)
+            conditions.append("attribute_type(exercise, :exerciseType)")
+            values[":exerciseType"] = {"S": next(iter(exercise))}
+
+    answer = item.get("answer")
+    if answer and next(iter(answer)) != ANSWER_TYPE[target]:
+        stored = codec.answer_attribute(normalize(codec.decode_answer(deserializer.deserialize(answer))), target)
+        # answers that are not shorter in binary stay strings
+        if next(iter(stored)) != next(iter(answer)):
+            sets.append("answer = :answer")
+            values[":answer"] = stored
+            conditions.append("attribute_type(answer, :answerType)")
+            values[":answerType"] = {"S": next(iter(answer))}
+
+    if not sets:
+        return None
+    return "SET " + ", ".join(sets), values, " AND ".join(conditions)
+
+
+def migrate_segment(client, table_name, target, segment, segments, dry_run):
+    """Counts of the segment and the (uid, id) of the items that could not be converted."""
+    counts = Counter()
+    skipped = []
+    scan = {"TableName": table_name, "ProjectionExpression": "uid, id, exercise, answer",
+            "Segment": segment, "TotalSegments": segments}
+
+    while True:
+        response = client.scan(**scan)
+        for item in response.get("Items", []):
+            counts["scanned"] += 1
+            try:
+                update = convert(item, target)
+            except ValueError as e:
+                # e.g. a NaN answer of the old float math, left as it is instead of stopping the segment
+                print(f"{table_name}: skipped uid {item['uid']['S']} id {item['id']['S']}: {e}", file=sys.stderr)
+                counts["skipped"] += 1
+                skipped.append((item["uid"]["S"], item["id"]["S"]))
+                continue
+            if update is None:
+                counts["unchanged"] += 1
+                continue
+            if dry_run:
+                counts["to convert"] += 1
+                continue
+
+            expression, values, condition = update
+            try:
+                client.update_item(TableName=table_name, Key={"uid": item["uid"], "id": item["id"]},
+                                   UpdateExpression=expression, ConditionExpression=condition,
+                                   ExpressionAttributeValues=values)
+                counts["converted"] += 1
+            except ClientError as e:
+                if e.response.get("Error", {}).get("Code") != "ConditionalCheckFailedException":
+                    raise
+                # written by a handler in the meantime, picked up by the next run
+                counts["changed meanwhile"] += 1
+
+        if "LastEvaluatedKey" not in response:
+            return counts, skipped
+        scan["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--to", choices=("binary", "map"), default="binary", help="target encoding")
+    parser.add_argument("--tables", nargs="*", help="default: every Exercise<type> table of exercise_types")
+    parser.add_argument("--segments", type=int, default=4, help="parallel scan segments per table")
+    parser.add_argument("--endpoint-url", help="e.g. http://localhost:4566 for LocalStack")
+    parser.add_argument("--dry-run", action="store_true", help="count the items to convert, write nothing")
+    args = parser.parse_args()
+
+    client = boto3.client("dynamodb", endpoint_url=args.endpoint_url)
+    tables = args.tables or ["Exercise" + name for name in codec.exercise_types.REGISTRY]
+
+    skipped = []
+    for table_name in tables:
+        with ThreadPoolExecutor(max_workers=args.segments) as executor:
+            results = list(executor.map(
+                lambda segment: migrate_segment(client, table_name, args.to, segment, args.segments, args.dry_run),
+                range(args.segments)))
+        counts = sum((segment_counts for segment_counts, _ in results), Counter())
+        skipped.extend((table_name, uid, eid) for _, segment_skipped in results for uid, eid in segment_skipped)
+        print(f"{table_name}: " + ", ".join(f"{count} {name}" for name, count in sorted(counts.items())))
+
+    # kept in their old form, the readers still accept it
+    if skipped:
+        print(f"{len(skipped)} items skipped:")
+        for table_name, uid, eid in skipped:
+            print(f"  {table_name} uid {uid} id {eid}")
+
+
+if __name__ == "__main__":
+    main()
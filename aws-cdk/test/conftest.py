@@ -0,0 +1,28 @@
+"""
+The Python modules of lib/ are tested in-process, against moto where they call AWS.
+
+The benchmark helpers set the fake credentials and region and mirror the tables
+of dynamodb-stack.ts, the tests use them too.
+"""
+import os
+import sys
+
+import pytest
+
+BENCHMARKS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "benchmarks")
+sys.path.insert(0, BENCHMARKS_DIR)
+
+import local_aws  # noqa: E402
+
+# the code asset directory and the SharedRuntimeLayer, as on the path of a deployed function
+for module_dir in (local_aws.LAYER_DIR, os.path.join(local_aws.LIB_DIR, "lambdas")):
+    if module_dir not in sys.path:
+        sys.path.insert(0, module_dir)
+
+
+@pytest.fixture
+def aws():
+    from moto import mock_aws
+
+    with mock_aws():
+        yield
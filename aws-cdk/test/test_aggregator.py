@@ -0,0 +1,125 @@
+import json
+
+import boto3
+import pytest
+
+import local_aws
+
+EXERCISE_TYPE = "addition"
+
+
+@pytest.fixture
+def aggregator(aws, monkeypatch):
+    monkeypatch.setenv("TABLE_STATS", local_aws.create_stats_table())
+    monkeypatch.setenv("EXERCISE_TYPE", EXERCISE_TYPE)
+    monkeypatch.setenv("EXERCISE_TYPES", json.dumps([EXERCISE_TYPE]))
+    return local_aws.load_lambda("aggregator.py")
+
+
+def answer(uid, eid, solve_time, correct):
+    return {"uid": {"S": uid}, "id": {"S": eid}, "exercise": {"M": {"type": {"S": EXERCISE_TYPE}}},
+            "answered": {"BOOL": True}, "answer": {"S": "0"},
+            "correctness": {"BOOL": correct}, "solveTime": {"N": str(solve_time)}}
+
+
+def view():
+    get_stats = local_aws.load_lambda("get-stats.py")
+    response = get_stats.handler(local_aws.api_event("reader", path_parameters={"type": EXERCISE_TYPE}), None)
+    assert response["statusCode"] == 200
+    return json.loads(response["body"])
+
+
+def state(uid):
+    return boto3.resource("dynamodb").Table("Stats").get_item(Key={"pk": f"{EXERCISE_TYPE}#user#{uid}",
+                                                                    "sk": "state"})["Item"]
+
+
+# a: two correct answers 4 s apart and one false after a new session; b: one correct answer
+BATCH = [answer("a", "a1", 1000, True), answer("b", "b1", 1000, True), answer("a", "a2", 1004, True),
+         answer("a", "a3", 9000, False)]
+
+
+def test_answers_are_folded_into_totals_and_leaderboard(aggregator):
+    aggregator.handler(local_aws.answered_stream_event(BATCH), None)
+
+    body = view()
+    assert (body["answered"], body["correct"]) == (4, 3)
+    # a at 2/3 and b at 1/1 of accuracy
+    assert body["accuracyHistogram"][6] == 1 and body["accuracyHistogram"][9] == 1
+    assert sum(body["solveTime"]["histogram"]) == 1
+    assert body["leaderboard"] == [{"uid": "a", "correct": 2, "answered": 3}, {"uid": "b", "correct": 1, "answered": 1}]
+    assert (int(state("a")["answered"]), int(state("a")["lastSolveTime"])) == (3, 9000)
+
+
+def test_other_updates_of_exercises_are_ignored(aggregator):
+    event = local_aws.answered_stream_event(BATCH[:1])
+    # answered already in the old image, e.g. the archiver or a later attribute update
+    event["Records"][0]["dynamodb"]["OldImage"]["answered"] = {"BOOL": True}
+    event["Records"].append({**event["Records"][0], "eventName": "INSERT"})
+
+    aggregator.handler(event, None)
+    assert view()["answered"] == 0
+
+
+def test_replayed_batch_is_not_counted_twice(aggregator):
+    event = local_aws.answered_stream_event(BATCH)
+    aggregator.handler(event, None)
+    first = view()
+
+    aggregator.handler(event, None)
+    assert view() == first
+    assert int(state("a")["answered"]) == 3
+
+
+def test_sequence_guard_skips_folded_users_only(aggregator):
+    aggregator.handler(local_aws.answered_stream_event(BATCH[:2], first_sequence=1), None)
+
+    # the retried first batch together with new answers: a is folded up to sequence 1, c is new
+    retried = local_aws.answered_stream_event([BATCH[0], answer("c", "c1", 2000, False)], first_sequence=1)
+    aggregator.handler(retried, None)
+    # a later answer of a with a higher sequence number is folded
+    aggregator.handler(local_aws.answered_stream_event([BATCH[2]], first_sequence=10), None)
+
+    body = view()
+    assert (body["answered"], body["correct"]) == (4, 3)
+    assert int(state("a")["answered"]) == 2
+    # 40 digits, compared as strings
+    assert state("a")["lastSequence"] == f"{10:040d}"
+    assert [entry["uid"] for entry in body["leaderboard"]] == ["a", "b", "c"]
+
+
+def test_retry_after_a_failed_leaderboard_write_only_writes_the_board(aggregator, monkeypatch):
+    event = local_aws.answered_stream_event(BATCH)
+
+    def fail(*args):
+        raise RuntimeError("throttled")
+
+    with monkeypatch.context() as patch:
+        patch.setattr(aggregator, "update_leaderboard", fail)
+        with pytest.raises(RuntimeError):
+            aggregator.handler(event, None)
+    assert view()["leaderboard"] == []
+
+    aggregator.handler(event, None)
+    body = view()
+    assert (body["answered"], body["correct"]) == (4, 3)
+    assert len(body["leaderboard"]) == 2
+
+
+def test_state_changed_since_read_is_folded_again(aggregator, monkeypatch):
+    event = local_aws.answered_stream_event([BATCH[0], BATCH[2]])
+    aggregator.handler(event, None)
+    read_states = aggregator.read_states
+    rounds = []
+
+    def stale_once(exercise_type, uids):
+        # the first round read the states before a concurrent run of the batch committed
+        rounds.append(uids)
+        return {} if len(rounds) == 1 else read_states(exercise_type, uids)
+
+    monkeypatch.setattr(aggregator, "read_states", stale_once)
+    aggregator.handler(event, None)
+
+    assert len(rounds) == 2
+    assert view()["answered"] == 2
+    assert int(state("a")["answered"]) == 2
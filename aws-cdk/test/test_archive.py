@@ -0,0 +1,140 @@
+import base64
+import json
+import os
+import time
+
+import boto3
+import pytest
+
+import local_aws
+
+EXERCISE_TYPE = "addition"
+BUCKET = "archive-bucket"
+UID = "user-1"
+DAY = 86400
+
+
+@pytest.fixture
+def table(aws, monkeypatch):
+    """The Exercise table of UID with 12 answers, 8 of them older than ARCHIVE_AFTER_DAYS, and 2 open exercises."""
+    table_name = local_aws.create_exercise_table(EXERCISE_TYPE)
+    boto3.client("s3").create_bucket(
+        Bucket=BUCKET, CreateBucketConfiguration={"LocationConstraint": os.environ["AWS_DEFAULT_REGION"]})
+    for name, value in {"TABLE_NAME": table_name, "TABLE_USER_COUNT": local_aws.create_user_count_table(),
+                        "EXERCISE_TYPE": EXERCISE_TYPE, "EXERCISE_TYPES": json.dumps([EXERCISE_TYPE]),
+                        "ARCHIVE_BUCKET": BUCKET, "ARCHIVE_AFTER_DAYS": "90"}.items():
+        monkeypatch.setenv(name, value)
+
+    table = boto3.resource("dynamodb").Table(table_name)
+    now = int(time.time())
+    with table.batch_writer() as batch:
+        for i in range(12):
+            # every 10 days from 55 days back, the last 8 beyond 90 days
+            batch.put_item(Item={"uid": UID, "id": f"answered-{i:02d}", "exercise": {"type": "addition", "addends": [i, 1]},
+                                 "answered": True, "answer": json.dumps(i + 1), "correctness": i % 3 != 0,
+                                 "solveTime": now - (i * 10 + 55) * DAY})
+        for i in range(2):
+            batch.put_item(Item={"uid": UID, "id": f"open-{i}", "exercise": {"type": "addition", "addends": [1, 1]},
+                                 "answered": False, "openSince": now * 1000})
+        # generated before the open index, unanswered with a random solveTime on the index
+        batch.put_item(Item={"uid": UID, "id": "legacy-open", "exercise": {"type": "addition", "addends": [2, 2]},
+                             "answered": False, "solveTime": 7})
+    boto3.resource("dynamodb").Table("UserCount").put_item(
+        Item={"uid": UID, "etype": EXERCISE_TYPE, "correctCount": 8, "falseCount": 4})
+    return table
+
+
+def history(get_history, page_size, cursor=None, uid=UID):
+    event = local_aws.api_event(uid, path_parameters={"type": EXERCISE_TYPE})
+    event["queryStringParameters"] = {"limit": str(page_size), **({"cursor": cursor} if cursor else {})}
+    return get_history.handler(event, None)
+
+
+def walk(get_history, page_size):
+    """The ids of every page of UID's history."""
+    pages, cursor = [], None
+    while True:
+        page = json.loads(history(get_history, page_size, cursor)["body"])
+        pages.append([item["id"] for item in page["items"]])
+        cursor = page["cursor"]
+        if not cursor:
+            return pages
+
+
+def ids(table):
+    return {item["id"] for item in table.scan()["Items"]}
+
+
+def test_archiver_moves_old_answers_only(table):
+    archiver = local_aws.load_lambda("archiver.py")
+
+    result = archiver.handler({}, None)
+
+    assert (result["archived"], result["deleted"], result["leftover"], result["objects"]) == (8, 8, 0, 1)
+    left = ids(table)
+    assert {f"answered-{i:02d}" for i in range(4)} | {"open-0", "open-1", "legacy-open"} < left
+    assert not any(eid.startswith("answered-") and int(eid[-2:]) >= 4 for eid in left)
+    # one pointer for the user's member
+    assert len([eid for eid in left if eid.startswith("archive#")]) == 1
+    assert archiver.handler({}, None)["archived"] == 0
+
+
+def test_leftovers_of_an_interrupted_run_are_deleted_not_archived_twice(table):
+    archiver = local_aws.load_lambda("archiver.py")
+    old = [item for item in table.scan()["Items"]
+           if item.get("answered") and int(item["solveTime"]) < time.time() - 90 * DAY]
+    archiver.handler({}, None)
+
+    # a run that wrote its pointers and stopped before its deletes
+    with table.batch_writer() as batch:
+        for item in old:
+            batch.put_item(Item=item)
+    result = archiver.handler({}, None)
+
+    assert (result["archived"], result["leftover"], result["deleted"]) == (0, 8, 8)
+    get_history = local_aws.load_lambda("get-history.py")
+    assert sum(walk(get_history, 5), []) == [f"answered-{i:02d}" for i in range(12)]
+
+
+@pytest.mark.parametrize("page_size", [1, 3, 4, 5, 20])
+def test_history_pages_continue_from_the_table_into_the_archive(table, page_size):
+    get_history = local_aws.load_lambda("get-history.py")
+    before = walk(get_history, page_size)
+
+    local_aws.load_lambda("archiver.py").handler({}, None)
+    after = walk(get_history, page_size)
+
+    expected = [f"answered-{i:02d}" for i in range(12)]
+    assert sum(before, []) == expected
+    assert sum(after, []) == expected
+    assert all(len(page) == page_size for page in after[:-1])
+
+
+@pytest.mark.parametrize("position", [
+    [1, 2],
+    "archive#1",
+    7,
+    None,
+    {"archive": ["archive#1"], "offset": 0},
+    {"archive": "answered-01", "offset": 0},
+    {"archive": "archive#0000000001#run", "offset": -1},
+    {"archive": "archive#0000000001#run", "offset": "1"},
+    {"id": "answered-01", "solveTime": 5},
+    {"id": {"S": "answered-01"}},
+    {"id": {"S": "answered-01"}, "solveTime": {"N": "x"}},
+])
+def test_malformed_cursor_is_a_bad_request(table, position):
+    get_history = local_aws.load_lambda("get-history.py")
+    cursor = base64.urlsafe_b64encode(json.dumps(position).encode()).decode()
+
+    assert history(get_history, 5, cursor)["statusCode"] == 400
+    assert history(get_history, 5, "not base64!")["statusCode"] == 400
+
+
+def test_cursor_only_continues_the_callers_history(table):
+    get_history = local_aws.load_lambda("get-history.py")
+    cursor = json.loads(history(get_history, 2)["body"])["cursor"]
+
+    response = history(get_history, 2, cursor, uid="user-2")
+    assert response["statusCode"] == 200
+    assert json.loads(response["body"])["items"] == []
@@ -0,0 +1,119 @@
+import json
+
+import boto3
+import pytest
+
+import local_aws
+
+EXERCISE_TYPE = "addition"
+UID = "user-1"
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    import cache
+
+    # a new stand-in for the shared tier per test
+    monkeypatch.setenv("CACHE_URL", "local")
+    monkeypatch.setattr(cache, "_shared", None)
+    monkeypatch.setattr(cache, "_shared_url", None)
+    return cache
+
+
+@pytest.fixture
+def calls(aws):
+    # before the handlers create their clients
+    return local_aws.CallCounter()
+
+
+@pytest.fixture
+def handlers(calls, cache, monkeypatch):
+    table_name = local_aws.create_exercise_table(EXERCISE_TYPE)
+    topic_arn = boto3.client("sns").create_topic(Name="ExerciseEvaluateTopic")["TopicArn"]
+    for name, value in {"TABLE_NAME": table_name, "TABLE_EXERCISE": table_name, "EXERCISE_TYPE": EXERCISE_TYPE,
+                        "EXERCISE_TYPES": json.dumps([EXERCISE_TYPE]),
+                        "TABLE_USER_COUNT": local_aws.create_user_count_table(),
+                        "TABLE_SUBMISSION_DEDUPE": local_aws.create_submission_dedupe_table(),
+                        "SNS_TOPIC_ARN": topic_arn, "GRADING_MODE": "inline"}.items():
+        monkeypatch.setenv(name, value)
+
+    generators = local_aws.load_lambda("generators.py")
+    generators.refill_now(generators.dynamodb.Table(table_name), EXERCISE_TYPE, UID, 3)
+    return {name: local_aws.load_lambda(f"{name}.py") for name in ("get-exercise", "get-profile", "post-solution")}
+
+
+def body(handler, payload=None):
+    response = handler.handler(local_aws.api_event(UID, payload), None)
+    assert response["statusCode"] == 200
+    return response["body"]
+
+
+def test_fetch_loads_once_per_version(cache):
+    responses = cache.Cache("test")
+    loads = []
+
+    def load():
+        loads.append(None)
+        return f"response {len(loads)}"
+
+    assert responses.fetch(UID, ["a", "b"], load) == "response 1"
+    assert responses.fetch(UID, ["a", "b"], load) == "response 1"
+
+    cache.invalidate("b", [UID])
+    assert responses.fetch(UID, ["a", "b"], load) == "response 2"
+    # another user's writes leave the response valid
+    cache.invalidate("a", ["user-2"])
+    assert responses.fetch(UID, ["a", "b"], load) == "response 2"
+    assert len(loads) == 2
+
+
+def test_version_is_shared_by_the_lru_of_other_containers(cache):
+    # two containers of one function, the writer runs in a third
+    first, second = cache.Cache("test"), cache.Cache("test")
+    first.fetch(UID, ["a"], lambda: "old")
+    assert second.fetch(UID, ["a"], lambda: "loaded") == "old"
+
+    cache.invalidate("a", [UID])
+    assert first.fetch(UID, ["a"], lambda: "new") == "new"
+    assert second.fetch(UID, ["a"], lambda: "loaded") == "new"
+
+
+def test_response_that_must_not_be_cached_is_loaded_again(cache):
+    responses = cache.Cache("test")
+    assert responses.fetch(UID, ["a"], lambda: None) is None
+    assert responses.fetch(UID, ["a"], lambda: "loaded") == "loaded"
+
+
+def test_without_a_shared_tier_nothing_is_cached(cache, monkeypatch):
+    monkeypatch.delenv("CACHE_URL")
+    responses = cache.Cache("test")
+    responses.fetch(UID, ["a"], lambda: "old")
+    assert responses.fetch(UID, ["a"], lambda: "new") == "new"
+
+
+def test_unavailable_shared_tier_loads(cache, monkeypatch):
+    class Down:
+        def get_many(self, keys):
+            raise ConnectionError("no route")
+
+        def incr_many(self, keys):
+            raise ConnectionError("no route")
+
+    monkeypatch.setattr(cache, "shared_tier", lambda: Down())
+    assert cache.Cache("test").fetch(UID, ["a"], lambda: "loaded") == "loaded"
+    cache.invalidate("a", [UID])
+
+
+def test_graded_answer_invalidates_profile_and_open_exercise(handlers, calls):
+    profile, exercise = body(handlers["get-profile"]), body(handlers["get-exercise"])
+
+    calls.reset()
+    assert (body(handlers["get-profile"]), body(handlers["get-exercise"])) == (profile, exercise)
+    assert calls.total("dynamodb") == 0
+
+    answer_keys = local_aws.load_lambda("answer_keys.py")
+    served = json.loads(exercise)
+    body(handlers["post-solution"], {"eid": served["id"], "solution": answer_keys.solve(served["exercise"])})
+
+    assert json.loads(body(handlers["get-profile"]))[EXERCISE_TYPE]["answered"] == 1
+    assert json.loads(body(handlers["get-exercise"]))["id"] != served["id"]
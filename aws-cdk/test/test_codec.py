@@ -0,0 +1,77 @@
+import json
+
+import pytest
+from boto3.dynamodb.types import Binary
+
+import codec
+
+
+@pytest.mark.parametrize("exercise", [
+    {"type": "addition", "addends": [2, 3, 4]},
+    {"type": "multiplication", "multipliers": [7, 1, 10]},
+    {"type": "derivative", "power": 2, "coeffs": [3, 1, 4]},
+    # beyond one byte per value and negative
+    {"type": "addition", "addends": [-64, 63, 64, 1000000, -123456789]},
+    {"type": "derivative", "power": 0, "coeffs": [0]},
+])
+def test_exercise_round_trip(exercise):
+    encoded = codec.encode_exercise(exercise)
+    assert encoded is not None
+    assert codec.decode_exercise(encoded) == exercise
+    # as read by the resource API
+    assert codec.decode_exercise(Binary(encoded)) == exercise
+
+
+@pytest.mark.parametrize("exercise", [
+    {"type": "addition", "addends": [1.5, 2]},
+    {"type": "addition", "addends": [1, 2], "hint": "x"},
+    {"type": "derivative", "power": 2},
+    {"type": "unknown", "values": [1]},
+])
+def test_exercise_that_does_not_fit_stays_a_map(exercise):
+    assert codec.encode_exercise(exercise) is None
+    assert codec.stored_exercise(exercise, "binary") == exercise
+
+
+def test_stored_exercise_follows_the_encoding():
+    exercise = {"type": "addition", "addends": [2, 3]}
+    assert codec.stored_exercise(exercise, "map") == exercise
+    stored = codec.stored_exercise(exercise, "binary")
+    assert isinstance(stored, Binary)
+    assert codec.decode_exercise(stored) == exercise
+    # maps are returned as they are
+    assert codec.decode_exercise(exercise) == exercise
+
+
+@pytest.mark.parametrize("answer", [
+    0, 12, -7, 10 ** 12,
+    {"power": 1, "coeffs": [6, 1]},
+    {"power": 3, "coeffs": [-200, 0, 5, 1]},
+    # no int or polynomial, kept as JSON
+    1.5, "12", [1, 2], {"coeffs": [1]}, None,
+])
+def test_answer_round_trip(answer):
+    assert codec.decode_answer(codec.encode_answer(answer)) == answer
+
+
+@pytest.mark.parametrize("encoding", ["binary", "map"])
+@pytest.mark.parametrize("answer", [12, 123456789, {"power": 2, "coeffs": [1, 2, 3]}, "abc"])
+def test_answer_attribute_round_trip(encoding, answer):
+    attribute = codec.answer_attribute(answer, encoding)
+    (kind, value), = attribute.items()
+    assert codec.decode_answer(value) == answer
+    if encoding == "map":
+        assert attribute == {"S": json.dumps(answer)}
+
+
+def test_small_answer_keeps_its_json():
+    # "7" is as short as its binary form
+    assert codec.answer_attribute(7, "binary") == {"S": "7"}
+    assert "B" in codec.answer_attribute({"power": 2, "coeffs": [1, 2, 3]}, "binary")
+
+
+def test_unknown_version_is_rejected():
+    encoded = bytearray(codec.encode_exercise({"type": "addition", "addends": [1]}))
+    encoded[0] = codec.VERSION + 1
+    with pytest.raises(ValueError):
+        codec.decode_exercise(bytes(encoded))
@@ -0,0 +1,92 @@
+import json
+
+import boto3
+import pytest
+
+import local_aws
+
+EXERCISE_TYPE = "addition"
+
+
+@pytest.fixture
+def table(aws, monkeypatch):
+    table_name = local_aws.create_exercise_table(EXERCISE_TYPE)
+    monkeypatch.setenv("TABLE_NAME", table_name)
+    monkeypatch.setenv("EXERCISE_TYPE", EXERCISE_TYPE)
+    monkeypatch.setenv("TABLE_USER_COUNT", local_aws.create_user_count_table())
+    monkeypatch.delenv("CACHE_URL", raising=False)
+    return boto3.resource("dynamodb").Table(table_name)
+
+
+def pool(table, uid):
+    return {item["id"]: item for item in table.query(KeyConditionExpression="uid = :uid",
+                                                     ExpressionAttributeValues={":uid": uid})["Items"]}
+
+
+def test_message_writes_its_count(table):
+    import generators
+
+    generators.handler(local_aws.sqs_event([{"uid": "user-1", "type": EXERCISE_TYPE, "count": 7}]), None)
+
+    exercises = pool(table, "user-1")
+    assert len(exercises) == 7
+    assert all(item["answered"] is False and "openSince" in item for item in exercises.values())
+
+
+def test_uids_fan_out(table):
+    import generators
+
+    generators.handler(local_aws.sqs_event([{"uids": ["user-1", "user-2", "user-3"], "type": EXERCISE_TYPE, "count": 4}]), None)
+
+    assert [len(pool(table, uid)) for uid in ("user-1", "user-2", "user-3")] == [4, 4, 4]
+
+
+def test_redelivery_writes_the_exercises_once(table):
+    import generators
+
+    event = local_aws.sqs_event([{"uid": "user-1", "type": EXERCISE_TYPE, "count": 5}])
+    generators.handler(event, None)
+    first = pool(table, "user-1")
+
+    # answered in between, the redelivery must not reset it
+    answered = next(iter(first))
+    table.update_item(Key={"uid": "user-1", "id": answered}, UpdateExpression="SET answered = :true REMOVE openSince",
+                      ExpressionAttributeValues={":true": True})
+    generators.handler(event, None)
+
+    second = pool(table, "user-1")
+    assert second.keys() == first.keys()
+    assert second[answered]["answered"] is True
+
+
+def test_another_message_writes_new_exercises(table):
+    import generators
+
+    generators.handler(local_aws.sqs_event([{"uid": "user-1", "type": EXERCISE_TYPE, "count": 5}]), None)
+    generators.handler(local_aws.sqs_event([{"uid": "user-1", "type": EXERCISE_TYPE, "count": 5}]), None)
+
+    assert len(pool(table, "user-1")) == 10
+
+
+@pytest.mark.parametrize("message", [
+    [1, 2],
+    "user-1",
+    {"uids": "abc", "type": EXERCISE_TYPE, "count": 3},
+    {"uids": [], "type": EXERCISE_TYPE, "count": 3},
+    {"uids": ["user-2", 7], "type": EXERCISE_TYPE, "count": 3},
+    {"type": EXERCISE_TYPE, "count": 3},
+    {"uid": "user-2", "type": EXERCISE_TYPE, "count": "3"},
+    {"uid": "user-2", "type": EXERCISE_TYPE, "count": True},
+    {"uid": "user-2", "type": EXERCISE_TYPE, "count": 0},
+    {"uid": "user-2", "type": EXERCISE_TYPE, "count": 10 ** 6},
+])
+def test_malformed_message_is_dropped_alone(table, message):
+    import generators
+
+    event = local_aws.sqs_event([message, {"uid": "user-1", "type": EXERCISE_TYPE, "count": 3}])
+    event["Records"].append({"messageId": "not-json", "body": json.dumps({"Message": "{"})})
+    response = generators.handler(event, None)
+
+    assert response["statusCode"] == 200
+    assert len(pool(table, "user-1")) == 3
+    assert not pool(table, "a") and not pool(table, "user-2")
@@ -0,0 +1,61 @@
+import json
+
+import boto3
+import pytest
+
+import local_aws
+
+EXERCISE_TYPE = "addition"
+UID = "user-1"
+
+
+@pytest.fixture
+def get_exercise(aws, monkeypatch):
+    table_name = local_aws.create_exercise_table(EXERCISE_TYPE)
+    monkeypatch.setenv("TABLE_NAME", table_name)
+    monkeypatch.setenv("EXERCISE_TYPE", EXERCISE_TYPE)
+    monkeypatch.setenv("TABLE_USER_COUNT", local_aws.create_user_count_table())
+    monkeypatch.delenv("CACHE_URL", raising=False)
+    table = boto3.resource("dynamodb").Table(table_name)
+    with table.batch_writer() as batch:
+        for i in range(3):
+            batch.put_item(Item={"uid": UID, "id": f"e{i}", "answered": False, "openSince": 1000 + i,
+                                 "exercise": {"type": "addition", "addends": [i, 1]}})
+    return local_aws.load_lambda("get-exercise.py")
+
+
+def served(get_exercise):
+    response = get_exercise.handler(local_aws.api_event(UID), None)
+    assert response["statusCode"] == 200
+    return json.loads(response["body"])
+
+
+def answer(eid, keep_in_index=False):
+    # the open index is eventually consistent, right after the grade it may still list the exercise
+    update = "SET answered = :true" + ("" if keep_in_index else " REMOVE openSince")
+    boto3.resource("dynamodb").Table("Exerciseaddition").update_item(
+        Key={"uid": UID, "id": eid}, UpdateExpression=update, ExpressionAttributeValues={":true": True})
+
+
+def test_oldest_open_exercise_is_served(get_exercise):
+    body = served(get_exercise)
+    assert body["id"] == "e0"
+    assert body["exercise"] == {"type": "addition", "addends": [0, 1]}
+    assert "answerKey" not in body
+
+
+def test_answered_exercise_still_on_the_index_is_not_served(get_exercise):
+    answer("e0", keep_in_index=True)
+    assert served(get_exercise)["id"] == "e1"
+
+    answer("e1", keep_in_index=True)
+    assert served(get_exercise)["id"] == "e2"
+
+
+def test_empty_pool_is_refilled(get_exercise):
+    for eid in ("e0", "e1", "e2"):
+        answer(eid)
+
+    body = served(get_exercise)
+    assert body["id"] not in ("e0", "e1", "e2")
+    assert body["answered"] is False
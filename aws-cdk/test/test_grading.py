@@ -0,0 +1,143 @@
+import json
+
+import boto3
+import pytest
+
+import local_aws
+
+EXERCISE_TYPE = "addition"
+UID = "user-1"
+
+
+@pytest.fixture
+def exercises(aws, monkeypatch):
+    """Three open addition exercises of UID, (id, solution) each."""
+    table_name = local_aws.create_exercise_table(EXERCISE_TYPE)
+    monkeypatch.setenv("TABLE_EXERCISE", table_name)
+    monkeypatch.setenv("TABLE_USER_COUNT", local_aws.create_user_count_table())
+    monkeypatch.delenv("CACHE_URL", raising=False)
+
+    import generators
+    import skill
+
+    batch = [{"type": "addition", "addends": [2, 3]}, {"type": "addition", "addends": [4, 4, 1]},
+             {"type": "addition", "addends": [10, 20]}]
+    written = generators.write_exercises(boto3.resource("dynamodb").Table(table_name),
+                                         {UID: [(skill.exercise_id(0), exercise) for exercise in batch]})
+    return [(item["id"], sum(item["exercise"]["addends"])) for item in written]
+
+
+def submission(message_id, eid, answer, uid=UID):
+    return {"messageId": message_id, "uid": uid, "eid": eid, "answer": answer}
+
+
+def stored(eid):
+    return boto3.resource("dynamodb").Table("Exerciseaddition").get_item(Key={"uid": UID, "id": eid})["Item"]
+
+
+def counts():
+    item = boto3.resource("dynamodb").Table("UserCount").get_item(Key={"uid": UID, "etype": EXERCISE_TYPE}).get("Item", {})
+    return int(item.get("correctCount", 0)), int(item.get("falseCount", 0))
+
+
+@pytest.mark.parametrize("read_first", [True, False])
+def test_correct_and_incorrect_answers(exercises, read_first):
+    import grading
+
+    (first, solution), (second, other) = exercises[:2]
+    outcomes = grading.grade_batch(EXERCISE_TYPE, [submission("m1", first, solution), submission("m2", second, other + 1)],
+                                   read_first=read_first)
+
+    assert outcomes == {"m1": "correct", "m2": "incorrect"}
+    assert stored(first)["answered"] is True and stored(first)["correctness"] is True
+    assert stored(second)["correctness"] is False
+    assert "openSince" not in stored(first)
+    assert counts() == (1, 1)
+
+
+def test_equal_answer_in_another_form_is_correct(exercises):
+    import grading
+
+    eid, solution = exercises[0]
+    assert grading.grade_batch(EXERCISE_TYPE, [submission("m1", eid, float(solution))]) == {"m1": "correct"}
+
+
+@pytest.mark.parametrize("read_first", [True, False])
+def test_answered_exercise_is_graded_once(exercises, read_first):
+    import grading
+
+    eid, solution = exercises[0]
+    # twice in one batch and once more after it was committed
+    outcomes = grading.grade_batch(EXERCISE_TYPE, [submission("m1", eid, solution), submission("m2", eid, solution)],
+                                   read_first=read_first)
+    assert outcomes == {"m1": "correct", "m2": "answered"}
+
+    outcomes = grading.grade_batch(EXERCISE_TYPE, [submission("m3", eid, solution + 1)], read_first=read_first)
+    assert outcomes == {"m3": "answered"}
+    assert stored(eid)["correctness"] is True
+    assert counts() == (1, 0)
+
+
+@pytest.mark.parametrize("read_first", [True, False])
+def test_missing_exercise(exercises, read_first):
+    import grading
+
+    eid, solution = exercises[0]
+    outcomes = grading.grade_batch(EXERCISE_TYPE, [submission("m1", "no-such-exercise", 5), submission("m2", eid, solution)],
+                                   read_first=read_first)
+    assert outcomes == {"m1": "missing", "m2": "correct"}
+
+
+@pytest.mark.parametrize("read_first", [True, False])
+def test_archive_pointer_is_missing(exercises, read_first):
+    import archive
+    import grading
+
+    pointer = archive.pointer_id(100, "run")
+    boto3.resource("dynamodb").Table("Exerciseaddition").put_item(
+        Item={"uid": UID, "id": pointer, "archiveKey": "key", "start": 0, "length": 10, "count": 1})
+
+    assert grading.grade_batch(EXERCISE_TYPE, [submission("m1", pointer, 5)], read_first=read_first) == {"m1": "missing"}
+    assert "answered" not in stored(pointer)
+
+
+@pytest.mark.parametrize("answer", [float("nan"), float("inf"), {"not": "a number"}])
+def test_malformed_answer_is_dropped_alone(exercises, answer):
+    import grading
+
+    (first, _), (second, solution) = exercises[:2]
+    outcomes = grading.grade_batch(EXERCISE_TYPE, [submission("m1", first, answer), submission("m2", second, solution)])
+
+    assert outcomes["m2"] == "correct"
+    if isinstance(answer, float):
+        assert outcomes["m1"] == "dropped"
+        assert stored(first)["answered"] is False
+    else:
+        # an answer that can be keyed but is no number never matches
+        assert outcomes["m1"] == "incorrect"
+
+
+def test_legacy_exercise_without_answer_key(exercises):
+    import grading
+
+    eid, solution = exercises[0]
+    boto3.resource("dynamodb").Table("Exerciseaddition").update_item(
+        Key={"uid": UID, "id": eid}, UpdateExpression="REMOVE answerKey")
+
+    outcomes = grading.grade_batch(EXERCISE_TYPE, [submission("m1", eid, solution)], read_first=False)
+    assert outcomes == {"m1": "correct"}
+
+
+def test_evaluator_drops_malformed_records(exercises):
+    import evaluator_lambdas
+
+    eid, solution = exercises[0]
+    event = local_aws.sqs_event([{"uid": UID, "eid": eid, "type": EXERCISE_TYPE, "solution": solution, "submittedAt": "x"}])
+    event["Records"] += [
+        {"messageId": "not-an-object", "body": json.dumps({"Message": "[1]"})},
+        {"messageId": "no-uid", "body": json.dumps({"Message": json.dumps({"eid": eid, "solution": 1})})},
+        {"messageId": "not-json", "body": "{"},
+    ]
+
+    assert evaluator_lambdas.evaluate(EXERCISE_TYPE, event) == {"batchItemFailures": []}
+    assert stored(eid)["correctness"] is True
@@ -0,0 +1,90 @@
+import json
+
+import boto3
+import pytest
+
+import local_aws
+
+EMAIL = "student@example.com"
+PASSWORD = "Passw0rd!Passw0rd"
+
+
+@pytest.fixture
+def cognito(aws, monkeypatch):
+    client = boto3.client("cognito-idp")
+    user_pool_id = client.create_user_pool(PoolName="UserPool")["UserPool"]["Id"]
+    client_id = client.create_user_pool_client(
+        UserPoolId=user_pool_id, ClientName="web",
+        ExplicitAuthFlows=["ALLOW_USER_PASSWORD_AUTH", "ALLOW_REFRESH_TOKEN_AUTH"],
+    )["UserPoolClient"]["ClientId"]
+    monkeypatch.setenv("CLIENT_ID", client_id)
+    return client, user_pool_id
+
+
+@pytest.fixture
+def login(cognito):
+    return local_aws.load_lambda("login.py", "cognito")
+
+
+def create_user(cognito, permanent=True):
+    client, user_pool_id = cognito
+    # a roster import without a password sets a temporary one and Cognito asks for a new one
+    client.admin_create_user(UserPoolId=user_pool_id, Username=EMAIL, TemporaryPassword="Temp0rary!Passw0rd",
+                             MessageAction="SUPPRESS")
+    if permanent:
+        client.admin_set_user_password(UserPoolId=user_pool_id, Username=EMAIL, Password=PASSWORD, Permanent=True)
+
+
+def call(login, body):
+    response = login.handler({"body": json.dumps(body)}, None)
+    return response["statusCode"], json.loads(response["body"])
+
+
+def test_password_login_returns_the_refresh_token(login, cognito):
+    create_user(cognito)
+
+    status, body = call(login, {"email": EMAIL, "password": PASSWORD})
+
+    assert status == 200
+    assert body["token"] == body["AuthenticationResult"]["IdToken"]
+    assert body["AuthenticationResult"]["RefreshToken"]
+
+
+def test_refresh_token_logs_in_without_the_password(login, cognito):
+    create_user(cognito)
+    refresh_token = call(login, {"email": EMAIL, "password": PASSWORD})[1]["AuthenticationResult"]["RefreshToken"]
+
+    status, body = call(login, {"refreshToken": refresh_token})
+
+    assert status == 200
+    assert body["token"]
+    # Cognito returns no new one, the client keeps using the old one
+    assert body["AuthenticationResult"]["RefreshToken"] == refresh_token
+
+
+@pytest.mark.parametrize("body", [{"refreshToken": "not a token"}, {"email": EMAIL, "password": "wrong"},
+                                  {"email": "nobody@example.com", "password": PASSWORD}])
+def test_invalid_credentials_are_unauthorized(login, cognito, body):
+    create_user(cognito)
+    assert call(login, body)[0] == 401
+
+
+def test_new_password_required_is_answered_with_the_session(login, cognito):
+    create_user(cognito, permanent=False)
+
+    status, challenge = call(login, {"email": EMAIL, "password": "Temp0rary!Passw0rd"})
+
+    assert status == 401
+    assert challenge["ChallengeName"] == "NEW_PASSWORD_REQUIRED"
+    assert "token" not in challenge
+
+    status, body = call(login, {"email": EMAIL, "session": challenge["Session"], "newPassword": PASSWORD})
+    assert status == 200
+    assert body["token"]
+    assert call(login, {"email": EMAIL, "password": PASSWORD})[0] == 200
+
+
+@pytest.mark.parametrize("body", ["not json", json.dumps({"email": EMAIL}), json.dumps({"session": "s"}),
+                                  json.dumps([])])
+def test_malformed_login_is_a_bad_request(login, body):
+    assert login.handler({"body": body}, None)["statusCode"] == 400
@@ -0,0 +1,54 @@
+import importlib.util
+import json
+import os
+
+import boto3
+import pytest
+
+import local_aws
+
+SCRIPT = os.path.join(local_aws.LIB_DIR, "..", "scripts", "migrate_exercise_encoding.py")
+
+
+@pytest.fixture
+def migrate():
+    spec = importlib.util.spec_from_file_location("migrate_exercise_encoding", SCRIPT)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+@pytest.fixture
+def client(aws):
+    local_aws.create_exercise_table("addition")
+    client = boto3.client("dynamodb")
+    for i, answer in enumerate(["12", "NaN", "1e999", "7"]):
+        client.put_item(TableName="Exerciseaddition", Item={
+            "uid": {"S": "user-1"}, "id": {"S": f"e{i}"}, "answered": {"BOOL": True}, "answer": {"S": answer},
+            "exercise": {"M": {"type": {"S": "addition"}, "addends": {"L": [{"N": "5"}, {"N": "7"}]}}},
+        })
+    return client
+
+
+def test_non_finite_answers_are_skipped_alone(migrate, client):
+    counts, skipped = migrate.migrate_segment(client, "Exerciseaddition", "binary", 0, 1, False)
+
+    assert sorted(skipped) == [("user-1", "e1"), ("user-1", "e2")]
+    assert counts["skipped"] == 2 and counts["converted"] == 2
+
+    items = {item["id"]["S"]: item for item in client.scan(TableName="Exerciseaddition")["Items"]}
+    assert "B" in items["e0"]["exercise"] and "B" in items["e3"]["exercise"]
+    # left in the old form
+    assert items["e1"]["answer"] == {"S": "NaN"} and "M" in items["e1"]["exercise"]
+
+
+def test_migration_round_trip(migrate, client):
+    migrate.migrate_segment(client, "Exerciseaddition", "binary", 0, 1, False)
+    migrate.migrate_segment(client, "Exerciseaddition", "map", 0, 1, False)
+
+    items = {item["id"]["S"]: item for item in client.scan(TableName="Exerciseaddition")["Items"]}
+    assert json.loads(items["e0"]["answer"]["S"]) == 12
+    assert items["e0"]["exercise"]["M"]["addends"] == {"L": [{"N": "5"}, {"N": "7"}]}
+    # nothing left to convert
+    counts, _ = migrate.migrate_segment(client, "Exerciseaddition", "map", 0, 1, True)
+    assert counts["to convert"] == 0
@@ -0,0 +1,83 @@
+import numpy as np
+import pytest
+
+import polynomial
+
+
+def derivative(coeffs, order=1):
+    # per term, highest power first
+    power = len(coeffs) - 1
+    result = []
+    for i, coeff in enumerate(coeffs[:len(coeffs) - order]):
+        factor = 1
+        for k in range(order):
+            factor *= power - i - k
+        result.append(coeff * factor)
+    while len(result) > 1 and result[0] == 0:
+        result.pop(0)
+    result = result or [0]
+    return {"power": len(result) - 1, "coeffs": result}
+
+
+@pytest.mark.parametrize("exercise, expected", [
+    ({"coeffs": [3, 1, 4]}, {"power": 1, "coeffs": [6, 1]}),
+    ({"coeffs": [1, 0, 0, 0]}, {"power": 2, "coeffs": [3, 0, 0]}),
+    ({"coeffs": [2, -3, 0, 5]}, {"power": 2, "coeffs": [6, -6, 0]}),
+    # the derivative of a constant is the zero polynomial
+    ({"coeffs": [7]}, {"power": 0, "coeffs": [0]}),
+    ({"coeffs": [5, 9]}, {"power": 0, "coeffs": [5]}),
+    ({"coeffs": [1, 2, 3, 4], "order": 2}, {"power": 1, "coeffs": [6, 4]}),
+    ({"coeffs": [1, 2, 3], "order": 3}, {"power": 0, "coeffs": [0]}),
+])
+def test_derivatives(exercise, expected):
+    assert polynomial.derivatives([exercise]) == [expected]
+
+
+def test_derivatives_of_a_batch_match_the_per_term_rule():
+    rng = np.random.default_rng(7)
+    exercises = polynomial.generate(200, rng, low=-5, high=5)
+    exercises += [{**exercise, "order": 2} for exercise in polynomial.generate(50, rng)]
+
+    expected = [derivative(exercise["coeffs"], exercise.get("order", 1)) for exercise in exercises]
+    assert polynomial.derivatives(exercises) == expected
+
+
+@pytest.mark.parametrize("answer, expected", [
+    ({"power": 1, "coeffs": [6, 1]}, {"power": 1, "coeffs": [6, 1]}),
+    # leading zeros and float coefficients of the same polynomial
+    ({"power": 3, "coeffs": [0, 0, 6, 1]}, {"power": 1, "coeffs": [6, 1]}),
+    ({"coeffs": [6.0, 1.0]}, {"power": 1, "coeffs": [6, 1]}),
+    ({"coeffs": [0, 0]}, {"power": 0, "coeffs": [0]}),
+    ({"coeffs": []}, {"power": 0, "coeffs": [0]}),
+    ({"coeffs": [-2, 0, 3]}, {"power": 2, "coeffs": [-2, 0, 3]}),
+])
+def test_canonical(answer, expected):
+    assert polynomial.canonical([answer]) == [expected]
+
+
+def test_canonical_keeps_non_integer_coefficients():
+    assert polynomial.canonical([{"coeffs": [0.5, 2]}]) == [{"power": 1, "coeffs": [0.5, 2.0]}]
+
+
+@pytest.mark.parametrize("answer", [12, "6x+1", None, {"power": 1}, {"coeffs": "61"}, {"coeffs": [1, "a"]},
+                                    {"coeffs": [6, "1"]}, {"coeffs": [True, 1]}, {"coeffs": [6, None]}])
+def test_canonical_rejects_what_is_no_polynomial(answer):
+    # the other answers of the batch are still canonical
+    assert polynomial.canonical([answer, {"coeffs": [0, 3]}]) == [None, {"power": 0, "coeffs": [3]}]
+    # alone or with others, the answer is graded the same
+    assert polynomial.canonical([answer]) == [None]
+
+
+def test_generate():
+    exercises = polynomial.generate(500, np.random.default_rng(3), min_power=2, max_power=6, low=1, high=4)
+
+    for exercise in exercises:
+        assert exercise["type"] == "derivative"
+        assert 2 <= exercise["power"] <= 6
+        assert len(exercise["coeffs"]) == exercise["power"] + 1
+        assert exercise["coeffs"][0] >= 1
+        assert all(1 <= c <= 4 for c in exercise["coeffs"])
+
+
+def test_generate_is_seeded():
+    assert polynomial.generate(20, np.random.default_rng(11)) == polynomial.generate(20, np.random.default_rng(11))
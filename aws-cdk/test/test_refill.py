@@ -0,0 +1,189 @@
+import json
+import time
+
+import boto3
+import pytest
+
+import local_aws
+
+EXERCISE_TYPE = "addition"
+POLICY = {"low": 5, "high": 10, "window": 600, "lookahead": 3}
+
+
+@pytest.fixture
+def tables(aws, monkeypatch):
+    """(Exercise table, UserCount table) with the refill policy POLICY."""
+    table_name = local_aws.create_exercise_table(EXERCISE_TYPE)
+    monkeypatch.setenv("TABLE_NAME", table_name)
+    monkeypatch.setenv("EXERCISE_TYPE", EXERCISE_TYPE)
+    monkeypatch.setenv("TABLE_USER_COUNT", local_aws.create_user_count_table())
+    monkeypatch.setenv("REFILL_POLICY", json.dumps({EXERCISE_TYPE: POLICY}))
+    monkeypatch.delenv("CACHE_URL", raising=False)
+    dynamodb = boto3.resource("dynamodb")
+    return dynamodb.Table(table_name), dynamodb.Table("UserCount")
+
+
+@pytest.fixture
+def queue(tables, monkeypatch):
+    """URL of a queue subscribed to the generate topic the watcher publishes to."""
+    topic_arn = boto3.client("sns").create_topic(Name="ExerciseGenerateTopic")["TopicArn"]
+    monkeypatch.setenv("SNS_TOPIC_ARN", topic_arn)
+    sqs = boto3.client("sqs")
+    queue_url = sqs.create_queue(QueueName="ExerciseGenerateQueue")["QueueUrl"]
+    queue_arn = sqs.get_queue_attributes(QueueUrl=queue_url, AttributeNames=["QueueArn"])["Attributes"]["QueueArn"]
+    boto3.client("sns").subscribe(TopicArn=topic_arn, Protocol="sqs", Endpoint=queue_arn)
+    return queue_url
+
+
+def fill(table, uid, open_exercises=0, answered=0):
+    with table.batch_writer() as batch:
+        for i in range(open_exercises):
+            batch.put_item(Item={"uid": uid, "id": f"open-{i}", "answered": False, "openSince": 1})
+        for i in range(answered):
+            batch.put_item(Item={"uid": uid, "id": f"answered-{i}", "answered": True, "solveTime": int(time.time())})
+
+
+def user_count(uid, skill=None):
+    item = {"uid": uid, "etype": EXERCISE_TYPE, "correctCount": 1, "falseCount": 0}
+    if skill is not None:
+        item["skill"] = skill
+    boto3.resource("dynamodb").Table("UserCount").put_item(Item=item)
+
+
+def pending(uid):
+    item = boto3.resource("dynamodb").Table("UserCount").get_item(Key={"uid": uid, "etype": EXERCISE_TYPE}).get("Item")
+    return None if item is None else item.get("refillPending")
+
+
+def messages(queue_url):
+    received = boto3.client("sqs").receive_message(QueueUrl=queue_url, MaxNumberOfMessages=10).get("Messages", [])
+    return [json.loads(json.loads(message["Body"])["Message"]) for message in received]
+
+
+@pytest.mark.parametrize("open_exercises, recent, expected", [
+    (5, 0, 0),
+    (9, 4, 0),
+    # below the low watermark up to the high one, plus the lookahead for recent answers
+    (4, 0, 6),
+    (0, 0, 10),
+    (4, 2, 8),
+    (4, 20, 9),
+])
+def test_refill_amount(open_exercises, recent, expected):
+    import refill
+
+    assert refill.refill_amount(POLICY, open_exercises, recent) == expected
+
+
+def test_policy_defaults(monkeypatch):
+    import refill
+
+    monkeypatch.setenv("REFILL_POLICY", json.dumps({"derivatives": {"low": 3}}))
+    assert refill.policy("derivatives") == {**refill.DEFAULT_POLICY, "low": 3}
+    assert refill.policy(EXERCISE_TYPE) == refill.DEFAULT_POLICY
+
+
+def test_plan_tops_up_below_the_low_watermark(tables):
+    import refill
+
+    table, _ = tables
+    fill(table, "full", open_exercises=5)
+    fill(table, "low", open_exercises=4)
+    fill(table, "busy", open_exercises=2, answered=2)
+
+    assert refill.plan(table, EXERCISE_TYPE, ["full", "low", "busy", "new"]) == [
+        # the most active user first
+        ("busy", 10, None), ("low", 6, None), ("new", 10, None),
+    ]
+
+
+def test_claim_and_release(tables):
+    import refill
+
+    _, user_counts = tables
+    user_count("user-1", skill=1200)
+
+    assert refill.claim(user_counts, EXERCISE_TYPE, "user-1") == 2
+    assert pending("user-1") > time.time()
+    # in flight until released
+    assert refill.claim(user_counts, EXERCISE_TYPE, "user-1") is None
+
+    refill.release(user_counts, EXERCISE_TYPE, ["user-1"])
+    assert pending("user-1") is None
+    assert refill.claim(user_counts, EXERCISE_TYPE, "user-1") == 2
+
+
+def test_expired_claim_is_claimed_again(tables):
+    import refill
+
+    _, user_counts = tables
+    user_count("user-1")
+    user_counts.update_item(Key={"uid": "user-1", "etype": EXERCISE_TYPE}, UpdateExpression="SET refillPending = :past",
+                            ExpressionAttributeValues={":past": int(time.time()) - 1})
+
+    assert refill.claim(user_counts, EXERCISE_TYPE, "user-1") == 0
+
+
+def test_user_without_user_count_item_is_not_marked(tables):
+    import refill
+
+    _, user_counts = tables
+
+    # topped up at level 0 without creating an item
+    assert refill.claim(user_counts, EXERCISE_TYPE, "new") == 0
+    refill.release(user_counts, EXERCISE_TYPE, ["new"])
+    assert "Item" not in user_counts.get_item(Key={"uid": "new", "etype": EXERCISE_TYPE})
+
+
+def test_plan_skips_users_in_flight(tables):
+    import refill
+
+    table, user_counts = tables
+    user_count("user-1")
+    user_count("user-2")
+
+    assert [uid for uid, _, _ in refill.plan(table, EXERCISE_TYPE, ["user-1"], user_counts)] == ["user-1"]
+    claimed = []
+    assert refill.plan(table, EXERCISE_TYPE, ["user-1", "user-2"], user_counts, claimed) == [("user-2", 10, 0)]
+    assert claimed == ["user-2"]
+
+
+def test_watcher_publishes_one_top_up_per_user(queue):
+    import watcher
+
+    user_count("user-1", skill=900)
+    fill(boto3.resource("dynamodb").Table("Exerciseaddition"), "user-1", open_exercises=3)
+
+    watcher.handler(local_aws.stream_event(["user-1", "user-1", "user-1"]), None)
+    assert messages(queue) == [{"uid": "user-1", "type": EXERCISE_TYPE, "count": 7, "topUp": True, "level": -1}]
+    assert pending("user-1") is not None
+
+    # the next stream batch before the generator wrote the exercises
+    watcher.handler(local_aws.stream_event(["user-1"]), None)
+    assert messages(queue) == []
+
+
+def test_watcher_releases_its_claims_when_it_fails(queue, monkeypatch):
+    import watcher
+
+    user_count("user-1")
+    user_count("user-2")
+
+    def flush(self):
+        raise RuntimeError("SNS is down")
+
+    monkeypatch.setattr(watcher.Publisher, "flush", flush)
+    watcher.handler(local_aws.stream_event(["user-1", "user-2"]), None)
+
+    assert pending("user-1") is None and pending("user-2") is None
+
+
+def test_generator_releases_the_top_up(queue):
+    import generators
+    import watcher
+
+    user_count("user-1")
+    watcher.handler(local_aws.stream_event(["user-1"]), None)
+    generators.handler(local_aws.sqs_event(messages(queue)), None)
+
+    assert pending("user-1") is None
@@ -0,0 +1,103 @@
+import json
+
+import boto3
+import pytest
+
+import local_aws
+
+TEACHER = {"sub": "teacher", "cognito:groups": "[teachers admins]"}
+
+
+@pytest.fixture
+def roster(aws, monkeypatch):
+    cognito = boto3.client("cognito-idp")
+    user_pool_id = cognito.create_user_pool(PoolName="UserPool")["UserPool"]["Id"]
+    topic_arn = boto3.client("sns").create_topic(Name="ExerciseGenerateTopic")["TopicArn"]
+    monkeypatch.setenv("USER_POOL_ID", user_pool_id)
+    monkeypatch.setenv("TABLE_NAME", local_aws.create_user_table())
+    monkeypatch.setenv("SNS_TOPIC_ARN", topic_arn)
+    monkeypatch.setenv("EXERCISE_TYPES", json.dumps(["addition"]))
+    return local_aws.load_lambda("roster.py", "cognito")
+
+
+def student(i, **fields):
+    return {"email": f"student{i}@example.com", "firstName": "Student", "lastName": str(i), **fields}
+
+
+def import_roster(roster, students, claims=TEACHER):
+    event = {"requestContext": {"authorizer": {"claims": claims}}, "body": json.dumps({"students": students})}
+    response = roster.handler(event, None)
+    return response["statusCode"], json.loads(response["body"])
+
+
+def user_row(uid):
+    return boto3.resource("dynamodb").Table("User").get_item(Key={"id": uid}).get("Item")
+
+
+def test_roster_creates_the_students(roster):
+    status, report = import_roster(roster, [student(0), student(1, password="Passw0rd!Passw0rd")])
+
+    assert status == 200
+    assert (report["created"], report["existing"], report["failed"]) == (2, 0, 0)
+    for result in report["students"]:
+        assert result["status"] == "created"
+        # the names only go into the User rows
+        assert set(result) == {"email", "status", "uid"}
+        assert user_row(result["uid"])["firstName"] == "Student"
+
+
+def test_partial_failure_is_reported_per_student(roster):
+    import_roster(roster, [student(0)])
+
+    status, report = import_roster(roster, [
+        student(0),
+        student(1),
+        student(1),
+        {"email": "student2@example.com", "firstName": "Student"},
+        {"email": ["student3@example.com"], "firstName": "Student", "lastName": "3"},
+        student(4, firstName=7),
+        student(5, password=12345678),
+        "student6@example.com",
+    ])
+
+    assert status == 200
+    assert (report["created"], report["existing"], report["failed"]) == (1, 1, 6)
+    assert [(r["email"], r["status"]) for r in report["students"]] == [
+        ("student0@example.com", "exists"),
+        ("student1@example.com", "created"),
+        ("student1@example.com", "failed"),
+        ("student2@example.com", "failed"),
+        (None, "failed"),
+        ("student4@example.com", "failed"),
+        ("student5@example.com", "failed"),
+        (None, "failed"),
+    ]
+    assert all(r["error"] for r in report["students"] if r["status"] == "failed")
+
+
+def test_failure_after_cognito_reports_no_names(roster, monkeypatch):
+    def write_users(created):
+        raise RuntimeError("table gone")
+
+    monkeypatch.setattr(roster, "write_users", write_users)
+    status, body = import_roster(roster, [student(0)])
+
+    assert status == 500
+    assert body["error"] == "RuntimeError"
+    assert [set(r) for r in body["students"]] == [{"email", "status", "uid"}]
+
+
+@pytest.mark.parametrize("claims, expected", [({"sub": "student"}, 403), ({}, 401)])
+def test_only_teachers_import(roster, claims, expected):
+    assert import_roster(roster, [student(0)], claims)[0] == expected
+
+
+@pytest.mark.parametrize("body", [{"students": "student0@example.com"}, {"students": {}}, {}, []])
+def test_malformed_roster_is_a_bad_request(roster, body):
+    event = {"requestContext": {"authorizer": {"claims": TEACHER}}, "body": json.dumps(body)}
+    assert roster.handler(event, None)["statusCode"] == 400
+
+
+def test_roster_beyond_the_time_budget_is_a_bad_request(roster):
+    students = [student(i, password="Passw0rd!Passw0rd") for i in range(roster.MAX_CALLS // 2 + 1)]
+    assert import_roster(roster, students)[0] == 400
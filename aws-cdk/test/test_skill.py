@@ -0,0 +1,79 @@
+import uuid
+
+import boto3
+import pytest
+
+import local_aws
+
+EXERCISE_TYPE = "addition"
+UID = "user-1"
+
+
+@pytest.fixture
+def skill():
+    import skill
+
+    return skill
+
+
+@pytest.fixture
+def grade(aws, monkeypatch, skill):
+    """Grades one answer of an addition exercise generated at a level, returns the user's rating."""
+    table_name = local_aws.create_exercise_table(EXERCISE_TYPE)
+    monkeypatch.setenv("TABLE_EXERCISE", table_name)
+    monkeypatch.setenv("TABLE_USER_COUNT", local_aws.create_user_count_table())
+    monkeypatch.delenv("CACHE_URL", raising=False)
+
+    import generators
+    import grading
+
+    def grade(level, correct, eid=None):
+        eid = eid or skill.exercise_id(level)
+        generators.write_exercises(boto3.resource("dynamodb").Table(table_name),
+                                   {UID: [(eid, {"type": "addition", "addends": [2, 3]})]})
+        answer = 5 if correct else 6
+        grading.grade_batch(EXERCISE_TYPE, [{"messageId": eid, "uid": UID, "eid": eid, "answer": answer}])
+        item = boto3.resource("dynamodb").Table("UserCount").get_item(Key={"uid": UID, "etype": EXERCISE_TYPE})["Item"]
+        return int(item["skill"])
+
+    return grade
+
+
+def test_rating_moves_by_a_constant_per_answer(skill):
+    assert skill.delta(1, 0) == 10
+    assert skill.delta(0, 1) == -30
+    # at the target success rate the rating stays
+    assert skill.delta(3, 1) == 0
+
+
+@pytest.mark.parametrize("correct, level, counted", [
+    (True, 0, (1, 0)), (False, 0, (0, 1)),
+    (True, 4, (0, 0)), (False, 4, (0, 1)),
+    (True, -4, (1, 0)), (False, -4, (0, 0)),
+    (True, None, (1, 0)), (False, None, (0, 1)),
+])
+def test_answers_beyond_the_level_caps_are_not_rated(skill, correct, level, counted):
+    assert skill.rated(correct, level) == counted
+
+
+@pytest.mark.parametrize("rating, level", [(None, 0), (1000, 0), (1049, 0), (1151, 2), (5000, 4), (-5000, -4)])
+def test_level_is_clamped(skill, rating, level):
+    assert skill.level(rating) == level
+
+
+def test_level_is_part_of_the_exercise_id(skill):
+    assert skill.exercise_level(skill.exercise_id(-3)) == -3
+    assert skill.exercise_id(2, "message#0") == skill.exercise_id(2, "message#0")
+    # ids of exercises generated before the levels
+    assert skill.exercise_level(str(uuid.uuid4())) is None
+    assert skill.exercise_level("id~x") is None
+
+
+def test_rating_stops_at_the_caps_when_graded(grade, skill):
+    assert grade(0, True) == skill.INITIAL + 10
+    assert grade(skill.MAX_LEVEL, True) == skill.INITIAL + 10
+    assert grade(skill.MAX_LEVEL, False) == skill.INITIAL - 20
+    assert grade(skill.MIN_LEVEL, False) == skill.INITIAL - 20
+    assert grade(skill.MIN_LEVEL, True) == skill.INITIAL - 10
+    # an exercise without a level is rated like before
+    assert grade(None, False, eid=str(uuid.uuid4())) == skill.INITIAL - 40
@@ -8,12 +8,16 @@ import { useNavigate, Link } from 'react-router-dom';
 import AuthStorage from '@/utils/AuthStorage';
 import { apiConfig } from '@/config/apiConfig';
 import axiosClient from './config/axiosClient';
+import axios from 'axios';
 
 export default function Login() {
     const [email, setEmail] = useState('');
     const [password, setPassword] = useState('');
     const [error, setError] = useState('');
     const [isSubmitting, setIsSubmitting] = useState(false);
+    // set when Cognito asks a student invited by a roster import for a new password
+    const [session, setSession] = useState('');
+    const [newPassword, setNewPassword] = useState('');
 
     const navigate = useNavigate();
 
@@ -22,15 +26,16 @@ export default function Login() {
         setError('');
         setIsSubmitting(true);
 
-        if (!email || !password) {
+        if (!email || !(session ? newPassword : password)) {
             setError('All fields are required');
             setIsSubmitting(false);
             return;
         }
 
         try {
-            // API call to login
-            const loginResponse = await axiosClient.post(apiConfig.loginUrl, { email, password });
+            // API call to login, or the answer to the new password challenge
+            const body = session ? { email, session, newPassword } : { email, password };
+            const loginResponse = await axiosClient.post(apiConfig.loginUrl, body);
             const { AccessToken, IdToken, RefreshToken } = (await loginResponse.data).AuthenticationResult;
 
             AuthStorage.saveTokens(AccessToken, IdToken, RefreshToken);
@@ -38,7 +43,15 @@ export default function Login() {
             navigate('/dashboard');
         } catch (err) {
             console.error(err);
-            setError('Invalid email or password. Please try again.');
+            const data = axios.isAxiosError(err) ? err.response?.data : undefined;
+            if (data?.ChallengeName === 'NEW_PASSWORD_REQUIRED') {
+                setSession(data.Session);
+                setError('Please choose a new password to finish signing in.');
+            } else if (session) {
+                setError(data?.error ?? 'The new password was not accepted. Please try again.');
+            } else {
+                setError('Invalid email or password. Please try again.');
+            }
         } finally {
             setIsSubmitting(false);
         }
@@ -88,9 +101,29 @@ export default function Login() {
                                 value={password}
                                 onChange={(e) => setPassword(e.target.value)}
                                 required
+                                disabled={!!session}
                                 className='w-full'
                             />
                         </div>
+                        {session && (
+                            <div className='space-y-2'>
+                                <Label
+                                    htmlFor='newPassword'
+                                    className='text-sm font-medium text-gray-700 dark:text-gray-300'
+                                >
+                                    New password
+                                </Label>
+                                <Input
+                                    id='newPassword'
+                                    type='password'
+                                    placeholder='Your new password'
+                                    value={newPassword}
+                                    onChange={(e) => setNewPassword(e.target.value)}
+                                    required
+                                    className='w-full'
+                                />
+                            </div>
+                        )}
                         {error && (
                             <div
                                 className='flex items-center text-red-500 text-sm bg-red-100 dark:bg-red-900/30 p-3 rounded-md'
@@ -108,7 +141,7 @@ export default function Login() {
                             dark:bg-indigo-500 dark:hover:bg-indigo-600 transition-colors duration-200'
                             disabled={isSubmitting}
                         >
-                            {isSubmitting ? 'Logging in...' : 'Log in'}
+                            {isSubmitting ? 'Logging in...' : session ? 'Set password and log in' : 'Log in'}
                         </Button>
                         <div className='text-sm text-center text-gray-600 dark:text-gray-400'>
                             Don't have an account?{' '}
@@ -13,6 +13,7 @@ import { toSuperscript } from './utils/formatDerivatives';
 export default function ResultsPage() {
     const navigate = useNavigate();
     const [results, setResults] = useState<any>(null);
+    const [histories, setHistories] = useState<Record<string, { items: any[]; cursor: string | null }>>({});
     const [loading, setLoading] = useState(true);
     const [error, setError] = useState<string | null>(null);
 
@@ -21,6 +22,10 @@ export default function ResultsPage() {
             try {
                 const response = await axiosClient.get(apiConfig.profileUrl);
                 setResults(response.data);
+
+                // first page of answered exercises of every type, further pages per type
+                const history = await axiosClient.get(apiConfig.historyUrl);
+                setHistories(history.data);
             } catch (err) {
                 setError('Error fetching results. Please try again later.');
             } finally {
@@ -31,18 +36,33 @@ export default function ResultsPage() {
         fetchResults();
     }, []);
 
+    const loadMore = async (type: string) => {
+        try {
+            const response = await axiosClient.get(`${apiConfig.historyUrl}/${type}`, {
+                params: { cursor: histories[type].cursor },
+            });
+            setHistories((prev) => ({
+                ...prev,
+                [type]: { items: [...prev[type].items, ...response.data.items], cursor: response.data.cursor },
+            }));
+        } catch (err) {
+            setError('Error fetching results. Please try again later.');
+        }
+    };
+
     const groupedResults = useMemo(() => {
         if (!results) return [];
 
         return Object.entries(results).map(([type, typeData]: [string, any]) => {
             return {
                 type,
-                results: typeData.exercises,
+                results: histories[type]?.items ?? [],
+                cursor: histories[type]?.cursor ?? null,
                 ratio: typeData.ratio,
                 grade: typeData.grade,
             };
         });
-    }, [results]);
+    }, [results, histories]);
 
     if (loading) {
         return (
@@ -80,7 +100,7 @@ export default function ResultsPage() {
                         </CardDescription>
                     </CardHeader>
                     <CardContent>
-                        {groupedResults.map(({ type, results, ratio, grade }) => (
+                        {groupedResults.map(({ type, results, cursor, ratio, grade }) => (
                             <div
                                 key={type}
                                 className='mb-8'
@@ -136,6 +156,15 @@ export default function ResultsPage() {
                                         </TableBody>
                                     </Table>
                                 </div>
+                                {cursor && (
+                                    <Button
+                                        variant='ghost'
+                                        className='mt-2 text-indigo-600 hover:bg-indigo-100 dark:text-indigo-400 dark:hover:bg-indigo-900'
+                                        onClick={() => loadMore(type)}
+                                    >
+                                        Load more
+                                    </Button>
+                                )}
                             </div>
                         ))}
                     </CardContent>
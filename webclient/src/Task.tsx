@@ -34,6 +34,11 @@ interface DerivativeTask {
 
 type TaskDto = AdditionTask | MultiplicationTask | DerivativeTask;
 
+// an answer graded by the evaluator is committed a moment after the submission, until then the same
+// exercise is the open one; it is asked for again after 250, 500, 1000 and 2000 ms
+const GRADING_POLL_ATTEMPTS = 4;
+const GRADING_POLL_MS = 250;
+
 const taskIcons = {
     addition: <PlusCircle className='h-6 w-6' />,
     multiplication: <XCircle className='h-6 w-6' />,
@@ -104,10 +109,15 @@ export default function TaskPage() {
         }
     }, [searchParams, navigate]);
 
-    const fetchTask = async (type: keyof typeof taskIcons) => {
+    const fetchTask = async (type: keyof typeof taskIcons, answeredId?: string) => {
         setLoading(true);
         try {
-            const response = await axiosClient.get(`${apiConfig.exerciseUrl}/${type}`);
+            let response = await axiosClient.get(`${apiConfig.exerciseUrl}/${type}`);
+            // the exercise just answered is served until its answer is graded
+            for (let attempt = 0; answeredId && response.data.id === answeredId && attempt < GRADING_POLL_ATTEMPTS; attempt++) {
+                await sleep(GRADING_POLL_MS * 2 ** attempt);
+                response = await axiosClient.get(`${apiConfig.exerciseUrl}/${type}`);
+            }
             const data = response.data;
             setTask({
                 ...data.exercise,
@@ -148,24 +158,26 @@ export default function TaskPage() {
             if (task.type === 'derivative') {
                 const { coeffs, power } = parsePolynomial(userAnswer);
                 bodyPayload.solution = { coeffs, power };
-                bodyPayload.coeffs = task.coeffs;
-                bodyPayload.power = task.power;
             } else {
                 bodyPayload.solution = Number(userAnswer);
-                if (task.type === 'addition') {
-                    bodyPayload.addends = task.addends;
-                } else if (task.type === 'multiplication') {
-                    bodyPayload.multipliers = task.multipliers;
-                }
             }
             setLoading(true);
             setSubmitting(true);
-            await axiosClient.post(`${apiConfig.exerciseUrl}/${taskType}`, bodyPayload);
-            //TODO:
-            await sleep(1000);
+            const response = await axiosClient.post(`${apiConfig.exerciseUrl}/${taskType}`, bodyPayload);
+            if (typeof response.data?.correct === 'boolean') {
+                // graded inline, the result is already stored
+                addToast(response.data.correct ? "Correct answer." : "Wrong answer.", response.data.correct ? "success" : "error");
+            }
             setSubmitting(false);
-            fetchTask(taskType);
-        } catch (error) {
+            // an answer graded asynchronously keeps its exercise open until the evaluator committed it
+            fetchTask(taskType, task.id);
+        } catch (error: any) {
+            setSubmitting(false);
+            if (error?.response?.status === 409) {
+                // a repeated submission of the same exercise, the first one is being graded
+                fetchTask(taskType, task.id);
+                return;
+            }
             console.error('Error submitting answer:', error);
             addToast("There was an error submitting your answer.", "error");
         }
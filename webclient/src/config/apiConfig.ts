@@ -7,4 +7,5 @@ export const apiConfig = {
     loginUrl: `${baseUrl}/auth/login`,
     s3BucketUrl: `${baseUrl}/files`,
     profileUrl: `${baseUrl}/profile`,
+    historyUrl: `${baseUrl}/profile/history`,
 };
@@ -1,10 +1,49 @@
 import axios from 'axios';
 import AuthStorage from '../utils/AuthStorage';
+import { apiConfig } from './apiConfig';
+
+// tokens this close to their expiry are refreshed before a request
+const EXPIRY_MARGIN_SECONDS = 60;
+
+let refreshing: Promise<boolean> | null = null;
+
+export function isExpiring(token: string | null): boolean {
+    const exp = token ? AuthStorage.decodeJwt(token)?.exp : undefined;
+    return typeof exp !== 'number' || exp - EXPIRY_MARGIN_SECONDS < Date.now() / 1000;
+}
+
+// trades the refresh token for new tokens instead of a password login,
+// requests that find the token expiring at the same time share one refresh
+export function refreshTokens(): Promise<boolean> {
+    const refreshToken = AuthStorage.getRefreshToken();
+    if (!refreshToken) {
+        return Promise.resolve(false);
+    }
+
+    if (!refreshing) {
+        refreshing = axios
+            .post(apiConfig.loginUrl, { refreshToken })
+            .then((response) => {
+                const { AccessToken, IdToken, RefreshToken } = response.data.AuthenticationResult;
+                AuthStorage.saveTokens(AccessToken, IdToken, RefreshToken ?? refreshToken);
+                return true;
+            })
+            .catch(() => false)
+            .finally(() => {
+                refreshing = null;
+            });
+    }
+    return refreshing;
+}
 
 const axiosClient = axios.create();
 
 axiosClient.interceptors.request.use(
-    (config) => {
+    async (config) => {
+        if (AuthStorage.getRefreshToken() && isExpiring(AuthStorage.getIdToken())) {
+            await refreshTokens();
+        }
+
         const accessToken = AuthStorage.getIdToken();
         if (accessToken) {
             config.headers['Authorization'] = `Bearer ${accessToken}`;
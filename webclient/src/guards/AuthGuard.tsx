@@ -2,6 +2,7 @@ import { ReactNode, useEffect, useState } from 'react';
 import { useNavigate } from 'react-router-dom';
 import { jwtDecode } from 'jwt-decode';
 import AuthStorage from '../utils/AuthStorage';
+import { refreshTokens } from '../config/axiosClient';
 
 interface JwtPayload {
     exp: number;
@@ -25,9 +26,16 @@ const AuthGuard = ({ children }: { children: ReactNode }) => {
                 const currentTime = Math.floor(Date.now() / 1000);
 
                 if (decoded.exp < currentTime) {
-                    AuthStorage.clearTokens();
-                    setIsAuthenticated(false);
-                    navigate('/login', { replace: true });
+                    // an expired session continues with the refresh token, the password only when that fails
+                    refreshTokens().then((refreshed) => {
+                        if (refreshed) {
+                            setIsAuthenticated(true);
+                            return;
+                        }
+                        AuthStorage.clearTokens();
+                        setIsAuthenticated(false);
+                        navigate('/login', { replace: true });
+                    });
                     return;
                 }
 
@@ -2,6 +2,7 @@ import { ReactNode, useEffect, useState } from 'react';
 import { useNavigate } from 'react-router-dom';
 import { jwtDecode } from 'jwt-decode';
 import AuthStorage from '../utils/AuthStorage';
+import { refreshTokens } from '../config/axiosClient';
 
 interface JwtPayload {
     exp: number;
@@ -24,8 +25,14 @@ const GuestGuard = ({ children }: { children: ReactNode }) => {
                 const currentTime = Math.floor(Date.now() / 1000);
 
                 if (decoded.exp < currentTime) {
-                    AuthStorage.clearTokens();
-                    setIsGuest(true);
+                    refreshTokens().then((refreshed) => {
+                        if (refreshed) {
+                            navigate('/dashboard', { replace: true });
+                            return;
+                        }
+                        AuthStorage.clearTokens();
+                        setIsGuest(true);
+                    });
                 } else {
                     navigate('/dashboard', { replace: true });
                 }